@@ -1,5 +1,7 @@
 # Googlellama/__main__.py
 import sys
+import json
+import time
 import inspect
 import argparse
 import asyncio
@@ -7,6 +9,7 @@ from akinus.web.server.mcp import mcp
 from akinus.web.google.auth import get_credentials
 
 import Googlellama.tools as google_tools
+from Googlellama import cassette, daemon, http_server
 
 def discover_mcp_tools(module):
     tools = {}
@@ -15,11 +18,135 @@ def discover_mcp_tools(module):
             tools[name] = func
     return tools
 
-async def run_cli_tool(tool_func, args):
-    sig = inspect.signature(tool_func)
-    kwargs = {k: getattr(args, k) for k in sig.parameters}
+async def call_tool(tool_func, kwargs):
     result = await tool_func(**kwargs)
-    print(result)
+    # Background jobs would die with the process, so the CLI waits for them.
+    if isinstance(result, dict) and google_tools.job_manager.get(result.get("job_id")):
+        job = await google_tools.job_manager.wait(result["job_id"])
+        result = job.to_dict()
+    return result
+
+def ensure_credentials():
+    # Ensure credentials are available and valid
+    try:
+        return get_credentials()  # This will refresh or re-authorize if needed
+    except FileNotFoundError:
+        # Token file missing, force authorization
+        from akinus.web.google.auth import authorize
+        authorize()
+        return get_credentials()
+
+async def get_tool_runner(tools):
+    """
+    Returns `run(name, kwargs)`: forwards calls to the daemon if one is running,
+    otherwise runs them in this process (after loading credentials).
+    """
+    path = google_tools.DAEMON_SOCKET
+    if await daemon.ping(path):
+        return lambda name, kwargs: daemon.call(path, name, kwargs)
+    ensure_credentials()
+    return lambda name, kwargs: call_tool(tools[name], kwargs)
+
+async def run_cli_tool(tools, name, args):
+    sig = inspect.signature(tools[name])
+    kwargs = {k: getattr(args, k) for k in sig.parameters}
+    run = await get_tool_runner(tools)
+    print(await run(name, kwargs))
+
+async def run_daemon(tools, args):
+    path = google_tools.DAEMON_SOCKET
+    if args.status:
+        status = await daemon.ping(path)
+        print({"running": True, "socket": str(path), **status} if status else {"running": False, "socket": str(path)})
+        return
+    if args.stop:
+        print({"stopped": await daemon.shutdown(path)})
+        return
+    ensure_credentials()
+
+    async def run(name, kwargs):
+        if name not in tools:
+            raise ValueError(f"Unknown tool '{name}'.")
+        return await call_tool(tools[name], kwargs)
+
+    await google_tools.log("INFO", "google_tools", f"Daemon listening on {path}")
+    await daemon.serve(path, run)
+
+async def run_http_server(args):
+    """
+    Serves MCP over streamable HTTP so many agents share one process: one set of credentials,
+    warm API clients, the connection pool and every cache. Each session may run at most
+    --session-concurrency requests at once. Requests must carry HTTP_TOKEN as a bearer token
+    when it is set, and it must be set to bind to anything but a loopback address.
+    """
+    creds = ensure_credentials()
+    google_tools.get_gmail_service()  # Build the most used client before the first request
+    app = http_server.build_app(mcp, lambda: google_tools.server_readiness(creds), args.session_concurrency,
+                                google_tools.HTTP_TOKEN)
+    await google_tools.log("INFO", "google_tools", f"Serving MCP over HTTP on http://{args.host}:{args.port}/mcp")
+    await http_server.serve(app, args.host, args.port)
+
+async def run_batch_call(tools, run, line_no, line):
+    """Runs one JSONL line of the form {"tool": "...", "args": {...}, "id": ...} and returns its result record."""
+    try:
+        call = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": line_no, "error": f"Invalid JSON: {e}"}
+    record = {"id": call.get("id", line_no), "tool": call.get("tool")}
+    if call.get("tool") not in tools:
+        return {**record, "error": f"Unknown tool '{call.get('tool')}'."}
+    try:
+        record["result"] = await run(call["tool"], call.get("args") or {})
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+async def run_batch(tools, infile, outfile, parallel):
+    """
+    Runs the tool calls in a JSONL stream concurrently, at most `parallel` at a time,
+    in the daemon if one is running, otherwise in this process; either way all calls share
+    one set of credentials and API clients. Result records are written as JSONL in input
+    order, each as soon as it and all earlier calls have finished.
+    """
+    limit = asyncio.Semaphore(max(1, parallel))
+    runner = await get_tool_runner(tools)
+
+    async def run(line_no, line):
+        async with limit:
+            return await run_batch_call(tools, runner, line_no, line)
+
+    tasks = [asyncio.create_task(run(n, line)) for n, line in enumerate(infile, 1) if line.strip()]
+    failed = 0
+    for task in tasks:
+        record = await task
+        failed += "error" in record
+        outfile.write(json.dumps(record, default=str) + "\n")
+        outfile.flush()
+    return failed
+
+async def run_perf(tools, args):
+    """
+    Runs one tool against a cassette and reports API calls and wall time per run.
+    Recording needs credentials and hits the real API once; replays are offline and deterministic.
+    """
+    if args.tool not in tools:
+        raise SystemExit(f"Unknown tool '{args.tool}'.")
+    kwargs = json.loads(args.args)
+    if args.mode == cassette.RECORD:
+        ensure_credentials()
+    runs = []
+    repeat = 1 if args.mode == cassette.RECORD else max(1, args.repeat)
+    for _ in range(repeat):
+        with google_tools.use_cassette(args.cassette, args.mode, args.latency) as tape:
+            started = time.perf_counter()
+            result = await call_tool(tools[args.tool], kwargs)
+            runs.append({"seconds": round(time.perf_counter() - started, 4), **tape.stats()})
+    report = {"tool": args.tool, "runs": runs,
+              "best_seconds": min(r["seconds"] for r in runs)}
+    if isinstance(result, dict) and "error" in result:
+        report["error"] = result["error"]
+    print(json.dumps(report, indent=2))
+    return 1 if any(r["misses"] for r in runs) or "error" in report else 0
 
 def build_cli_parser(tools):
     parser = argparse.ArgumentParser(
@@ -27,6 +154,46 @@ def build_cli_parser(tools):
     )
     subparsers = parser.add_subparsers(dest="command", help="Available tools")
 
+    batch = subparsers.add_parser("batch", help="Run tool calls from a JSONL file or stdin in one process.")
+    batch.description = (
+        'Each input line is {"tool": "<name>", "args": {...}, "id": <optional>}. '
+        "Results are written as JSONL in input order."
+    )
+    batch.add_argument("--file", default="-", help="JSONL file of tool calls ('-' for stdin, the default)")
+    batch.add_argument("--output", default="-", help="File to write results to ('-' for stdout, the default)")
+    batch.add_argument("--parallel", type=int, default=4, help="Maximum tool calls running at once (default 4)")
+
+    server = subparsers.add_parser("daemon", help="Run a persistent server that CLI calls are forwarded to.")
+    server.description = (
+        "Keeps credentials, API clients, connections and caches warm and serves tool calls on a "
+        "local Unix socket. While it runs, other Googlellama CLI calls are forwarded to it."
+    )
+    server.add_argument("--status", action="store_true", help="Report whether a daemon is running")
+    server.add_argument("--stop", action="store_true", help="Stop the running daemon")
+
+    http = subparsers.add_parser("serve", help="Serve MCP over streamable HTTP for many concurrent clients.")
+    http.description = (
+        "Runs the MCP server on streamable HTTP at /mcp instead of stdio. All sessions share one process. "
+        "GET /healthz and /readyz are provided for load-balancer checks."
+    )
+    http.add_argument("--host", default=google_tools.HTTP_HOST, help="Interface to bind (HTTP_HOST, default 127.0.0.1)")
+    http.add_argument("--port", type=int, default=google_tools.HTTP_PORT, help="Port (HTTP_PORT, default 8000)")
+    http.add_argument("--session-concurrency", type=int, default=google_tools.SESSION_CONCURRENCY,
+                      help="Requests one session may run at once (SESSION_CONCURRENCY, default 4)")
+
+    perf = subparsers.add_parser("perf", help="Record a tool's API traffic or replay it offline and time the tool.")
+    perf.description = (
+        "Record mode runs the tool against the real API and saves every request/response to the cassette. "
+        "Replay mode serves those responses back without network access or credentials, so timings and "
+        "API call counts can be compared between code changes."
+    )
+    perf.add_argument("--cassette", required=True, help="Cassette file (gzip JSONL), e.g. data/cassettes/list.jsonl.gz")
+    perf.add_argument("--mode", choices=[cassette.RECORD, cassette.REPLAY], default=cassette.REPLAY)
+    perf.add_argument("--tool", required=True, help="Tool to run")
+    perf.add_argument("--args", default="{}", help="Tool arguments as a JSON object")
+    perf.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per replayed request (default 0)")
+    perf.add_argument("--repeat", type=int, default=3, help="Replay runs to time (default 3)")
+
     for tool_name, func in tools.items():
         doc = inspect.getdoc(func) or "No description."
         sig = inspect.signature(func)
@@ -44,16 +211,8 @@ def build_cli_parser(tools):
 def main():
     tools = discover_mcp_tools(google_tools)
 
-    # Ensure credentials are available and valid
-    try:
-        creds = get_credentials()  # This will refresh or re-authorize if needed
-    except FileNotFoundError:
-        # Token file missing, force authorization
-        from akinus.web.google.auth import authorize
-        authorize()
-        creds = get_credentials()
-
     if len(sys.argv) == 1:
+        ensure_credentials()
         mcp.run()
     else:
         parser = build_cli_parser(tools)
@@ -63,7 +222,33 @@ def main():
             parser.print_help()
             sys.exit(1)
 
-        asyncio.run(run_cli_tool(tools[args.command], args))
+        if args.command == "batch":
+            infile = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+            outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            try:
+                failed = asyncio.run(run_batch(tools, infile, outfile, args.parallel))
+            finally:
+                for f in (infile, outfile):
+                    if f not in (sys.stdin, sys.stdout):
+                        f.close()
+            sys.exit(1 if failed else 0)
+
+        if args.command == "serve":
+            try:
+                http_server.check_bind(args.host, google_tools.HTTP_TOKEN)
+            except ValueError as e:
+                sys.exit(str(e))
+            asyncio.run(run_http_server(args))
+            return
+
+        if args.command == "perf":
+            sys.exit(asyncio.run(run_perf(tools, args)))
+
+        if args.command == "daemon":
+            asyncio.run(run_daemon(tools, args))
+            return
+
+        asyncio.run(run_cli_tool(tools, args.command, args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+# accounts.py
+
+import os
+import json
+import tempfile
+import threading
+import contextvars
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+
+# Gmail API quota units per method (https://developers.google.com/gmail/api/reference/quota).
+# Methods of other APIs, and Gmail methods not listed here, cost one unit.
+GMAIL_QUOTA_UNITS = {
+    "gmail.users.labels.list": 1,
+    "gmail.users.labels.get": 1,
+    "gmail.users.labels.create": 5,
+    "gmail.users.labels.update": 5,
+    "gmail.users.labels.patch": 5,
+    "gmail.users.labels.delete": 5,
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.get": 5,
+    "gmail.users.messages.modify": 5,
+    "gmail.users.messages.trash": 5,
+    "gmail.users.messages.delete": 10,
+    "gmail.users.messages.batchModify": 50,
+    "gmail.users.messages.batchDelete": 50,
+    "gmail.users.messages.send": 100,
+    "gmail.users.messages.attachments.get": 5,
+    "gmail.users.threads.list": 10,
+    "gmail.users.threads.get": 10,
+    "gmail.users.threads.modify": 10,
+    "gmail.users.threads.trash": 10,
+    "gmail.users.threads.delete": 20,
+}
+
+
+class QuotaBudgetExceeded(Exception):
+    """Raised when an account has spent its quota budget for the current run."""
+
+
+class QuotaBudget:
+    """Thread-safe counter of quota units spent by one account during one run."""
+
+    def __init__(self, limit: int | None = None):
+        self.limit = limit
+        self.used = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def charge(self, method_id: str | None, count: int = 1):
+        units = GMAIL_QUOTA_UNITS.get(method_id or "", 1) * count
+        with self._lock:
+            if self.limit is not None and self.used + units > self.limit:
+                raise QuotaBudgetExceeded(
+                    f"Quota budget of {self.limit} units exhausted ({self.used} used, {method_id} needs {units})"
+                )
+            self.used += units
+            self.calls += count
+
+
+@dataclass
+class Account:
+    """One mailbox in the account registry."""
+    name: str
+    token_path: str
+    delete_filter: str = "delete_filter.txt"
+    archive_filter: str = "archive_filter.txt"
+    quota_units: int | None = None
+    budget: QuotaBudget = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.budget is None:
+            self.budget = QuotaBudget(self.quota_units)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("budget")
+        return data
+
+
+def load_accounts(path: Path) -> list[Account]:
+    """
+    Reads the account registry, a JSON file of the form
+    {"accounts": [{"name": "work", "token_path": "tokens/work.json", "quota_units": 200000}, ...]}.
+    Relative token paths are resolved against the registry's directory.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    accounts = []
+    for entry in data.get("accounts", []):
+        entry = dict(entry)
+        token_path = Path(entry.pop("token_path"))
+        if not token_path.is_absolute():
+            token_path = path.parent / token_path
+        accounts.append(Account(token_path=str(token_path), **entry))
+    return accounts
+
+
+# --- Active account ---
+# None means the default single-account setup (data/token.json via get_credentials).
+
+_current_account = contextvars.ContextVar("googlellama_account", default=None)
+
+
+def current_account() -> Account | None:
+    return _current_account.get()
+
+
+def activate(account: Account | None):
+    """Makes `account` the active account for the current task/context. Returns a reset token."""
+    return _current_account.set(account)
+
+
+def deactivate(token):
+    _current_account.reset(token)
+
+
+def load_credentials(account: Account):
+    """
+    Loads the OAuth credentials stored in the account's token file. An expired access token is
+    refreshed right away and written back, so other worker processes and later runs reuse it.
+    """
+    from google.oauth2.credentials import Credentials
+    creds = Credentials.from_authorized_user_file(account.token_path)
+    if not creds.valid and creds.refresh_token:
+        from google.auth.transport.requests import Request
+        creds.refresh(Request())
+        save_credentials(account, creds)
+    return creds
+
+
+def save_credentials(account: Account, creds):
+    """Replaces the account's token file atomically, readable by the owner only."""
+    path = Path(account.token_path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(creds.to_json())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def charge_quota(method_id: str | None, count: int = 1):
+    """Charges the active account's quota budget; a no-op outside multi-account runs."""
+    account = current_account()
+    if account is not None:
+        account.budget.charge(method_id, count)
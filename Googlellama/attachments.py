@@ -0,0 +1,184 @@
+# attachments.py
+
+import os
+import time
+import base64
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from Googlellama import export
+
+_PART = "partId,mimeType,filename,body(size,attachmentId)"
+# Levels of MIME parts below the payload that ATTACHMENT_META_FIELDS describes.
+META_DEPTH = 4
+
+
+def _meta_fields(depth: int) -> str:
+    # The level below the last one only asks for part IDs, so a deeper tree shows up as truncated.
+    if depth == META_DEPTH:
+        return f"{_PART},parts(partId)"
+    return f"{_PART},parts({_meta_fields(depth + 1)})"
+
+
+# format=full without the body data of text parts. Partial responses cannot recurse, so messages
+# nested deeper (forwarded message/rfc822 parts) are fetched again with FULL_PAYLOAD_FIELDS.
+ATTACHMENT_META_FIELDS = f"id,payload({_meta_fields(0)})"
+FULL_PAYLOAD_FIELDS = "id,payload"
+# Base64 characters decoded per step (a multiple of 4), so a large attachment is never decoded in one piece.
+DECODE_STEP = 4 * 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attachments (
+    message_id TEXT NOT NULL,
+    part_id TEXT NOT NULL,
+    filename TEXT,
+    mime_type TEXT,
+    size INTEGER,
+    sha256 TEXT NOT NULL,
+    saved INTEGER,
+    PRIMARY KEY (message_id, part_id)
+);
+CREATE INDEX IF NOT EXISTS attachments_sha256 ON attachments (sha256);
+CREATE TABLE IF NOT EXISTS scanned (
+    message_id TEXT PRIMARY KEY
+);
+"""
+
+
+def is_truncated(resource: dict) -> bool:
+    """Whether a resource fetched with ATTACHMENT_META_FIELDS has parts nested below META_DEPTH."""
+    level = [resource.get("payload", {})]
+    for _ in range(META_DEPTH + 1):
+        level = [child for part in level for child in part.get("parts", [])]
+    return bool(level)
+
+
+def find_attachments(resource: dict) -> list:
+    """Attachment parts of a format=full message resource: partId, filename, mimeType, size and attachmentId."""
+    found = []
+    stack = [resource.get("payload", {})]
+    while stack:
+        part = stack.pop()
+        stack.extend(part.get("parts", []))
+        body = part.get("body", {})
+        if part.get("filename") and (body.get("attachmentId") or body.get("data")):
+            found.append({"partId": part.get("partId", ""), "filename": part["filename"],
+                          "mimeType": part.get("mimeType"), "size": body.get("size", 0),
+                          "attachmentId": body.get("attachmentId"), "data": body.get("data")})
+    return sorted(found, key=lambda a: a["partId"])
+
+
+class AttachmentStore:
+    """
+    Content-addressed attachment store.
+
+    Each distinct attachment is written once to blobs/<aa>/<sha256>, where <aa> is the first
+    two hex digits of its SHA-256, so an attachment sent to many messages takes the space of one.
+    An SQLite index maps (message ID, MIME part ID) to the blob with the original file name and
+    type, and remembers which messages were scanned, so re-runs skip them.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs / sha256[:2] / sha256
+
+    def write_b64(self, data: str) -> tuple[str, int, bool]:
+        """
+        Decodes base64url attachment data step by step into a temporary file while hashing it,
+        then moves it to its content address. Returns (sha256, size, stored); `stored` is False
+        when an identical blob already existed and the new copy was discarded.
+        The blob and its directory entry are fsynced before returning, since callers may
+        delete the message (the only other copy) right after.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.blobs, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                data = data.rstrip("=")
+                for start in range(0, len(data), DECODE_STEP):
+                    piece = data[start:start + DECODE_STEP]
+                    chunk = base64.urlsafe_b64decode(piece + "=" * (-len(piece) % 4))
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            sha256 = digest.hexdigest()
+            target = self.blob_path(sha256)
+            if target.exists():
+                return sha256, size, False
+            if not target.parent.exists():
+                target.parent.mkdir(exist_ok=True)
+                export.sync_dir(self.blobs)
+            os.replace(tmp, target)
+            export.sync_dir(target.parent)
+            return sha256, size, True
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def add(self, message_id: str, attachment: dict, sha256: str, size: int):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO attachments (message_id, part_id, filename, mime_type, size, sha256, saved) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (message_id, attachment["partId"], attachment["filename"], attachment.get("mimeType"), size,
+                 sha256, int(time.time()))
+            )
+
+    def mark_scanned(self, message_ids: list):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO scanned (message_id) VALUES (?)", [(i,) for i in message_ids])
+
+    def scanned(self, message_ids: list) -> set:
+        found = set()
+        with self._lock:
+            for start in range(0, len(message_ids), 500):
+                chunk = message_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT message_id FROM scanned WHERE message_id IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def find(self, message_id: str = None, filename: str = None, limit: int = 100) -> list:
+        """Indexed attachments, newest first, optionally of one message and/or with a file name containing `filename`."""
+        clauses, params = [], []
+        if message_id:
+            clauses.append("message_id = ?")
+            params.append(message_id)
+        if filename:
+            clauses.append("filename LIKE ?")
+            params.append(f"%{filename}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT message_id, part_id, filename, mime_type, size, sha256 FROM attachments {where} "
+                f"ORDER BY saved DESC, message_id, part_id LIMIT ?", params + [limit]
+            ).fetchall()
+        return [{"message_id": m, "part_id": p, "filename": f, "mimeType": t, "size": s, "sha256": h,
+                 "path": str(self.blob_path(h))} for m, p, f, t, s, h in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, blobs, logical = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256), COALESCE(SUM(size), 0) FROM attachments"
+            ).fetchone()
+        return {"attachments": entries, "blobs": blobs, "bytes_referenced": logical}
@@ -0,0 +1,75 @@
+# batch.py
+
+import time
+import random
+import asyncio
+
+from googleapiclient.errors import HttpError
+
+from Googlellama import transport
+
+# Google accepts up to 100 calls per batch; Gmail starts rate limiting above ~50.
+DEFAULT_BATCH_SIZE = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+
+
+def execute_batch(service, requests: list, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Sends `requests` (googleapiclient HttpRequests) as batch HTTP requests of `batch_size` calls.
+    Calls that fail with a rate-limit or server error are retried in a later batch with backoff,
+    as are all unanswered calls of a batch that itself got such an error. Any other failure of a
+    whole batch is returned as the error of each of its unanswered calls, so the calls of the
+    other batches keep their results.
+    Returns a list of (response, exception) pairs in the order of `requests`.
+    """
+    results = [None] * len(requests)
+    pending = list(range(len(requests)))
+    attempt = 0
+    while pending:
+        attempt += 1
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+
+            def callback(request_id, response, exception):
+                index = int(request_id)
+                if (isinstance(exception, HttpError) and exception.resp.status in RETRY_STATUSES
+                        and attempt < MAX_ATTEMPTS):
+                    retry.append(index)
+                else:
+                    results[index] = (response, exception)
+
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                transport.run_execute_hooks(requests[index])
+                batch.add(requests[index], request_id=str(index))
+            try:
+                batch.execute()
+            except Exception as e:
+                unanswered = [i for i in chunk if results[i] is None and i not in retry]
+                if isinstance(e, HttpError) and e.resp.status in RETRY_STATUSES and attempt < MAX_ATTEMPTS:
+                    retry.extend(unanswered)
+                else:
+                    for index in unanswered:
+                        results[index] = (None, e)
+        pending = sorted(retry)
+        if pending:
+            time.sleep(min(2 ** attempt, 16) + random.random())
+    return results
+
+
+async def execute_batch_async(service, requests: list, batch_size: int = DEFAULT_BATCH_SIZE,
+                              concurrency: int = 4) -> list:
+    """Like execute_batch, but up to `concurrency` batches are in flight at once (in worker threads)."""
+    limit = asyncio.Semaphore(max(1, concurrency))
+    chunks = [requests[i:i + batch_size] for i in range(0, len(requests), batch_size)]
+
+    async def run(chunk):
+        async with limit:
+            return await asyncio.to_thread(execute_batch, service, chunk, batch_size)
+
+    results = []
+    for chunk_results in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+        results.extend(chunk_results)
+    return results
@@ -0,0 +1,201 @@
+# cassette.py
+
+import re
+import gzip
+import json
+import time
+import base64
+import hashlib
+import threading
+from pathlib import Path
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httplib2
+
+RECORD = "record"
+REPLAY = "replay"
+
+_BOUNDARY = re.compile(rb'boundary="?([^";]+)"?')
+_CONTENT_ID = re.compile(rb"<([^<>\s]+) \+ \d+>")
+_BASE_PLACEHOLDER = b"@@CONTENT-ID-BASE@@"
+# Headers whose values change between runs and carry nothing the client needs.
+_DROPPED_RESPONSE_HEADERS = {"date", "expires", "alt-svc", "server-timing", "set-cookie", "x-guploader-uploadid"}
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode for a request that the cassette has no recording of."""
+
+
+def _normalize_uri(uri: str) -> str:
+    parts = urlsplit(uri)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def _batch_base(body: bytes) -> bytes | None:
+    """The random Content-ID prefix googleapiclient gives the parts of a batch request."""
+    match = _CONTENT_ID.search(body or b"")
+    return match.group(1) if match else None
+
+
+def _plain_body(body, headers: dict) -> bytes:
+    """The request body as uncompressed bytes."""
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if any(k.lower() == "content-encoding" and v == "gzip" for k, v in (headers or {}).items()):
+        body = gzip.decompress(body)
+    return body
+
+
+def _normalize_body(body, headers: dict) -> bytes:
+    """Request body with the run-specific parts (gzip framing, MIME boundary, batch Content-IDs) removed."""
+    body = _plain_body(body, headers)
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    match = _BOUNDARY.search(headers.get("content-type", "").encode("utf-8"))
+    if match:
+        body = body.replace(match.group(1), b"BOUNDARY")
+    base = _batch_base(body)
+    if base:
+        body = body.replace(base, _BASE_PLACEHOLDER)
+    return body
+
+
+def request_key(method: str, uri: str, body, headers: dict) -> str:
+    digest = hashlib.sha1(_normalize_body(body, headers)).hexdigest()[:16]
+    return f"{method.upper()} {_normalize_uri(uri)} {digest}"
+
+
+class Cassette:
+    """
+    Recorded Google API traffic: request keys mapped to the responses they got, in order.
+
+    A cassette is a gzip-compressed JSON Lines file with one request/response pair per line.
+    Requests are matched on method, URI (query parameters sorted) and a hash of the body, with
+    gzip framing, MIME boundaries and the random Content-ID base of batch requests normalized
+    away; replayed batch responses get the current request's Content-ID base back, so
+    googleapiclient can pair their parts with its callbacks. Identical requests replay their
+    recorded responses in order, and the last one repeats when they run out.
+    """
+
+    def __init__(self, path: Path, mode: str = REPLAY, latency: float = 0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use '{RECORD}' or '{REPLAY}'.")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.entries = []
+        self.calls = 0
+        self.misses = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses.setdefault(entry["key"], deque()).append(entry)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def record(self, method, uri, body, headers, response, content: bytes):
+        base = _batch_base(_plain_body(body, headers))
+        if base:
+            content = content.replace(base, _BASE_PLACEHOLDER)
+        entry = {
+            "key": request_key(method, uri, body, headers),
+            "status": response.status,
+            "headers": {k: v for k, v in response.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS},
+            "content": base64.b64encode(content).decode("ascii"),
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.calls += 1
+
+    def play(self, method, uri, body, headers) -> tuple[httplib2.Response, bytes]:
+        key = request_key(method, uri, body, headers)
+        with self._lock:
+            self.calls += 1
+            queue = self._responses.get(key)
+            if not queue:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded response for {key}")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.latency:
+            time.sleep(self.latency)
+        content = base64.b64decode(entry["content"])
+        base = _batch_base(_plain_body(body, headers))
+        if base:
+            content = content.replace(_BASE_PLACEHOLDER, base)
+        response = httplib2.Response({**entry["headers"], "status": str(entry["status"])})
+        return response, content
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "path": str(self.path), "calls": self.calls, "misses": self.misses,
+                "recorded": len(self.entries)}
+
+
+class RecordingHttp:
+    """Wraps an authorized Http object and records every exchange into a cassette."""
+
+    def __init__(self, http, cassette: Cassette):
+        self.http = http
+        self.cassette = cassette
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        response, content = self.http.request(uri, method=method, body=body, headers=headers,
+                                              redirections=redirections, connection_type=connection_type)
+        self.cassette.record(method, uri, body, headers, response, content)
+        return response, content
+
+    def __getattr__(self, name):
+        # credentials, timeout, close() etc. come from the wrapped Http.
+        return getattr(self.http, name)
+
+
+class ReplayHttp:
+    """
+    Serves responses from a cassette without network access or credentials.
+    Has the httplib2.Http attributes googleapiclient reads (credentials, connections, follow_redirects).
+    """
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.credentials = None
+        self.connections = {}
+        self.follow_redirects = True
+        self.timeout = None
+        self.redirect_codes = set()
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        return self.cassette.play(method, uri, body, headers)
+
+    def close(self):
+        pass
+
+
+def cassette_transport(cassette: Cassette, record_with=None):
+    """
+    Returns a transport factory (see transport.set_transport) bound to `cassette`.
+    In record mode it wraps `record_with(credentials)` (and needs credentials if that does);
+    in replay mode it needs no credentials.
+    """
+    if cassette.mode == RECORD:
+        def factory(credentials):
+            return RecordingHttp(record_with(credentials), cassette)
+        factory.needs_credentials = getattr(record_with, "needs_credentials", True)
+    else:
+        def factory(credentials):
+            return ReplayHttp(cassette)
+        factory.needs_credentials = False
+    factory.cassette = cassette
+    return factory
@@ -0,0 +1,129 @@
+# daemon.py
+
+import os
+import json
+import socket
+import asyncio
+from pathlib import Path
+
+# Largest request or response line (results of big listings can be several MB).
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no daemon accepts connections on the socket; the caller should run the tool itself."""
+
+
+class DaemonCallError(Exception):
+    """A tool call forwarded to the daemon failed there."""
+
+
+def supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+# --- Server ---
+
+async def serve(path: Path, call):
+    """
+    Serves tool calls on a Unix domain socket until a shutdown request arrives.
+
+    The protocol is one JSON object per line in each direction. Requests are
+    {"tool": name, "args": {...}}, {"op": "ping"} or {"op": "shutdown"}. Responses
+    are {"result": ...} or {"error": "..."}. `call(tool, args)` runs a tool; calls
+    from different connections run concurrently in this process, sharing its
+    credentials, API clients, connection pool and caches.
+    """
+    path = Path(path)
+    if path.exists():
+        if await ping(path):
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stop = asyncio.Event()
+
+    async def handle(reader, writer):
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                op = request.get("op", "call")
+                if op == "ping":
+                    response = {"result": {"pid": os.getpid()}}
+                elif op == "shutdown":
+                    response = {"result": "shutting down"}
+                    stop.set()
+                else:
+                    try:
+                        response = {"result": await call(request.get("tool"), request.get("args") or {})}
+                    except Exception as e:
+                        response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+                await writer.drain()
+                if stop.is_set():
+                    break
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    # Create the socket owner-only from the start, so no other user can connect before the chmod.
+    umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(handle, path=str(path), limit=STREAM_LIMIT)
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        path.unlink(missing_ok=True)
+
+
+# --- Client ---
+
+async def request(path: Path, payload: dict, timeout: float = None) -> dict:
+    """
+    Sends one request to the daemon and returns its response.
+    Raises DaemonUnavailable only if no connection could be made, so a request
+    that may already have run is never retried in-process.
+    """
+    if not supported() or not Path(path).exists():
+        raise DaemonUnavailable(f"No daemon socket at {path}")
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(path), limit=STREAM_LIMIT)
+    except OSError as e:
+        raise DaemonUnavailable(str(e))
+    try:
+        writer.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+    if not line:
+        raise ConnectionError("Daemon closed the connection before replying")
+    return json.loads(line)
+
+
+async def ping(path: Path, timeout: float = 2) -> dict | None:
+    """Returns the daemon's status ({"pid": ...}) or None if it is not running."""
+    try:
+        return (await request(path, {"op": "ping"}, timeout))["result"]
+    except (DaemonUnavailable, ConnectionError, asyncio.TimeoutError):
+        return None
+
+
+async def shutdown(path: Path) -> bool:
+    try:
+        await request(path, {"op": "shutdown"}, timeout=10)
+        return True
+    except (DaemonUnavailable, ConnectionError):
+        return False
+
+
+async def call(path: Path, tool: str, args: dict):
+    """Runs a tool in the daemon and returns its result; raises DaemonUnavailable if none is running."""
+    response = await request(path, {"tool": tool, "args": args})
+    if "error" in response:
+        raise DaemonCallError(response["error"])
+    return response["result"]
@@ -0,0 +1,193 @@
+# drive_cache.py
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+FILE_FIELDS = "id,name,mimeType,parents,modifiedTime,md5Checksum,size,trashed"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+PAGE_SIZE = 1000
+
+
+class DriveCache:
+    """
+    Local copy of Drive file metadata (name, parents, mimeType, modifiedTime, md5Checksum, size).
+
+    The first sync lists every file once; later syncs only apply the Changes API feed since
+    the saved start page token, so name and path lookups are answered from memory.
+    The cache is persisted as JSON and syncs at most once per `sync_interval` seconds
+    unless forced.
+    """
+
+    def __init__(self, path: Path, sync_interval: float = 30):
+        self.path = Path(path)
+        self.sync_interval = sync_interval
+        self.files = {}
+        self.root_id = None
+        self.start_page_token = None
+        self.last_sync = 0.0
+        self._by_name = {}
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        # Held by callers that look a name up and create the file if it is missing.
+        self.create_lock = threading.Lock()
+        self._load()
+
+    # --- Persistence ---
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.files = data.get("files", {})
+        self.root_id = data.get("root_id")
+        self.start_page_token = data.get("start_page_token")
+        self._reindex()
+
+    def save(self):
+        with self._lock:
+            data = {"root_id": self.root_id, "start_page_token": self.start_page_token, "files": self.files}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+
+    def _reindex(self):
+        self._by_name = {}
+        for file_id, meta in self.files.items():
+            self._by_name.setdefault(meta.get("name"), set()).add(file_id)
+
+    # --- Updates ---
+
+    def put(self, meta: dict):
+        """Adds or replaces one file's metadata (e.g. right after creating it)."""
+        with self._lock:
+            self.remove(meta["id"])
+            if meta.get("trashed"):
+                return
+            self.files[meta["id"]] = meta
+            self._by_name.setdefault(meta.get("name"), set()).add(meta["id"])
+
+    def remove(self, file_id: str):
+        with self._lock:
+            old = self.files.pop(file_id, None)
+            if old is not None:
+                self._by_name.get(old.get("name"), set()).discard(file_id)
+
+    def bootstrap(self, service):
+        """Lists every non-trashed file once and records the change token to sync from afterwards."""
+        # Take the token first so changes made during the listing are replayed by the next sync.
+        token = service.changes().getStartPageToken(fields="startPageToken").execute()["startPageToken"]
+        root_id = service.files().get(fileId="root", fields="id").execute()["id"]
+        files = {}
+        page_token = None
+        while True:
+            resp = service.files().list(
+                q="trashed=false",
+                spaces="drive",
+                pageSize=PAGE_SIZE,
+                pageToken=page_token,
+                fields=f"nextPageToken,files({FILE_FIELDS})"
+            ).execute()
+            for meta in resp.get("files", []):
+                files[meta["id"]] = meta
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
+        with self._lock:
+            self.files = files
+            self.root_id = root_id
+            self.start_page_token = token
+            self._reindex()
+            self.last_sync = time.monotonic()
+        self.save()
+        return len(files)
+
+    def sync(self, service, force: bool = False) -> int:
+        """Applies pending Drive changes. Returns the number of changes applied."""
+        with self._sync_lock:
+            if not self.start_page_token:
+                self.bootstrap(service)
+                return len(self.files)
+            if not force and time.monotonic() - self.last_sync < self.sync_interval:
+                return 0
+
+            applied = 0
+            page_token = self.start_page_token
+            while page_token:
+                resp = service.changes().list(
+                    pageToken=page_token,
+                    spaces="drive",
+                    pageSize=PAGE_SIZE,
+                    includeRemoved=True,
+                    fields=f"nextPageToken,newStartPageToken,changes(fileId,removed,file({FILE_FIELDS}))"
+                ).execute()
+                with self._lock:
+                    for change in resp.get("changes", []):
+                        meta = change.get("file")
+                        if change.get("removed") or not meta or meta.get("trashed"):
+                            self.remove(change["fileId"])
+                        else:
+                            self.put(meta)
+                        applied += 1
+                if "newStartPageToken" in resp:
+                    self.start_page_token = resp["newStartPageToken"]
+                page_token = resp.get("nextPageToken")
+
+            self.last_sync = time.monotonic()
+            if applied:
+                self.save()
+            return applied
+
+    # --- Lookups ---
+
+    def by_name(self, name: str) -> list:
+        with self._lock:
+            return [self.files[i] for i in self._by_name.get(name, ())]
+
+    def get(self, file_id: str) -> dict | None:
+        return self.files.get(file_id)
+
+    def path_of(self, file_id: str) -> str:
+        """Returns the '/'-separated path of a file from My Drive's root (or its topmost known folder)."""
+        parts = []
+        seen = set()
+        meta = self.files.get(file_id)
+        while meta is not None and meta["id"] not in seen:
+            seen.add(meta["id"])
+            parts.append(meta.get("name", ""))
+            parents = meta.get("parents") or []
+            meta = self.files.get(parents[0]) if parents else None
+        return "/" + "/".join(reversed(parts))
+
+    def resolve_path(self, path: str) -> dict | None:
+        """Finds the file at a '/'-separated path from My Drive's root."""
+        parent = self.root_id
+        meta = None
+        for part in [p for p in path.strip("/").split("/") if p]:
+            meta = next((m for m in self.by_name(part) if parent in (m.get("parents") or [])), None)
+            if meta is None:
+                return None
+            parent = meta["id"]
+        return meta
+
+    def children(self, folder_id: str) -> list:
+        with self._lock:
+            return [m for m in self.files.values() if folder_id in (m.get("parents") or [])]
+
+    def search(self, text: str, mime_type: str = None) -> list:
+        """Files whose name contains `text` (case-insensitive), most recently modified first."""
+        text = (text or "").lower()
+        with self._lock:
+            matches = [
+                m for m in self.files.values()
+                if text in m.get("name", "").lower() and (not mime_type or m.get("mimeType") == mime_type)
+            ]
+        return sorted(matches, key=lambda m: m.get("modifiedTime", ""), reverse=True)
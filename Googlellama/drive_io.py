@@ -0,0 +1,242 @@
+# drive_io.py
+
+import io
+import os
+import json
+import codecs
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+
+# Chunk sizes must be multiples of 256 KiB for resumable uploads.
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+RANGE_PART_SIZE = 16 * 1024 * 1024
+NUM_RETRIES = 3
+
+# Google Workspace files have no binary content; they are exported instead.
+EXPORT_MIME_TYPES = {
+    "application/vnd.google-apps.document": "text/plain",
+    "application/vnd.google-apps.spreadsheet": "text/csv",
+    "application/vnd.google-apps.presentation": "text/plain",
+}
+
+
+def get_file_info(service, file_id: str) -> dict:
+    return service.files().get(fileId=file_id, fields="id,name,mimeType,size,md5Checksum").execute()
+
+
+def media_request(service, file_id: str, info: dict = None):
+    """Returns the download request for a file: an export for Workspace files, get_media otherwise."""
+    info = info or get_file_info(service, file_id)
+    export_type = EXPORT_MIME_TYPES.get(info["mimeType"])
+    if export_type:
+        return service.files().export_media(fileId=file_id, mimeType=export_type)
+    return service.files().get_media(fileId=file_id)
+
+
+# --- Streaming readers ---
+
+def iter_drive_chunks(service, file_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, info: dict = None):
+    """Yields the file's bytes chunk by chunk; at most one chunk is held in memory."""
+    buf = io.BytesIO()
+    downloader = MediaIoBaseDownload(buf, media_request(service, file_id, info), chunksize=chunk_size)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk(num_retries=NUM_RETRIES)
+        if buf.tell():
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+
+def iter_drive_lines(service, file_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = "utf-8"):
+    """Yields the file's text lines (without line endings), decoding incrementally."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in iter_drive_chunks(service, file_id, chunk_size):
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line (or a "\r" whose "\n" is in the next chunk).
+        pending = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        for line in lines:
+            yield line.rstrip("\r\n")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_drive_records(service, file_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yields the records of a JSON Lines file, skipping blank lines."""
+    for line in iter_drive_lines(service, file_id, chunk_size):
+        if line.strip():
+            yield json.loads(line)
+
+
+# --- Parallel ranged download ---
+
+def _download_part(service, file_id: str, fd: int, start: int, end: int):
+    request = service.files().get_media(fileId=file_id)
+    request.headers["range"] = f"bytes={start}-{end}"
+    content = request.execute(num_retries=NUM_RETRIES)
+    if len(content) != end - start + 1:
+        raise IOError(f"Range {start}-{end} returned {len(content)} bytes")
+    os.pwrite(fd, content, start)
+
+
+def download_file(service, file_id: str, dest: Path, workers: int = 4, part_size: int = RANGE_PART_SIZE,
+                  progress=None) -> dict:
+    """
+    Downloads a Drive file straight to `dest`.
+
+    Binary files larger than one part are fetched as parallel HTTP Range requests written
+    in place into a preallocated `<dest>.part` file, so memory stays at `workers * part_size`.
+    Finished parts are recorded in `<dest>.part.json`; an interrupted download resumes with
+    the missing parts only. Workspace files are exported and streamed sequentially.
+    `progress(done_bytes, total_bytes)` is called as parts complete.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    info = get_file_info(service, file_id)
+    size = int(info.get("size", 0) or 0)
+    tmp = dest.with_name(dest.name + ".part")
+    state_path = dest.with_name(dest.name + ".part.json")
+
+    if info["mimeType"] in EXPORT_MIME_TYPES or size <= part_size:
+        with open(tmp, "wb") as f:
+            for chunk in iter_drive_chunks(service, file_id, info=info):
+                f.write(chunk)
+                if progress:
+                    progress(f.tell(), size or None)
+        os.replace(tmp, dest)
+        return {**info, "path": str(dest), "parts": 1}
+
+    parts = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    done = set()
+    if tmp.exists() and state_path.exists():
+        state = json.loads(state_path.read_text())
+        if state.get("md5Checksum") == info.get("md5Checksum") and state.get("size") == size:
+            done = set(state.get("done", []))
+
+    with open(tmp, "r+b" if done else "wb") as f:
+        f.truncate(size)
+        fd = f.fileno()
+        todo = [i for i in range(len(parts)) if i not in done]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(_download_part, service, file_id, fd, *parts[i]): i for i in todo}
+            try:
+                for future in futures:
+                    future.result()
+                    done.add(futures[future])
+                    state_path.write_text(json.dumps({"size": size, "md5Checksum": info.get("md5Checksum"),
+                                                      "done": sorted(done)}))
+                    if progress:
+                        progress(sum(parts[i][1] - parts[i][0] + 1 for i in done), size)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    if info.get("md5Checksum") and file_md5(tmp) != info["md5Checksum"]:
+        tmp.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise IOError(f"Checksum mismatch downloading {info['name']}")
+    os.replace(tmp, dest)
+    state_path.unlink(missing_ok=True)
+    return {**info, "path": str(dest), "parts": len(parts)}
+
+
+def file_md5(path: Path, block_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# --- Resumable chunked upload ---
+
+def _upload_state_path(state_dir: Path, key: str) -> Path:
+    return Path(state_dir) / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.json"
+
+
+def _query_upload_status(request, size: int | None):
+    """
+    Asks Drive how much of a resumable upload session it has received, with an empty PUT
+    carrying `Content-Range: bytes */<size>`. Returns (bytes received, None) for an unfinished
+    upload, or (size, file resource) when the upload had already completed. Raises HttpError
+    for an expired session (404 or 410) and other errors.
+    """
+    headers = {"Content-Range": f"bytes */{size if size is not None else '*'}", "Content-Length": "0"}
+    resp, content = request.http.request(request.resumable_uri, method="PUT", body=b"", headers=headers)
+    if resp.status in (200, 201):
+        return size, request.postproc(resp, content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=request.resumable_uri)
+    # "Range: bytes=0-<last byte received>"; no header means nothing was received yet.
+    received = resp.get("range")
+    return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+
+
+def upload_stream(service, fh, mimetype: str, file_id: str = None, name: str = None, parents: list = None,
+                  state_dir: Path = None, state_key: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  progress=None) -> dict:
+    """
+    Uploads the seekable binary stream `fh` with a chunked resumable upload, updating
+    `file_id` or creating a new file called `name`.
+
+    With `state_dir` and `state_key`, the session URI is saved after the first chunk;
+    a later call with the same key asks Drive how much it already has and continues
+    from there instead of starting over.
+    """
+    media = MediaIoBaseUpload(fh, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+    fields = "id,name,mimeType,size,md5Checksum,modifiedTime"
+    if file_id:
+        request = service.files().update(fileId=file_id, media_body=media, fields=fields)
+    else:
+        body = {"name": name}
+        if parents:
+            body["parents"] = parents
+        request = service.files().create(body=body, media_body=media, fields=fields)
+
+    state_path = _upload_state_path(state_dir, state_key) if state_dir and state_key else None
+    response = None
+    if state_path and state_path.exists():
+        request.resumable_uri = json.loads(state_path.read_text())["resumable_uri"]
+        try:
+            request.resumable_progress, response = _query_upload_status(request, media.size())
+        except HttpError as e:
+            if e.resp.status not in (404, 410):
+                raise
+            # The saved session expired; start a fresh one from the beginning of the stream.
+            state_path.unlink(missing_ok=True)
+            fh.seek(0)
+            return upload_stream(service, fh, mimetype, file_id, name, parents, state_dir, state_key,
+                                 chunk_size, progress)
+
+    while response is None:
+        status, response = request.next_chunk(num_retries=NUM_RETRIES)
+        if state_path and request.resumable_uri and not state_path.exists():
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            state_path.write_text(json.dumps({"resumable_uri": request.resumable_uri}))
+        if status and progress:
+            progress(status.resumable_progress, status.total_size)
+
+    if state_path:
+        state_path.unlink(missing_ok=True)
+    return response
+
+
+def upload_file(service, path: Path, file_id: str = None, name: str = None, mimetype: str = None,
+                parents: list = None, state_dir: Path = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                progress=None) -> dict:
+    """Uploads a local file in resumable chunks; see upload_stream for resume behaviour."""
+    path = Path(path)
+    stat = path.stat()
+    key = f"{path.resolve()}|{file_id or name}|{stat.st_size}|{stat.st_mtime_ns}"
+    with open(path, "rb") as fh:
+        return upload_stream(service, fh, mimetype or "application/octet-stream", file_id=file_id,
+                             name=name or path.name, parents=parents, state_dir=state_dir, state_key=key,
+                             chunk_size=chunk_size, progress=progress)
@@ -0,0 +1,265 @@
+# export.py
+
+import os
+import re
+import gzip
+import itertools
+import json
+import time
+import zlib
+import tempfile
+from pathlib import Path
+from email.utils import parseaddr
+from email.parser import BytesHeaderParser
+
+FORMATS = ("mbox", "files")
+COMPRESSIONS = ("auto", "zstd", "gzip", "none")
+_FROM_LINE = re.compile(rb"^(>*From )", re.MULTILINE)
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_compression(compression: str) -> str:
+    """"auto" picks zstd when the zstandard package is installed, else gzip."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Use one of {', '.join(COMPRESSIONS)}.")
+    if compression == "auto":
+        return "zstd" if zstd_available() else "gzip"
+    if compression == "zstd" and not zstd_available():
+        raise ValueError("zstd compression needs the 'zstandard' package.")
+    return compression
+
+
+def suffix(compression: str) -> str:
+    return {"zstd": ".zst", "gzip": ".gz", "none": ""}[compression]
+
+
+def compress_stream(raw, compression: str):
+    """
+    A writer compressing into the open binary file `raw`; flush() makes everything written so far
+    decodable and close() finishes the stream without closing `raw`. With no compression it is `raw`.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=6).stream_writer(raw, closefd=False)
+    return raw
+
+
+def compression_of(path: Path) -> str:
+    """The compression of an export file, from its suffix."""
+    return {".zst": "zstd", ".gz": "gzip"}.get(Path(path).suffix, "none")
+
+
+def _decompressor(compression: str):
+    """A streaming decompressor and the exception it raises on corrupt input."""
+    if compression == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS), zlib.error
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj(), zstandard.ZstdError
+
+
+def sync_dir(path: Path):
+    """Makes the entries of a directory (new or renamed files) durable. Not possible on Windows."""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def recover_mbox(path: Path, length: int, compression: str):
+    """
+    Rewrites an mbox file left behind by an interrupted export so it holds its first `length`
+    uncompressed bytes (the messages in the manifest) as a complete stream. An interrupted gzip
+    or zstd file has no trailer, and readers such as gzip.open fail at its end with EOFError.
+    """
+    path = Path(path)
+    if compression == "none":
+        with open(path, "r+b") as f:
+            f.truncate(length)
+            os.fsync(f.fileno())
+        return
+    decompressor, corrupt = _decompressor(compression)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as raw, open(path, "rb") as source:
+            out = compress_stream(raw, compression)
+            remaining = length
+            while remaining > 0:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                try:
+                    data = decompressor.decompress(block)
+                except corrupt:
+                    # The bytes after the last flush may be garbage; everything needed came before them.
+                    break
+                out.write(data[:remaining])
+                remaining -= min(len(data), remaining)
+            if remaining > 0:
+                raise ValueError(f"{path.name} holds fewer bytes than its manifest lists.")
+            out.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        sync_dir(path.parent)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def mbox_entry(raw: bytes, internal_date_ms: int | None) -> bytes:
+    """
+    One message in mboxrd form: a "From " separator line, the message with CRLF turned into LF
+    and every line starting with "From " (after any ">") quoted with one more ">", then a blank line.
+    """
+    headers = BytesHeaderParser().parsebytes(raw)
+    sender = parseaddr(headers.get("Return-Path") or headers.get("From") or "")[1] or "MAILER-DAEMON"
+    stamp = time.asctime(time.gmtime((internal_date_ms or 0) / 1000))
+    body = _FROM_LINE.sub(rb">\1", raw.replace(b"\r\n", b"\n"))
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    return f"From {sender} {stamp}\n".encode("utf-8", errors="replace") + body + b"\n"
+
+
+class MboxWriter:
+    """
+    Streams messages into one compressed mbox file. `bytes` is the uncompressed length written;
+    after flush() that much is on disk and decodable even if the process dies before close().
+    The file must not exist yet (FileExistsError otherwise), so a file a manifest lists is never
+    overwritten; `create` picks an unused name.
+    """
+
+    def __init__(self, path: Path, compression: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self.path, "xb")
+        self._fh = compress_stream(self._raw, compression)
+        sync_dir(self.path.parent)
+        self.bytes = 0
+
+    @classmethod
+    def create(cls, root: Path, compression: str) -> "MboxWriter":
+        """A writer on a new export-<timestamp>[-<n>].mbox file in `root`."""
+        stem = time.strftime("export-%Y%m%d-%H%M%S")
+        for n in itertools.count(1):
+            name = stem if n == 1 else f"{stem}-{n}"
+            try:
+                return cls(Path(root) / f"{name}.mbox{suffix(compression)}", compression)
+            except FileExistsError:
+                continue
+
+    def write(self, message_id: str, raw: bytes, internal_date_ms: int | None) -> str:
+        entry = mbox_entry(raw, internal_date_ms)
+        self._fh.write(entry)
+        self.bytes += len(entry)
+        return self.path.name
+
+    def flush(self):
+        self._fh.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def close(self):
+        if self._fh is not self._raw:
+            self._fh.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+
+class FilesWriter:
+    """Writes each message to its own compressed .eml file under messages/<first two ID characters>/."""
+
+    def __init__(self, root: Path, compression: str):
+        self.root = Path(root) / "messages"
+        self.compression = compression
+        self.bytes = 0
+        self._dirty = set()
+
+    def write(self, message_id: str, raw: bytes, internal_date_ms: int | None) -> str:
+        target = self.root / message_id[:2] / f"{message_id}.eml{suffix(self.compression)}"
+        if not target.parent.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._dirty.add(self.root)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                out = compress_stream(f, self.compression)
+                out.write(raw)
+                if out is not f:
+                    out.close()
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self._dirty.add(target.parent)
+        self.bytes += len(raw)
+        return str(target.relative_to(self.root.parent))
+
+    def flush(self):
+        """Makes the renames of the files written since the last flush durable."""
+        for directory in sorted(self._dirty, key=lambda d: len(d.parts), reverse=True):
+            sync_dir(directory)
+        self._dirty.clear()
+
+    def close(self):
+        pass
+
+
+class Manifest:
+    """
+    JSON Lines record of every exported message: {"id", "threadId", "labelIds", "internalDate",
+    "size", "file"}, plus "end" (uncompressed length of the mbox file through this message) in
+    mbox exports. Lines are appended only after the message's data was fsynced, so the IDs in the
+    manifest are the messages a resumed or incremental export can skip. A closed mbox file gets a
+    {"file", "complete": true} line; `unfinished` maps the mbox files without one to their length.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ids = set()
+        self.unfinished = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("complete"):
+                        self.unfinished.pop(entry.get("file"), None)
+                    elif "id" in entry:
+                        self.ids.add(entry["id"])
+                        if "end" in entry:
+                            self.unfinished[entry["file"]] = entry["end"]
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _append(self, entries: list):
+        self._fh.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def add(self, entries: list):
+        self._append(entries)
+        self.ids.update(e["id"] for e in entries)
+
+    def mark_complete(self, file: str):
+        self._append([{"file": file, "complete": True}])
+        self.unfinished.pop(file, None)
+
+    def close(self):
+        self._fh.close()
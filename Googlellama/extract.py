@@ -0,0 +1,110 @@
+# extract.py
+
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+from Googlellama.mime import html_to_text
+
+# Bump when extraction changes so cached texts from older versions are not reused.
+EXTRACTOR_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracted (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    method TEXT,
+    created INTEGER
+);
+"""
+
+
+def content_key(html: str) -> str:
+    """SHA-256 of the HTML plus the extractor version: identical bodies share one cached text."""
+    digest = hashlib.sha256(html.encode("utf-8", errors="replace"))
+    digest.update(f"\0v{EXTRACTOR_VERSION}".encode("ascii"))
+    return digest.hexdigest()
+
+
+def _trafilatura(html: str) -> str | None:
+    try:
+        import trafilatura
+    except ImportError:
+        return None
+    return trafilatura.extract(html, include_comments=False, include_tables=False, include_links=False,
+                               favor_recall=True)
+
+
+def _readability(html: str) -> str | None:
+    try:
+        from readability import Document
+    except ImportError:
+        return None
+    return html_to_text(Document(html).summary(html_partial=True))
+
+
+def extract_main_text(html: str) -> tuple[str, str]:
+    """
+    The main text of an HTML mail body without navigation, footers and tracking boilerplate.
+    Tries trafilatura, then readability, then plain tag stripping. Returns (text, method).
+    """
+    for method, extractor in (("trafilatura", _trafilatura), ("readability", _readability)):
+        try:
+            text = extractor(html)
+        except Exception:
+            # Malformed newsletter markup must not fail the whole chunk.
+            text = None
+        if text and text.strip():
+            return text.strip(), method
+    return html_to_text(html), "html"
+
+
+def extract_many(items: list) -> list:
+    """Process-pool entry point: [(key, html), ...] -> [(key, text, method), ...]."""
+    return [(key, *extract_main_text(html)) for key, html in items]
+
+
+class ExtractCache:
+    """Extracted texts keyed by content_key(), in SQLite, so each distinct HTML body is extracted once."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get_many(self, keys: list) -> dict:
+        """Cached {key: (text, method)} for the keys that have been extracted before."""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, text, method FROM extracted WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update((key, (text, method)) for key, text, method in rows)
+        return found
+
+    def put_many(self, results: list):
+        """Stores [(key, text, method), ...] as returned by extract_many."""
+        now = int(time.time())
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO extracted (key, text, method, created) VALUES (?, ?, ?, ?)",
+                [(key, text, method, now) for key, text, method in results]
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM extracted").fetchone()[0]
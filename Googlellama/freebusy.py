@@ -0,0 +1,87 @@
+# freebusy.py
+
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# freebusy.query accepts at most 50 calendars per request; long ranges are split into windows.
+MAX_CALENDARS_PER_QUERY = 50
+MAX_QUERY_DAYS = 30
+
+
+def parse_time(value: str) -> datetime:
+    """Parses an RFC3339 timestamp (or a date) into an aware datetime; naive values are taken as UTC."""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def format_time(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+def query_windows(start: datetime, end: datetime, days: int = MAX_QUERY_DAYS) -> list:
+    windows = []
+    while start < end:
+        stop = min(end, start + timedelta(days=days))
+        windows.append((start, stop))
+        start = stop
+    return windows
+
+
+def merge_intervals(intervals: list) -> list:
+    """Sort-and-sweep union of (start, end) intervals; overlapping and touching intervals are merged."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def working_windows(start: datetime, end: datetime, tz: ZoneInfo, day_start: time, day_end: time,
+                    weekdays: set) -> list:
+    """The working-hours windows between start and end, one per working day, in the given time zone."""
+    windows = []
+    day = start.astimezone(tz).date()
+    last = end.astimezone(tz).date()
+    while day <= last:
+        if day.weekday() in weekdays:
+            opens = datetime.combine(day, day_start, tz)
+            closes = datetime.combine(day, day_end, tz)
+            opens, closes = max(opens, start), min(closes, end)
+            if opens < closes:
+                windows.append((opens, closes))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_slots(busy: list, windows: list, min_duration: timedelta) -> list:
+    """
+    Subtracts merged, sorted busy intervals from sorted windows in one sweep
+    and keeps the gaps lasting at least `min_duration`.
+    """
+    slots = []
+    i = 0
+    for w_start, w_end in windows:
+        # Busy intervals that ended before this window cannot affect later windows either.
+        while i < len(busy) and busy[i][1] <= w_start:
+            i += 1
+        cursor = w_start
+        j = i
+        while j < len(busy) and busy[j][0] < w_end:
+            if busy[j][0] - cursor >= min_duration:
+                slots.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if w_end - cursor >= min_duration:
+            slots.append((cursor, w_end))
+    return slots
+
+
+def parse_hours(hours: str) -> tuple[time, time]:
+    """Parses "HH:MM-HH:MM" working hours."""
+    opens, closes = (time.fromisoformat(part.strip()) for part in hours.split("-"))
+    if closes <= opens:
+        raise ValueError(f"Working hours must end after they start: {hours}")
+    return opens, closes
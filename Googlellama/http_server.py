@@ -0,0 +1,142 @@
+# http_server.py
+
+import hmac
+import time
+import json
+import asyncio
+import ipaddress
+
+SESSION_HEADER = b"mcp-session-id"
+DEFAULT_SESSION_CONCURRENCY = 4
+# Sessions idle this long lose their limiter state (clients that never sent DELETE).
+SESSION_IDLE_SECONDS = 3600
+# Load-balancer checks answer without a token; they run no tools.
+PUBLIC_PATHS = {"/healthz", "/readyz"}
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_bind(host: str, token: str | None):
+    """Raises ValueError for a bind that would expose the tools to other machines without a token."""
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to serve on {host} without HTTP_TOKEN: anyone who can reach it could call "
+                         f"every tool with your Google credentials. Set HTTP_TOKEN in .env or bind to 127.0.0.1.")
+
+
+class BearerAuth:
+    """
+    ASGI middleware that rejects HTTP requests without `Authorization: Bearer <token>`
+    (except PUBLIC_PATHS) with 401.
+    """
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.expected = f"Bearer {token}".encode("utf-8")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in PUBLIC_PATHS:
+            return await self.app(scope, receive, send)
+        given = dict(scope.get("headers") or []).get(b"authorization", b"")
+        if not hmac.compare_digest(given, self.expected):
+            response = json_response({"error": "Missing or invalid bearer token."}, 401)
+            response.headers["WWW-Authenticate"] = "Bearer"
+            return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+class SessionLimiter:
+    """
+    ASGI middleware that caps concurrent requests per MCP session.
+
+    Streamable HTTP clients identify their session with the Mcp-Session-Id header. Each session
+    may have at most `max_concurrent` POST requests (tool calls and other JSON-RPC messages)
+    in progress; further ones wait for a slot, so one busy agent cannot take over the shared
+    connection pool. GET requests (the long-lived server-to-client stream) are not counted.
+    """
+
+    def __init__(self, app, max_concurrent: int = DEFAULT_SESSION_CONCURRENCY):
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.sessions = {}
+        self.in_flight = 0
+
+    def _session(self, session: str) -> dict:
+        now = time.monotonic()
+        entry = self.sessions.get(session)
+        if entry is None:
+            self._prune(now)
+            entry = self.sessions[session] = {"slots": asyncio.Semaphore(self.max_concurrent), "active": 0}
+        entry["used"] = now
+        return entry
+
+    def _prune(self, now: float):
+        idle = [s for s, e in self.sessions.items() if not e["active"] and now - e["used"] > SESSION_IDLE_SECONDS]
+        for session in idle:
+            del self.sessions[session]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        session = dict(scope.get("headers") or []).get(SESSION_HEADER)
+        if session and scope["method"] == "DELETE":
+            self.sessions.pop(session.decode("latin-1"), None)
+        if not session or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        entry = self._session(session.decode("latin-1"))
+        entry["active"] += 1
+        try:
+            async with entry["slots"]:
+                self.in_flight += 1
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    self.in_flight -= 1
+        finally:
+            entry["active"] -= 1
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.sessions), "in_flight": self.in_flight,
+                "max_concurrent_per_session": self.max_concurrent}
+
+
+def json_response(payload: dict, status: int = 200):
+    from starlette.responses import Response
+    return Response(json.dumps(payload, default=str), status_code=status, media_type="application/json")
+
+
+def build_app(mcp, readiness, max_concurrent: int = DEFAULT_SESSION_CONCURRENCY, token: str = None):
+    """
+    The MCP server's streamable HTTP ASGI app with /healthz and /readyz added and
+    per-session concurrency limits applied. With `token`, every other request needs it as a bearer token.
+
+    /healthz answers 200 while the process serves requests. /readyz calls `readiness()`,
+    which returns (ready, details), and answers 200 or 503 for load-balancer checks.
+    """
+    if not hasattr(mcp, "streamable_http_app"):
+        raise RuntimeError("The installed MCP server does not support the streamable HTTP transport (mcp>=1.8 needed).")
+    limiter = None
+
+    @mcp.custom_route("/healthz", methods=["GET"])
+    async def healthz(request):
+        return json_response({"status": "ok"})
+
+    @mcp.custom_route("/readyz", methods=["GET"])
+    async def readyz(request):
+        ready, details = readiness()
+        return json_response({"ready": ready, **details, **limiter.stats()}, 200 if ready else 503)
+
+    limiter = SessionLimiter(mcp.streamable_http_app(), max_concurrent)
+    return BearerAuth(limiter, token) if token else limiter
+
+
+async def serve(app, host: str, port: int, log_level: str = "info"):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level=log_level, lifespan="on"))
+    await server.serve()
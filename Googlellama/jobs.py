@@ -0,0 +1,199 @@
+# jobs.py
+
+import time
+import uuid
+import asyncio
+import contextvars
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+class JobLimitError(Exception):
+    """Raised when a job is submitted while the queue is full."""
+
+
+class Job:
+    """A long-running tool invocation executed in the background."""
+
+    def __init__(self, name: str, args: dict = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.args = args or {}
+        self.status = QUEUED
+        self.progress = 0
+        self.total = None
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.task = None
+        self.loop = None
+        self._waiters = set()
+
+    def notify(self):
+        # Progress may be reported from worker threads (asyncio.to_thread); wake waiters on the job's loop.
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self.loop is not None and running is not self.loop:
+            self.loop.call_soon_threadsafe(self._wake)
+        else:
+            self._wake()
+
+    def _wake(self):
+        for event in self._waiters:
+            event.set()
+
+    def update(self, progress=None, total=None, message=None):
+        if progress is not None:
+            self.progress = progress
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self.notify()
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.id,
+            "name": self.name,
+            "args": self.args,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if include_result and self.status in FINISHED_STATES:
+            data["result"] = self.result
+            data["error"] = self.error
+        return data
+
+
+_current_job = contextvars.ContextVar("googlellama_job", default=None)
+
+
+def current_job() -> Job | None:
+    return _current_job.get()
+
+
+def report_progress(progress=None, total=None, message=None):
+    """Updates the progress of the job running in the current task; a no-op outside jobs."""
+    job = _current_job.get()
+    if job is not None:
+        job.update(progress=progress, total=total, message=message)
+
+
+class JobManager:
+    """
+    Runs coroutines as background jobs.
+    At most `max_running` jobs execute at once; further jobs wait in the queue,
+    and submissions fail with JobLimitError once `max_queued` jobs are waiting.
+    The `keep_finished` most recent finished jobs are kept for polling.
+    """
+
+    def __init__(self, max_running: int = 2, max_queued: int = 20, keep_finished: int = 100):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self._slots = None
+
+    def active(self) -> list:
+        return [j for j in self.jobs.values() if j.status not in FINISHED_STATES]
+
+    def submit(self, name: str, factory, args: dict = None) -> Job:
+        """Schedules `factory()` (a coroutine function) as a job and returns it immediately."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        active = self.active()
+        if len(active) >= self.max_running + self.max_queued:
+            raise JobLimitError(f"Job queue is full ({len(active)} jobs queued or running).")
+
+        job = Job(name, args)
+        job.loop = asyncio.get_running_loop()
+        self.jobs[job.id] = job
+        job.task = job.loop.create_task(self._run(job, factory))
+        job.task.add_done_callback(lambda _: self._mark_cancelled(job))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, factory):
+        _current_job.set(job)
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started = time.time()
+                job.notify()
+                job.result = await factory()
+                job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = time.time()
+            job.notify()
+
+    def _mark_cancelled(self, job: Job):
+        # A job cancelled before its coroutine started never reaches _run's handlers.
+        if job.status not in FINISHED_STATES:
+            job.status = CANCELLED
+            job.finished = time.time()
+            job.notify()
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j.status in FINISHED_STATES), key=lambda j: j.finished)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def list(self) -> list:
+        return sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Requests cancellation; it takes effect at the job's next await."""
+        job = self.jobs.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.task.cancel()
+        return job
+
+    async def wait(self, job_id: str, timeout: float = None, on_progress=None) -> Job | None:
+        """
+        Waits until the job finishes or `timeout` seconds pass.
+        `on_progress(job)` is awaited on every progress update in between.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = asyncio.Event()
+        job._waiters.add(changed)
+        try:
+            while job.status not in FINISHED_STATES:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                changed.clear()
+                if on_progress is not None:
+                    await on_progress(job)
+        finally:
+            job._waiters.discard(changed)
+        return job
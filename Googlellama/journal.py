@@ -0,0 +1,136 @@
+# journal.py
+
+import os
+import json
+import hashlib
+import threading
+import contextvars
+from pathlib import Path
+
+
+class MutationJournal:
+    """
+    Append-only JSONL log of the mutation chunks of one bulk run.
+
+    Each chunk is identified by a key derived from its action and query and is written
+    twice at most: once when planned (with the message IDs it will touch) and once when
+    done (with its result). Lines are short, written in one call and fsynced, so the
+    cost is one small write per chunk of up to 1000 messages.
+
+    A run that is restarted after a crash re-opens the same journal: finished chunks
+    are skipped and planned ones are replayed from their recorded IDs without
+    searching again. A run that completes removes its journal; if a chunk failed, only
+    the failed chunks' planned entries are kept, so the next run retries them and runs
+    every other stage and chunk afresh.
+    """
+
+    def __init__(self, path: Path, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.planned = {}
+        self.done = {}
+        self.failed = set()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._fh = open(self.path, "a", encoding="utf-8")
+        if self._fh.tell() and not self._ends_with_newline():
+            # Terminate a torn last line so the next entry starts on its own line.
+            self._fh.write("\n")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves at most one torn line at the end.
+                    continue
+                if entry.get("s") == "p":
+                    self.planned[entry["k"]] = entry
+                elif entry.get("s") == "d":
+                    self.done[entry["k"]] = entry.get("r")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.planned or self.done)
+
+    @staticmethod
+    def key(action: str, query: str) -> str:
+        return hashlib.sha1(f"{action}\0{query}".encode("utf-8")).hexdigest()[:16]
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def result(self, key: str):
+        return self.done.get(key)
+
+    def planned_ids(self, key: str) -> list | None:
+        entry = self.planned.get(key)
+        return entry["ids"] if entry else None
+
+    def plan(self, key: str, action: str, ids: list):
+        entry = {"k": key, "s": "p", "a": action, "ids": ids}
+        self.planned[key] = entry
+        self._append(entry)
+
+    def complete(self, key: str, result=None):
+        self.done[key] = result
+        self.failed.discard(key)
+        self._append({"k": key, "s": "d", "r": result})
+
+    def fail(self, key: str):
+        """Notes a chunk that failed in this run; it stays unfinished in the journal."""
+        self.failed.add(key)
+
+    def close(self, finished: bool = False):
+        """
+        Closes the journal. A finished run deletes it, or, if a chunk failed, rewrites it to
+        the planned entries of the failed chunks, so the next run only resumes those.
+        """
+        with self._lock:
+            self._fh.close()
+        if not finished:
+            return
+        kept = [self.planned[key] for key in sorted(self.failed) if key in self.planned]
+        if not kept:
+            self.path.unlink(missing_ok=True)
+            return
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in kept:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+_current_journal = contextvars.ContextVar("googlellama_journal", default=None)
+
+
+def current() -> MutationJournal | None:
+    return _current_journal.get()
+
+
+def activate(journal: MutationJournal | None):
+    return _current_journal.set(journal)
+
+
+def deactivate(token):
+    _current_journal.reset(token)
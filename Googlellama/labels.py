@@ -0,0 +1,140 @@
+# labels.py
+
+import time
+import threading
+
+LABEL_LIST_FIELDS = "labels(id,name,type)"
+LABEL_FIELDS = "id,name,type"
+DEFAULT_TTL = 300
+# batchModify accepts at most 1000 message IDs per call.
+MODIFY_CHUNK = 1000
+
+
+class LabelNotFound(Exception):
+    """Raised when a label name or ID does not exist in the mailbox."""
+
+
+class LabelRegistry:
+    """
+    Cached map of one mailbox's label names to IDs.
+
+    The label list is fetched once and reused for `ttl` seconds. Every label change
+    made through the registry updates the cache directly. A name that is not in the
+    cache triggers one refresh before it is reported missing, so labels created
+    elsewhere are still found.
+    Lookups accept label IDs, system label names ("INBOX", "UNREAD") and user label
+    names, case-insensitively.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self.by_id = {}
+        self.by_name = {}
+        self.loaded = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded = 0.0
+
+    def _store(self, label: dict):
+        self.by_id[label["id"]] = label
+        self.by_name[label["name"].lower()] = label
+
+    def _forget(self, label_id: str):
+        label = self.by_id.pop(label_id, None)
+        if label is not None:
+            self.by_name.pop(label["name"].lower(), None)
+
+    def refresh(self, service):
+        resp = service.users().labels().list(userId="me", fields=LABEL_LIST_FIELDS).execute()
+        with self._lock:
+            self.by_id = {}
+            self.by_name = {}
+            for label in resp.get("labels", []):
+                self._store(label)
+            self.loaded = time.monotonic()
+
+    def _ensure(self, service):
+        if time.monotonic() - self.loaded > self.ttl:
+            self.refresh(service)
+
+    def labels(self, service) -> list:
+        self._ensure(service)
+        with self._lock:
+            return sorted(self.by_id.values(), key=lambda l: (l.get("type") != "system", l["name"].lower()))
+
+    def _lookup(self, name_or_id: str) -> dict | None:
+        with self._lock:
+            return (self.by_id.get(name_or_id) or self.by_id.get(name_or_id.upper())
+                    or self.by_name.get(name_or_id.lower()))
+
+    def get(self, service, name_or_id: str) -> dict:
+        self._ensure(service)
+        label = self._lookup(name_or_id)
+        if label is None:
+            self.refresh(service)
+            label = self._lookup(name_or_id)
+        if label is None:
+            raise LabelNotFound(f"Label not found: {name_or_id}")
+        return label
+
+    def resolve(self, service, name_or_id: str, create: bool = False) -> str:
+        """Returns the ID of a label given its name or ID, creating a missing user label if `create` is set."""
+        try:
+            return self.get(service, name_or_id)["id"]
+        except LabelNotFound:
+            if not create:
+                raise
+            return self.create(service, name_or_id)["id"]
+
+    def resolve_many(self, service, names: list, create: bool = False) -> list:
+        return [self.resolve(service, n, create) for n in names or []]
+
+    # --- Label changes ---
+
+    def create(self, service, name: str) -> dict:
+        label = service.users().labels().create(
+            userId="me",
+            body={"name": name, "labelListVisibility": "labelShow", "messageListVisibility": "show"},
+            fields=LABEL_FIELDS
+        ).execute()
+        with self._lock:
+            self._store(label)
+        return label
+
+    def rename(self, service, name_or_id: str, new_name: str) -> list:
+        """Renames a user label and its nested labels ("Old/Child" becomes "New/Child"). Returns the renamed labels."""
+        label = self.get(service, name_or_id)
+        old_prefix = label["name"] + "/"
+        nested = [l for l in self.labels(service) if l["name"].startswith(old_prefix)]
+        renamed = []
+        for target, name in [(label, new_name)] + [(l, new_name + "/" + l["name"][len(old_prefix):]) for l in nested]:
+            updated = service.users().labels().patch(userId="me", id=target["id"], body={"name": name},
+                                                     fields=LABEL_FIELDS).execute()
+            with self._lock:
+                self._forget(target["id"])
+                self._store(updated)
+            renamed.append(updated)
+        return renamed
+
+    def delete(self, service, name_or_id: str):
+        label = self.get(service, name_or_id)
+        service.users().labels().delete(userId="me", id=label["id"]).execute()
+        with self._lock:
+            self._forget(label["id"])
+
+
+def batch_modify(service, ids: list, add_ids: list = None, remove_ids: list = None, progress=None) -> int:
+    """Applies label changes to messages with batchModify, MODIFY_CHUNK IDs per call. Returns the count."""
+    done = 0
+    for start in range(0, len(ids), MODIFY_CHUNK):
+        chunk = ids[start:start + MODIFY_CHUNK]
+        service.users().messages().batchModify(
+            userId="me",
+            body={"ids": chunk, "addLabelIds": add_ids or [], "removeLabelIds": remove_ids or []}
+        ).execute()
+        done += len(chunk)
+        if progress:
+            progress(done, len(ids))
+    return done
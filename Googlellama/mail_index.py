@@ -0,0 +1,200 @@
+# mail_index.py
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+
+# Gmail-style field names accepted in queries, mapped to index columns.
+FIELD_ALIASES = {"from": "sender", "to": "recipients", "cc": "recipients"}
+# Column weights for bm25(): subject and sender matches rank above body matches.
+BM25_WEIGHTS = (5.0, 3.0, 1.5, 1.0)
+SCHEMA_VERSION = 1
+
+# The text lives in `messages`; message_fts is an external-content FTS5 table keyed by its rowid,
+# kept in step by triggers, so replacing or removing a message touches only that message's postings.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    thread_id TEXT,
+    date INTEGER,
+    labels TEXT,
+    subject TEXT,
+    sender TEXT,
+    recipients TEXT,
+    body TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+    subject, sender, recipients, body,
+    content = 'messages', content_rowid = 'rowid',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO message_fts (rowid, subject, sender, recipients, body)
+    VALUES (new.rowid, new.subject, new.sender, new.recipients, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO message_fts (message_fts, rowid, subject, sender, recipients, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO message_fts (message_fts, rowid, subject, sender, recipients, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.body);
+    INSERT INTO message_fts (rowid, subject, sender, recipients, body)
+    VALUES (new.rowid, new.subject, new.sender, new.recipients, new.body);
+END;
+"""
+
+# Indexes built before SCHEMA_VERSION 1 kept the text in an FTS5 table with an UNINDEXED id
+# column, which made every replace or remove scan the whole table.
+MIGRATE_V0 = """
+ALTER TABLE messages RENAME TO messages_v0;
+ALTER TABLE message_fts RENAME TO message_fts_v0;
+""" + SCHEMA + """
+INSERT INTO messages (id, thread_id, date, labels, subject, sender, recipients, body)
+SELECT m.id, m.thread_id, m.date, m.labels, f.subject, f.sender, f.recipients, f.body
+FROM message_fts_v0 f CROSS JOIN messages_v0 m ON m.id = f.id;
+DROP TABLE message_fts_v0;
+DROP TABLE messages_v0;
+"""
+
+UPSERT = """
+INSERT INTO messages (id, thread_id, date, labels, subject, sender, recipients, body)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    thread_id = excluded.thread_id, date = excluded.date, labels = excluded.labels,
+    subject = excluded.subject, sender = excluded.sender, recipients = excluded.recipients,
+    body = CASE WHEN ? AND length(excluded.body) < length(body) THEN body ELSE excluded.body END
+"""
+
+
+def _epoch(date_header: str | None) -> int | None:
+    if not date_header:
+        return None
+    try:
+        return int(parsedate_to_datetime(date_header).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _quote_terms(query: str) -> str:
+    """Fallback for input that is not valid FTS5 syntax: every word becomes a literal term."""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class MailIndex:
+    """
+    On-disk full-text index of mail (SQLite FTS5) over subject, sender, recipients and body.
+
+    FTS5 keeps an inverted index with prefix indexes for 2- and 3-character prefixes, so
+    term, prefix (`invoic*`) and phrase (`"quarterly report"`) queries are answered without
+    scanning messages; results are ranked with BM25. Column filters use the index column
+    names or Gmail's `from:`, `to:` and `cc:`. Messages are added as they are fetched, so
+    the index grows incrementally.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        old = self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'message_fts'").fetchone()
+        self._db.executescript(f"BEGIN; {MIGRATE_V0 if old else SCHEMA} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- Updates ---
+
+    def add(self, summaries: list) -> int:
+        """
+        Adds or replaces messages given as mime.summarize_message dicts. Returns the number indexed.
+        A truncated body shorter than the one already indexed (e.g. fetched with a smaller
+        max_chars) does not replace it.
+        """
+        rows = [s for s in summaries if s.get("id") and "error" not in s]
+        with self._lock, self._db:
+            self._db.executemany(UPSERT, [
+                (s["id"], s.get("threadId"), _epoch(s.get("Date")), ",".join(s.get("labelIds") or []),
+                 s.get("Subject", ""), s.get("From", ""), " ".join(filter(None, (s.get("To"), s.get("Cc")))),
+                 s.get("text", ""), bool(s.get("truncated")))
+                for s in rows
+            ])
+        return len(rows)
+
+    def remove(self, ids: list):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in ids])
+
+    def known_ids(self, ids: list) -> set:
+        known = set()
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                known.update(r[0] for r in self._db.execute(f"SELECT id FROM messages WHERE id IN ({marks})", chunk))
+        return known
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM messages").fetchone()[0]
+
+    # --- Search ---
+
+    @staticmethod
+    def to_fts_query(query: str) -> str:
+        return re.sub(r"\b(from|to|cc):", lambda m: FIELD_ALIASES[m.group(1).lower()] + ":", query.strip(),
+                      flags=re.IGNORECASE)
+
+    def _search(self, match: str, limit: int, offset: int) -> list:
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        sql = f"""
+            SELECT m.id, m.thread_id, m.date, m.subject, m.sender,
+                   snippet(message_fts, 3, '[', ']', '…', 12), bm25(message_fts, {weights}) AS score
+            FROM message_fts f JOIN messages m ON m.rowid = f.rowid
+            WHERE message_fts MATCH ?
+            ORDER BY score, m.date DESC
+            LIMIT ? OFFSET ?
+        """
+        with self._lock:
+            return self._db.execute(sql, (match, limit, offset)).fetchall()
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> list:
+        """
+        Ranked matches, best first, as dicts with id, threadId, date (epoch), Subject, From, snippet and score.
+        Raises ValueError for a query with nothing to search for.
+        """
+        match = self.to_fts_query(query)
+        try:
+            rows = self._search(match, limit, offset)
+        except sqlite3.OperationalError:
+            quoted = _quote_terms(match)
+            if not quoted:
+                raise ValueError(f"Nothing to search for in '{query}'.")
+            try:
+                rows = self._search(quoted, limit, offset)
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Cannot search for '{query}': {e}")
+        return [
+            {"id": r[0], "threadId": r[1], "date": r[2], "Subject": r[3], "From": r[4],
+             "snippet": r[5], "score": round(-r[6], 4)}
+            for r in rows
+        ]
@@ -0,0 +1,130 @@
+# mailmerge.py
+
+import csv
+import json
+import time
+import base64
+import asyncio
+import hashlib
+from pathlib import Path
+from string import Template
+from email.mime.text import MIMEText
+
+# Gmail allows 250 quota units per user per second and a send costs 100,
+# so sustained sending tops out at 2.5 messages per second.
+DEFAULT_SEND_RATE = 2.0
+RENDER_CHUNK = 100
+RECIPIENT_KEYS = ("to", "email", "Email", "EMAIL")
+
+
+def iter_recipients(path: Path):
+    """Yields recipient dicts from a CSV file (with a header row), a JSON Lines file or a .json file holding an array."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".json":
+            recipients = json.load(f)
+            if not isinstance(recipients, list):
+                raise ValueError(f"{path.name} must hold a JSON array of recipients")
+            yield from recipients
+        elif path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def recipient_address(recipient: dict) -> str | None:
+    return next((recipient[k] for k in RECIPIENT_KEYS if recipient.get(k)), None)
+
+
+def render_message(subject: str, body: str, recipient: dict, html: bool = False) -> dict:
+    """
+    Fills `$field` / `${field}` placeholders in the subject and body from the recipient's fields
+    and returns {"to", "raw"} ready for messages.send, or {"to", "error"} if a field is missing.
+    """
+    to = recipient_address(recipient)
+    if not to:
+        return {"to": None, "error": "Recipient has no 'to' or 'email' field"}
+    try:
+        msg = MIMEText(Template(body).substitute(recipient), "html" if html else "plain", "utf-8")
+        msg["to"] = to
+        msg["subject"] = Template(subject).substitute(recipient)
+    except (KeyError, ValueError) as e:
+        return {"to": to, "error": f"Template field missing or invalid: {e}"}
+    return {"to": to, "raw": base64.urlsafe_b64encode(msg.as_bytes()).decode()}
+
+
+def render_messages(subject: str, body: str, recipients: list, html: bool = False) -> list:
+    """Process-pool entry point: renders a chunk of recipients."""
+    return [render_message(subject, body, r, html) for r in recipients]
+
+
+class RateLimiter:
+    """Async token bucket: at most `rate` acquisitions per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow_down(self, factor: float = 0.5, minimum: float = 0.1):
+        """Lowers the rate after the server pushed back."""
+        self.rate = max(minimum, self.rate * factor)
+
+
+class SendLog:
+    """
+    Per-recipient results of one bulk send, appended as JSON Lines.
+
+    Each line is {"i": recipient index, "to", "status": "sent" | "failed" | "unknown", "id" or "error"}.
+    "unknown" marks a send that got a server error or lost its connection, so the message may or may not have gone out.
+    Re-running the same send reads the log back and skips recipients already sent and those
+    left unknown, which need a manual check rather than a second copy.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sent = set()
+        self.unknown = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("status") == "sent":
+                        self.sent.add(entry["i"])
+                    elif entry.get("status") == "unknown":
+                        self.unknown.add(entry["i"])
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def key(recipients_path: Path, subject: str, body: str) -> str:
+        return hashlib.sha1(f"{Path(recipients_path).resolve()}\0{subject}\0{body}".encode("utf-8")).hexdigest()[:16]
+
+    def record(self, index: int, to: str, status: str, **extra):
+        self._fh.write(json.dumps({"i": index, "to": to, "status": status, **extra}) + "\n")
+        self._fh.flush()
+        if status == "sent":
+            self.sent.add(index)
+        elif status == "unknown":
+            self.unknown.add(index)
+
+    def close(self):
+        self._fh.close()
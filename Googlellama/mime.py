@@ -0,0 +1,188 @@
+# mime.py
+
+import base64
+from email import policy
+from email.parser import BytesParser, BytesHeaderParser
+from functools import cached_property
+from html.parser import HTMLParser
+
+DEFAULT_MAX_CHARS = 4000
+SUMMARY_HEADERS = ("Subject", "From", "To", "Cc", "Date")
+
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+# --- HTML to text ---
+
+class _TextExtractor(HTMLParser):
+    BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote", "pre"}
+    SKIP_TAGS = {"script", "style", "head", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Visible text of an HTML document, one line per block element, whitespace collapsed."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+# --- Lazy message ---
+
+class LazyMessage:
+    """
+    A Gmail message resource fetched with format=raw or format=full.
+
+    Nothing is decoded up front: headers are parsed on first access (for raw messages
+    without touching the body), and a body part is only base64-decoded and charset-decoded
+    when its text is asked for. Attachments are listed from part metadata only.
+    """
+
+    def __init__(self, resource: dict):
+        self.resource = resource
+        self.id = resource.get("id")
+        self.thread_id = resource.get("threadId")
+        self.label_ids = resource.get("labelIds", [])
+        self.snippet = resource.get("snippet", "")
+        self.is_raw = "raw" in resource
+
+    @cached_property
+    def raw_bytes(self) -> bytes:
+        return b64url_decode(self.resource["raw"])
+
+    @cached_property
+    def email(self):
+        """The fully parsed email.message.EmailMessage (raw messages only)."""
+        return BytesParser(policy=policy.default).parsebytes(self.raw_bytes)
+
+    @cached_property
+    def headers(self) -> dict:
+        """Message headers by name; the first occurrence wins."""
+        if self.is_raw:
+            parsed = BytesHeaderParser(policy=policy.default).parsebytes(self.raw_bytes)
+            items = [(name, str(value)) for name, value in parsed.items()]
+        else:
+            items = [(h["name"], h["value"]) for h in self.resource.get("payload", {}).get("headers", [])]
+        headers = {}
+        for name, value in items:
+            headers.setdefault(name, value)
+        return headers
+
+    def header(self, name: str, default=None):
+        lowered = name.lower()
+        return next((v for k, v in self.headers.items() if k.lower() == lowered), default)
+
+    # --- Parts of format=full payloads ---
+
+    def _walk_payload(self):
+        stack = [self.resource.get("payload", {})]
+        while stack:
+            part = stack.pop(0)
+            yield part
+            stack[0:0] = part.get("parts", [])
+
+    @staticmethod
+    def _part_charset(part: dict) -> str:
+        for h in part.get("headers", []):
+            if h["name"].lower() == "content-type" and "charset=" in h["value"].lower():
+                value = h["value"][h["value"].lower().index("charset=") + 8:]
+                return value.split(";")[0].strip().strip('"\'') or "utf-8"
+        return "utf-8"
+
+    @staticmethod
+    def _decode_bytes(data: bytes, charset: str) -> str:
+        try:
+            return data.decode(charset, errors="replace")
+        except LookupError:
+            return data.decode("utf-8", errors="replace")
+
+    def _full_body(self, subtype: str) -> str | None:
+        for part in self._walk_payload():
+            if part.get("mimeType") == f"text/{subtype}" and not part.get("filename") and part.get("body", {}).get("data"):
+                return self._decode_bytes(b64url_decode(part["body"]["data"]), self._part_charset(part))
+        return None
+
+    def _raw_body(self, subtype: str) -> str | None:
+        part = self.email.get_body(preferencelist=(subtype,))
+        if part is None:
+            return None
+        try:
+            return part.get_content()
+        except (LookupError, ValueError):
+            return self._decode_bytes(part.get_payload(decode=True) or b"", "utf-8")
+
+    def body(self, subtype: str) -> str | None:
+        """The decoded text/<subtype> body, or None if the message has none."""
+        return self._raw_body(subtype) if self.is_raw else self._full_body(subtype)
+
+    def text(self, max_chars: int = DEFAULT_MAX_CHARS) -> tuple[str, bool]:
+        """
+        The readable body: text/plain if present, else text extracted from text/html.
+        Returns (text, truncated) with the text cut to `max_chars` characters.
+        """
+        text = self.body("plain")
+        if text is None:
+            html = self.body("html")
+            text = html_to_text(html) if html else ""
+        text = text.strip()
+        if max_chars and len(text) > max_chars:
+            return text[:max_chars], True
+        return text, False
+
+    def attachments(self) -> list:
+        if self.is_raw:
+            return [
+                {"filename": part.get_filename(), "mimeType": part.get_content_type(),
+                 "size": len(part.get_payload(decode=True) or b"")}
+                for part in self.email.iter_attachments()
+            ]
+        return [
+            {"filename": part["filename"], "mimeType": part.get("mimeType"),
+             "size": part.get("body", {}).get("size", 0), "attachmentId": part.get("body", {}).get("attachmentId")}
+            for part in self._walk_payload() if part.get("filename")
+        ]
+
+
+def summarize_message(resource: dict, max_chars: int = DEFAULT_MAX_CHARS, include_attachments: bool = True) -> dict:
+    """Decodes one message resource into a plain dict (headers, readable text, attachment list)."""
+    msg = LazyMessage(resource)
+    text, truncated = msg.text(max_chars)
+    summary = {"id": msg.id, "threadId": msg.thread_id, "labelIds": msg.label_ids}
+    for name in SUMMARY_HEADERS:
+        value = msg.header(name)
+        if value is not None:
+            summary[name] = value
+    summary["text"] = text
+    summary["truncated"] = truncated
+    if include_attachments:
+        summary["attachments"] = msg.attachments()
+    return summary
+
+
+def summarize_messages(resources: list, max_chars: int = DEFAULT_MAX_CHARS, include_attachments: bool = True) -> list:
+    """Process-pool entry point: summarizes a chunk of message resources."""
+    return [summarize_message(r, max_chars, include_attachments) for r in resources]
@@ -0,0 +1,79 @@
+# pagination.py
+
+import time
+import secrets
+import threading
+from collections import OrderedDict
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_CURSOR_TTL = 600
+MAX_CURSORS = 1000
+
+
+class CursorExpired(Exception):
+    """Raised for a cursor that is unknown, expired or belongs to another tool."""
+
+
+class CursorStore:
+    """
+    In-memory state of paginated listings, addressed by opaque cursor strings.
+
+    A cursor's state holds the listing's parameters, the Google API page token to continue
+    from and any items fetched but not yet returned. Entries expire `ttl` seconds after
+    they were created; at most `max_entries` are kept, oldest evicted first.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CURSOR_TTL, max_entries: int = MAX_CURSORS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._entries:
+            cursor, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[cursor]
+
+    def put(self, tool: str, state: dict) -> str:
+        cursor = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[cursor] = (now + self.ttl, tool, state)
+            self._evict(now)
+        return cursor
+
+    def get(self, tool: str, cursor: str) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._entries.get(cursor)
+        if entry is None or entry[1] != tool:
+            raise CursorExpired(f"Cursor is unknown or expired; call {tool} again without a cursor.")
+        return entry[2]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+async def next_page(state: dict, page_size: int, fetch) -> tuple[list, dict]:
+    """
+    Collects one page of at most `page_size` items for a listing.
+
+    `fetch(page_token, count)` is awaited with the API page token to continue from
+    (None for the first call) and the number of items still wanted; it returns
+    (items, next_page_token). Surplus items are carried in the returned state.
+    """
+    items = list(state.get("pending", []))
+    token = state.get("page_token")
+    started = state.get("started", False)
+    while len(items) < page_size and (token or not started):
+        fetched, token = await fetch(token, page_size - len(items))
+        started = True
+        items.extend(fetched)
+    new_state = {**state, "pending": items[page_size:], "page_token": token, "started": True}
+    return items[:page_size], new_state
+
+
+def has_more(state: dict) -> bool:
+    return bool(state.get("pending") or state.get("page_token"))
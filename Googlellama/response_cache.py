@@ -0,0 +1,132 @@
+# response_cache.py
+
+import copy
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def make_key(tool: str, scope, arguments: dict) -> str:
+    """Cache key of a call: tool name, account scope and the arguments with keys sorted."""
+    return json.dumps([tool, scope, arguments], sort_keys=True, default=str, separators=(",", ":"))
+
+
+class ResponseCache:
+    """
+    In-memory read-through cache of tool results.
+
+    Entries expire after their TTL and are tagged (e.g. "calendar"), so a write can drop every
+    cached read it may have changed. Total size, measured as the length of each result's JSON,
+    is kept under `max_bytes` by evicting least recently used entries. Concurrent misses for the
+    same key share one call (single flight). Results are deep-copied on the way in and out so
+    callers cannot modify cached data.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; a call that overlapped one may have read stale data.
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (expires, size, tags, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str):
+        _, size, _, _ = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key: str):
+        """Returns (True, value) for a fresh entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return False, None
+            self._entries.move_to_end(key)
+            value = entry[3]
+        return True, copy.deepcopy(value)
+
+    def put(self, key: str, value, ttl: float, tags=()):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, size, frozenset(tags), value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags) -> int:
+        """Drops every entry carrying any of `tags`. Returns the number dropped."""
+        tags = set(tags)
+        with self._lock:
+            self.generation += 1
+            stale = [k for k, (_, _, entry_tags, _) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size = 0
+
+    async def get_or_call(self, key: str, ttl: float, tags, call, cacheable=lambda result: True):
+        """
+        Returns the cached result for `key`, or awaits `call()` and caches what it returns
+        if `cacheable(result)`. Callers arriving while the call runs wait for its result;
+        if it raises, they all get the exception.
+        """
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The call we joined was cancelled by its own caller; make our own.
+                return await self.get_or_call(key, ttl, tags, call, cacheable)
+
+        self.misses += 1
+        generation = self.generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            if cacheable(result) and generation == self.generation:
+                self.put(key, result, ttl, tags)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
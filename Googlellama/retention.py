@@ -0,0 +1,118 @@
+# retention.py
+
+import re
+import json
+from pathlib import Path
+
+ACTIONS = ("keep", "archive", "trash", "delete")
+LOCATIONS = {"inbox": "in:inbox", "archive": "-in:inbox", "anywhere": ""}
+# batchModify and batchDelete accept at most 1000 message IDs per call.
+MUTATION_CHUNK = 1000
+_AGE = re.compile(r"^\d+[dmy]$")
+_SIZE = re.compile(r"^\d+[KMkm]?$")
+
+# The rule clean_up_archive applied before retention rules were configurable.
+DEFAULT_RULES = [
+    {"name": "old-archived", "action": "delete", "in": "archive", "older_than": "6m",
+     "keep_important": True, "keep_starred": False},
+]
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def normalize_rule(rule: dict, position: int = 0) -> dict:
+    """
+    Validates one rule and fills in defaults. Raises ValueError naming the rule on bad input.
+
+    Fields: name, action ("keep", "archive", "trash" or "delete"), priority (higher wins, default 0),
+    in ("inbox", "archive" or "anywhere"), label, from (addresses or domains), older_than ("30d",
+    "6m", "2y"), larger_than ("5M"), query (extra Gmail search terms), keep_starred and
+    keep_important (default true: starred/important mail is never touched by the rule).
+    """
+    name = rule.get("name") or f"rule-{position + 1}"
+    action = rule.get("action")
+    if action not in ACTIONS:
+        raise ValueError(f"Retention rule '{name}': action must be one of {', '.join(ACTIONS)}.")
+    location = rule.get("in", "anywhere")
+    if location not in LOCATIONS:
+        raise ValueError(f"Retention rule '{name}': 'in' must be one of {', '.join(LOCATIONS)}.")
+    if rule.get("older_than") and not _AGE.match(str(rule["older_than"])):
+        raise ValueError(f"Retention rule '{name}': older_than must look like 30d, 6m or 2y.")
+    if rule.get("larger_than") and not _SIZE.match(str(rule["larger_than"])):
+        raise ValueError(f"Retention rule '{name}': larger_than must look like 500K or 5M.")
+    normalized = {
+        "name": name,
+        "action": action,
+        "priority": int(rule.get("priority", 0)),
+        "in": location,
+        "labels": _as_list(rule.get("label")),
+        "from": _as_list(rule.get("from")),
+        "older_than": rule.get("older_than"),
+        "larger_than": rule.get("larger_than"),
+        "query": rule.get("query"),
+        "keep_starred": bool(rule.get("keep_starred", True)),
+        "keep_important": bool(rule.get("keep_important", True)),
+    }
+    conditions = ("labels", "from", "older_than", "larger_than", "query")
+    if action != "keep" and not any(normalized[c] for c in conditions):
+        raise ValueError(f"Retention rule '{name}' has no conditions and would {action} a whole mailbox location.")
+    return normalized
+
+
+def load_rules(path: Path) -> list:
+    """
+    Rules from a JSON file ({"rules": [...]}), or DEFAULT_RULES if the file does not exist,
+    sorted by descending priority (file order breaks ties).
+    """
+    path = Path(path)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f).get("rules", [])
+    else:
+        rules = DEFAULT_RULES
+    normalized = [normalize_rule(rule, i) for i, rule in enumerate(rules)]
+    names = [r["name"] for r in normalized]
+    if len(set(names)) != len(names):
+        raise ValueError("Retention rule names must be unique.")
+    return sorted(normalized, key=lambda r: -r["priority"])
+
+
+def _label_term(label: str) -> str:
+    # Gmail search writes spaces and slashes in label names as hyphens.
+    return "label:" + re.sub(r"[\s/]+", "-", label.strip())
+
+
+def rule_query(rule: dict) -> str:
+    """The Gmail search query selecting the messages a normalized rule applies to."""
+    terms = [LOCATIONS[rule["in"]]]
+    terms += [_label_term(label) for label in rule["labels"]]
+    if rule["from"]:
+        senders = [f"from:{s}" for s in rule["from"]]
+        terms.append(senders[0] if len(senders) == 1 else "{" + " ".join(senders) + "}")
+    if rule["older_than"]:
+        terms.append(f"older_than:{rule['older_than']}")
+    if rule["larger_than"]:
+        terms.append(f"larger:{rule['larger_than']}")
+    if rule["query"]:
+        terms.append(f"({rule['query']})")
+    if rule["action"] != "keep":
+        if rule["keep_starred"]:
+            terms.append("-is:starred")
+        if rule["keep_important"]:
+            terms.append("-label:IMPORTANT")
+    return " ".join(t for t in terms if t)
+
+
+def mutation_request(service, action: str, ids: list):
+    """The single API request applying `action` to up to MUTATION_CHUNK messages."""
+    if action == "delete":
+        return service.users().messages().batchDelete(userId="me", body={"ids": ids})
+    if action == "trash":
+        return service.users().messages().batchModify(userId="me", body={"ids": ids, "addLabelIds": ["TRASH"]})
+    if action == "archive":
+        return service.users().messages().batchModify(userId="me", body={"ids": ids, "removeLabelIds": ["INBOX"]})
+    raise ValueError(f"Action '{action}' does not change messages.")
@@ -0,0 +1,193 @@
+# semantic.py
+
+import re
+import json
+import zlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_OLLAMA_MODEL = "nomic-embed-text"
+HASH_DIM = 256
+EMBED_BATCH_SIZE = 64
+
+
+# --- Embedders ---
+# An embedder has a `name` (stored with the index) and `embed(texts) -> float32 array of shape (len(texts), dim)`.
+
+class OllamaEmbedder:
+    """Embeds text with a local Ollama model, `batch_size` texts per request."""
+
+    def __init__(self, model: str = DEFAULT_OLLAMA_MODEL, host: str = None, batch_size: int = EMBED_BATCH_SIZE):
+        import ollama
+        self.model = model
+        self.name = f"ollama:{model}"
+        self.batch_size = batch_size
+        self.client = ollama.Client(host=host)
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            resp = self.client.embed(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(resp["embeddings"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashEmbedder:
+    """
+    Deterministic bag-of-words embedder (signed feature hashing of words and word pairs).
+    Needs no model, so it works offline and in tests; it matches shared vocabulary, not meaning.
+    """
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self.name = f"hash:{dim}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(token.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return out
+
+
+def get_embedder(kind: str = "ollama", model: str = None, host: str = None):
+    if kind == "hash":
+        return HashEmbedder()
+    if kind == "ollama":
+        return OllamaEmbedder(model or DEFAULT_OLLAMA_MODEL, host)
+    raise ValueError(f"Unknown embedder '{kind}'. Use 'ollama' or 'hash'.")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# --- Index ---
+
+class SemanticIndex:
+    """
+    Embeddings of message subjects and snippets for similarity search.
+
+    Vectors are L2-normalized and appended to `vectors.f32`, a float32 matrix that is
+    memory-mapped for search, so cosine similarity is one matrix-vector product and
+    the top k come from np.argpartition. `meta.jsonl` holds one line per row (id,
+    subject, sender, date) and `info.json` the embedder name and dimension; switching
+    embedders starts a fresh index.
+    """
+
+    def __init__(self, path: Path, embedder):
+        self.path = Path(path)
+        self.embedder = embedder
+        self.dim = None
+        self.meta = []
+        self.rows = {}
+        self._matrix = None
+        self._lock = threading.RLock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path / "meta.jsonl"
+
+    @property
+    def _info_path(self) -> Path:
+        return self.path / "info.json"
+
+    def _load(self):
+        info = json.loads(self._info_path.read_text()) if self._info_path.exists() else {}
+        if info.get("embedder") != self.embedder.name:
+            self.clear()
+            return
+        self.dim = info["dim"]
+        meta = []
+        if self._meta_path.exists():
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = [json.loads(line) for line in f if line.strip()]
+        # Rows are written before their metadata; drop vectors whose metadata line never made it.
+        rows = self._vectors_path.stat().st_size // (4 * self.dim) if self._vectors_path.exists() else 0
+        self.meta = meta[:rows]
+        if rows > len(self.meta):
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(len(self.meta) * 4 * self.dim)
+        self.rows = {m["id"]: i for i, m in enumerate(self.meta)}
+
+    def clear(self):
+        with self._lock:
+            self.dim = None
+            self.meta = []
+            self.rows = {}
+            self._matrix = None
+            for p in (self._vectors_path, self._meta_path, self._info_path):
+                p.unlink(missing_ok=True)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def matrix(self) -> np.ndarray:
+        with self._lock:
+            if self._matrix is None and self.meta:
+                self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                         shape=(len(self.meta), self.dim))
+            return self._matrix
+
+    @staticmethod
+    def document(item: dict) -> str:
+        return f"{item.get('Subject', '')}\n{item.get('snippet', '')}".strip()
+
+    def add(self, items: list) -> int:
+        """Embeds and appends messages (dicts with id, Subject, From, Date, snippet) not yet indexed."""
+        with self._lock:
+            new = list({i["id"]: i for i in items if i.get("id") and i["id"] not in self.rows}.values())
+        if not new:
+            return 0
+        vectors = normalize(self.embedder.embed([self.document(i) for i in new]))
+        with self._lock:
+            # A concurrent add may have indexed some of them meanwhile; keep each vector with its item.
+            kept = [n for n, i in enumerate(new) if i["id"] not in self.rows]
+            new = [new[n] for n in kept]
+            if not new:
+                return 0
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._info_path.write_text(json.dumps({"embedder": self.embedder.name, "dim": self.dim}))
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors[kept].astype(np.float32).tobytes())
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for item in new:
+                    meta = {"id": item["id"], "threadId": item.get("threadId"), "Subject": item.get("Subject", ""),
+                            "From": item.get("From", ""), "Date": item.get("Date", "")}
+                    self.rows[meta["id"]] = len(self.meta)
+                    self.meta.append(meta)
+                    f.write(json.dumps(meta) + "\n")
+            self._matrix = None
+        return len(new)
+
+    def vector_of(self, msg_id: str) -> np.ndarray | None:
+        row = self.rows.get(msg_id)
+        return None if row is None else np.array(self.matrix()[row])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return normalize(self.embedder.embed([text]))[0]
+
+    def search(self, vector: np.ndarray, k: int = 10, exclude: set = ()) -> list:
+        """The k rows most similar to `vector` by cosine similarity, best first."""
+        matrix = self.matrix()
+        if matrix is None:
+            return []
+        scores = matrix @ vector.astype(np.float32)
+        n = min(k + len(exclude), len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        results = [{**self.meta[i], "score": round(float(scores[i]), 4)} for i in top
+                   if self.meta[i]["id"] not in exclude]
+        return results[:k]
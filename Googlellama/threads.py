@@ -0,0 +1,43 @@
+# threads.py
+
+THREAD_ID_FIELDS = "threads/id,nextPageToken"
+THREAD_METADATA_FIELDS = "id,messages(id,labelIds,payload/headers)"
+SUMMARY_HEADERS = ["Subject", "From", "Date"]
+
+
+def get_request(service, thread_id: str):
+    """threads.get for a summary: the labels and summary headers of every message."""
+    return service.users().threads().get(userId="me", id=thread_id, format="metadata",
+                                         metadataHeaders=SUMMARY_HEADERS, fields=THREAD_METADATA_FIELDS)
+
+
+def modify_request(service, thread_id: str, add_ids: list = None, remove_ids: list = None):
+    return service.users().threads().modify(userId="me", id=thread_id, fields="id",
+                                            body={"addLabelIds": add_ids or [], "removeLabelIds": remove_ids or []})
+
+
+def trash_request(service, thread_id: str):
+    return service.users().threads().trash(userId="me", id=thread_id, fields="id")
+
+
+def message_ids(resource: dict) -> list:
+    return [m["id"] for m in resource.get("messages", [])]
+
+
+def summarize_thread(resource: dict) -> dict:
+    """
+    One entry per thread: Subject of the first message, Date of the newest, the distinct senders,
+    the message count and IDs, and the union of the messages' labels.
+    """
+    messages = resource.get("messages", [])
+    headers = [{h["name"]: h["value"] for h in m.get("payload", {}).get("headers", [])} for m in messages]
+    senders = list(dict.fromkeys(h["From"] for h in headers if h.get("From")))
+    label_ids = sorted({label for m in messages for label in m.get("labelIds", [])})
+    summary = {"id": resource.get("id"), "messages": len(messages), "message_ids": message_ids(resource),
+               "From": senders, "labelIds": label_ids}
+    if headers:
+        if headers[0].get("Subject") is not None:
+            summary["Subject"] = headers[0]["Subject"]
+        if headers[-1].get("Date") is not None:
+            summary["Date"] = headers[-1]["Date"]
+    return summary
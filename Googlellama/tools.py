@@ -1,11 +1,20 @@
 # tools/google_tools.py
 
 import os
+import re
+import time
 import json
 import dotenv
 import asyncio
 from pathlib import Path
+import tempfile
+import threading
+import inspect
+import functools
 import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, List
 from akinus.web.server.mcp import mcp
 from akinus.utils.logger import log
@@ -13,8 +22,10 @@ from akinus.web.utils.retry import retry_async
 from akinus.web.google.auth import get_credentials
 
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import io
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+from Googlellama import accounts, attachments, batch, cassette, drive_cache, drive_io, export, extract, freebusy, http_server, jobs, journal, labels, mail_index, mailmerge, mime, pagination, response_cache, retention, semantic, threads, transport
+from Googlellama.transport import GzipHttpRequest
 
 import asyncio
 from pyppeteer import launch
@@ -22,6 +33,8 @@ from pyppeteer_stealth import stealth
 from fastapi import HTTPException
 from pathlib import Path
 from email.utils import parseaddr
+from datetime import timedelta
+from zoneinfo import ZoneInfo
 
 import warnings
 warnings.filterwarnings("ignore", message="file_cache is only supported with oauth2client")
@@ -42,6 +55,95 @@ DRIVE_SCOPES = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("DRIVE_SCOPES", "
 # Token storage
 TOKEN_PATH = PROJECT_ROOT / "data" / "token.json"
 
+# Background job limits
+JOBS_MAX_RUNNING = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("JOBS_MAX_RUNNING") or 2)
+JOBS_MAX_QUEUED = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("JOBS_MAX_QUEUED") or 20)
+
+# Journals of interrupted bulk runs
+JOURNAL_DIR = PROJECT_ROOT / "data" / "journal"
+
+# Drive metadata cache: seconds between Changes API syncs
+DRIVE_SYNC_INTERVAL = float(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("DRIVE_SYNC_INTERVAL") or 30)
+
+# Drive transfers
+DOWNLOADS_DIR = PROJECT_ROOT / "data" / "downloads"
+UPLOAD_STATE_DIR = PROJECT_ROOT / "data" / "uploads"
+
+# Multi-account registry (see accounts.load_accounts for the format)
+ACCOUNTS_PATH = PROJECT_ROOT / "data" / "accounts.json"
+
+# Shared keep-alive connection pool for every Google service
+HTTP_POOL_SIZE = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("HTTP_POOL_SIZE") or transport.DEFAULT_POOL_SIZE)
+HTTP_TIMEOUT = float(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("HTTP_TIMEOUT") or transport.DEFAULT_TIMEOUT)
+
+# Processes used to decode message bodies for gmail_get_messages
+DECODE_WORKERS = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("DECODE_WORKERS") or min(4, os.cpu_count() or 1))
+DECODE_INLINE_MAX = 10  # Smaller fetches are decoded in a thread; a process round-trip would cost more
+
+# Local full-text index (data/mail_index.sqlite)
+INDEX_BODY_CHARS = 20000  # Body text kept per indexed message
+INDEX_FETCH_CHUNK = 200   # Messages fetched and indexed per step of gmail_index_update
+
+# Semantic index (data/semantic/): EMBEDDER is "ollama" or "hash" (offline, vocabulary-based)
+EMBEDDER = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("EMBEDDER") or "ollama"
+OLLAMA_EMBED_MODEL = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("OLLAMA_EMBED_MODEL") or semantic.DEFAULT_OLLAMA_MODEL
+OLLAMA_HOST = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("OLLAMA_HOST") or None
+transport.configure_pool(size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT)
+transport.add_execute_hook(lambda request: accounts.charge_quota(request.methodId))
+
+# Main-text extraction of HTML mail (newsletters), cached by content hash
+EXTRACT_CACHE_PATH = PROJECT_ROOT / "data" / "extract_cache.sqlite"
+EXTRACT_CHUNK = 8  # HTML bodies per process-pool task
+NEWSLETTER_QUERY = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("NEWSLETTER_QUERY") or "unsubscribe -in:sent"
+
+# Content-addressed attachment store (blobs plus an SQLite index)
+ATTACHMENTS_DIR = PROJECT_ROOT / "data" / "attachments"
+ATTACHMENT_SCAN_CHUNK = 100  # Messages whose attachments are fetched per step
+
+# Retention rules applied by clean_up_archive and gmail_retention (see retention.normalize_rule)
+RETENTION_PATH = PROJECT_ROOT / "data" / "retention.json"
+
+# Backups written by gmail_export
+EXPORT_DIR = PROJECT_ROOT / "data" / "exports"
+EXPORT_CHUNK = 100  # Raw messages fetched (in batch requests) and written per step
+
+# Per-recipient logs of gmail_send_bulk runs
+MAILMERGE_DIR = PROJECT_ROOT / "data" / "mailmerge"
+
+# Unix socket of the persistent server started with `Googlellama daemon`
+DAEMON_SOCKET = Path(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("DAEMON_SOCKET") or PROJECT_ROOT / "data" / "googlellama.sock")
+
+# Streamable HTTP server started with `Googlellama serve`
+HTTP_HOST = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("HTTP_HOST") or "127.0.0.1"
+HTTP_PORT = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("HTTP_PORT") or 8000)
+SESSION_CONCURRENCY = int(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("SESSION_CONCURRENCY") or http_server.DEFAULT_SESSION_CONCURRENCY)
+# Bearer token HTTP clients must send; required unless HTTP_HOST is a loopback address
+HTTP_TOKEN = dotenv.dotenv_values(PROJECT_ROOT / ".env").get("HTTP_TOKEN") or None
+
+# Read-through cache of read tool results: seconds each tool's results stay fresh, and total size
+CACHE_TTLS = {"gmail_list": 15, "calendar_list": 30, "tasks_list": 30, "tasks_list_tasklists": 300,
+              "contacts_get_by_name": 300, "contacts_find_by_name": 300}
+RESPONSE_CACHE_MB = float(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("RESPONSE_CACHE_MB") or 32)
+
+# Cursor-paginated listings: seconds a cursor stays valid
+CURSOR_TTL = float(dotenv.dotenv_values(PROJECT_ROOT / ".env").get("CURSOR_TTL") or pagination.DEFAULT_CURSOR_TTL)
+
+# --- Partial-response field masks ---
+# Full responses carry kinds, etags, threadIds and size estimates that no tool returns.
+# The *_COMPACT_FIELDS masks are used when a tool is called with compact=True.
+MESSAGE_ID_FIELDS = "messages/id,nextPageToken"
+MESSAGE_HEADER_FIELDS = "id,payload/headers"
+MESSAGE_LABEL_HEADER_FIELDS = "id,labelIds,payload/headers"
+MESSAGE_FULL_FIELDS = "id,threadId,labelIds,snippet,payload"
+MESSAGE_RAW_FIELDS = "id,threadId,labelIds,snippet,raw"
+MESSAGE_EXPORT_FIELDS = "id,threadId,labelIds,internalDate,raw"
+MESSAGE_SNIPPET_FIELDS = "id,threadId,snippet,payload/headers"
+EVENT_COMPACT_FIELDS = "id,summary,start,end,location,status"
+TASK_COMPACT_FIELDS = "id,title,status,due,notes"
+TASKLIST_FIELDS = "items(id,title)"
+PERSON_FIELDS = "names,emailAddresses,phoneNumbers,organizations"
+PERSON_COMPACT_FIELDS = "resourceName,names/displayName,emailAddresses/value,phoneNumbers/value,organizations/name"
+
 # --- Support functions ---
 def sync_log(*args, **kwargs):
     try:
@@ -51,74 +153,244 @@ def sync_log(*args, **kwargs):
         asyncio.run(log(*args, **kwargs))
 
 
-def get_gmail_service():
-    creds = get_credentials(GMAIL_SCOPES)
-    return build("gmail", "v1", credentials=creds)
+_services = {}
+_services_lock = threading.Lock()
 
-def get_drive_service():
-    creds = get_credentials(DRIVE_SCOPES)
-    return build("drive", "v3", credentials=creds)
 
-async def get_drive_file_id(service, filename):
-    query = f"name='{filename}' AND trashed=false"
+def build_service(api: str, version: str, scopes: list):
+    """
+    Returns a Google API client for the given scopes, building it on first use.
+    In multi-account runs the client uses the active account's token file.
+    Clients are cached and all of them send requests through the current transport
+    (the shared keep-alive pool by default), so they are safe to use from worker threads.
+    Every request negotiates gzip responses and gzips large JSON bodies.
+    """
+    account = accounts.current_account()
+    factory = transport.get_transport()
+    key = (account.token_path if account else None, api, version, tuple(scopes), factory)
+    with _services_lock:
+        svc = _services.get(key)
+    if svc is not None:
+        return svc
+
+    creds = None
+    if getattr(factory, "needs_credentials", True):
+        creds = accounts.load_credentials(account) if account else get_credentials(scopes)
+    svc = build(api, version, http=factory(creds), cache_discovery=False, requestBuilder=GzipHttpRequest)
+    with _services_lock:
+        return _services.setdefault(key, svc)
+
+
+def reset_services():
+    """Drops cached clients, e.g. after the transport or credentials changed."""
+    with _services_lock:
+        _services.clear()
+
+
+def reset_caches():
+    """Drops the in-process caches of API data: tool results, label registries and Drive metadata."""
+    tool_cache.clear()
+    with _label_registries_lock:
+        _label_registries.clear()
+    with _drive_lock:
+        _drive_caches.clear()
+
+
+@contextlib.contextmanager
+def use_cassette(path: Path, mode: str = cassette.REPLAY, latency: float = 0.0):
+    """
+    Routes every Google API request through a cassette for the duration of the block:
+    "record" saves real traffic to `path`, "replay" serves it back without network access
+    or credentials (optionally sleeping `latency` seconds per request). Yields the Cassette.
+    In-process caches are emptied on entry and exit, and Drive metadata is kept in a temporary
+    directory, so every run inside makes the same requests as the recording.
+    """
+    global _drive_cache_dir
+    previous = transport.get_transport()
+    previous_drive_dir = _drive_cache_dir
+    tape = cassette.Cassette(path, mode, latency)
+    with tempfile.TemporaryDirectory(prefix="cassette-drive-") as drive_dir:
+        transport.set_transport(cassette.cassette_transport(tape, record_with=previous))
+        _drive_cache_dir = Path(drive_dir)
+        reset_services()
+        reset_caches()
+        try:
+            yield tape
+        finally:
+            transport.set_transport(previous)
+            _drive_cache_dir = previous_drive_dir
+            reset_services()
+            reset_caches()
+            if mode == cassette.RECORD:
+                tape.save()
 
-    results = service.files().list(
-        q=query,
-        spaces="drive",
-        fields="files(id, name, mimeType, modifiedTime, size)",
-        orderBy="modifiedTime desc"
-    ).execute()
 
-    files = results.get("files", [])
+async def execute_async(request):
+    """Runs a googleapiclient request in a worker thread so concurrent calls overlap."""
+    return await asyncio.to_thread(request.execute)
 
-    if not files:
-        # No file found, create a blank one
-        print(f"No file found for {filename}. Creating new blank file.")
-        file_metadata = {"name": filename}
-        file = service.files().create(body=file_metadata, fields="id").execute()
-        return file["id"]
 
-    # Sort files by size (largest first), then by modifiedTime
-    files = sorted(files, key=lambda f: int(f.get("size", 0)), reverse=True)
+# --- Response cache ---
 
-    # Pick the first non-empty file if available
-    for f in files:
-        size = int(f.get("size", 0))
-        if size > 0:
-            return f["id"]
+tool_cache = response_cache.ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
 
-    # If all files are empty, fallback to the newest one
-    newest_file = files[0]
-    return newest_file["id"]
 
-async def read_drive_file(service, file_id):
-    file_info = service.files().get(fileId=file_id, fields="id, name, mimeType").execute()
+def cached_tool(*tags):
+    """
+    Caches a read tool's results per account and normalized arguments for CACHE_TTLS[tool] seconds.
+    Identical concurrent calls share one API round trip. Calls continuing a cursor or streaming
+    results, and error results, are not cached. Writes to the same `tags` drop the entries.
+    """
+    def decorator(func):
+        sig = inspect.signature(func)
+        ttl = CACHE_TTLS.get(func.__name__)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            if not ttl or not RESPONSE_CACHE_MB or arguments.get("cursor") or arguments.get("stream"):
+                return await func(*args, **kwargs)
+            account = accounts.current_account()
+            key = response_cache.make_key(func.__name__, account.name if account else None, dict(arguments))
+            return await tool_cache.get_or_call(
+                key, ttl, tags, lambda: func(*args, **kwargs),
+                cacheable=lambda result: not (isinstance(result, dict) and "error" in result)
+            )
+        # Bulk mutations list what they are about to change through this, never from the cache.
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags):
+    """
+    Drops cached results tagged with `tags` after the decorated write tool runs, whether or not
+    it succeeded. For tools that start a background job, they are dropped again when the job ends.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            result = None
+            try:
+                result = await func(*args, **kwargs)
+                return result
+            finally:
+                tool_cache.invalidate(tags)
+                job = job_manager.get(result.get("job_id")) if isinstance(result, dict) else None
+                if job is not None:
+                    job.task.add_done_callback(lambda _: tool_cache.invalidate(tags))
+        return wrapper
+    return decorator
 
-    if file_info["mimeType"] == "application/vnd.google-apps.document":
-        request = service.files().export_media(fileId=file_id, mimeType="text/plain")
-    else:
-        request = service.files().get_media(fileId=file_id)
 
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
+@mcp.tool()
+async def response_cache_stats(clear: bool = False):
+    """Reports the read-through response cache (entries, bytes, hits, misses); `clear` empties it first."""
+    if clear:
+        tool_cache.clear()
+    return tool_cache.stats()
+
 
-    fh.seek(0)
-    content = fh.read().decode("utf-8").strip()
+def get_gmail_service():
+    return build_service("gmail", "v1", GMAIL_SCOPES)
+
+def get_drive_service():
+    return build_service("drive", "v3", DRIVE_SCOPES)
 
-    if not content:
-        return []  # Empty file
+_drive_caches = {}
+_drive_lock = threading.Lock()
+_drive_cache_dir = PROJECT_ROOT / "data"
 
-    return [line.strip() for line in content.splitlines() if line.strip()]
+
+def get_drive_cache() -> drive_cache.DriveCache:
+    """Returns the Drive metadata cache of the active account, loading it from disk on first use."""
+    account = accounts.current_account()
+    name = account.name if account else None
+    with _drive_lock:
+        cache = _drive_caches.get(name)
+        if cache is None:
+            filename = f"drive_cache.{name}.json" if name else "drive_cache.json"
+            cache = _drive_caches[name] = drive_cache.DriveCache(_drive_cache_dir / filename,
+                                                                 sync_interval=DRIVE_SYNC_INTERVAL)
+        return cache
+
+
+_label_registries = {}
+_label_registries_lock = threading.Lock()
+
+
+def get_label_registry() -> labels.LabelRegistry:
+    """Returns the cached label name/ID registry of the active account."""
+    account = accounts.current_account()
+    name = account.name if account else None
+    with _label_registries_lock:
+        return _label_registries.setdefault(name, labels.LabelRegistry())
+
+
+async def get_drive_file_id(service, filename):
+    """
+    Returns the ID of the Drive file called `filename`, answered from the local metadata cache
+    (kept current through the Changes API). Prefers the largest non-empty match, then the newest.
+    Creates a blank file if none exists even after a forced sync; the new file goes into the cache
+    right away so it is not created twice.
+    """
+    cache = get_drive_cache()
+
+    def lookup():
+        with cache.create_lock:
+            cache.sync(service)
+            files = cache.by_name(filename)
+            if not files:
+                # The throttled sync may be behind; never create a duplicate from a stale cache.
+                cache.sync(service, force=True)
+                files = cache.by_name(filename)
+
+            if not files:
+                # No file found, create a blank one
+                print(f"No file found for {filename}. Creating new blank file.")
+                file_metadata = {"name": filename}
+                file = service.files().create(body=file_metadata, fields=drive_cache.FILE_FIELDS).execute()
+                cache.put(file)
+                cache.save()
+                return file["id"]
+
+            # Newest first, then stable sort by size (largest first)
+            files = sorted(files, key=lambda f: f.get("modifiedTime", ""), reverse=True)
+            files = sorted(files, key=lambda f: int(f.get("size", 0)), reverse=True)
+
+            # Pick the first non-empty file if available
+            for f in files:
+                size = int(f.get("size", 0))
+                if size > 0:
+                    return f["id"]
+
+            # If all files are empty, fallback to the newest one
+            newest_file = files[0]
+            return newest_file["id"]
+
+    return await asyncio.to_thread(lookup)
+
+async def read_drive_file(service, file_id):
+    """Reads a Drive text file chunk by chunk and returns its non-blank lines, stripped."""
+    def read():
+        return [line.strip() for line in drive_io.iter_drive_lines(service, file_id) if line.strip()]
+    return await asyncio.to_thread(read)
 
 
 async def write_drive_file(service, file_id, lines):
-    content = "\n".join(lines)
-    fh = io.BytesIO(content.encode("utf-8"))
-    media = MediaIoBaseUpload(fh, mimetype="text/plain", resumable=True)
-    service.files().update(fileId=file_id, media_body=media).execute()
+    """Replaces a Drive file's content with `lines`, spooled to a temp file and uploaded in resumable chunks."""
+    def write():
+        with tempfile.SpooledTemporaryFile(max_size=drive_io.DEFAULT_CHUNK_SIZE) as fh:
+            for i, line in enumerate(lines):
+                fh.write((("\n" if i else "") + line).encode("utf-8"))
+            fh.seek(0)
+            return drive_io.upload_stream(service, fh, "text/plain", file_id=file_id)
+    updated = await asyncio.to_thread(write)
+
+    cache = get_drive_cache()
+    cache.put({**(cache.get(file_id) or {}), **updated})
 
 # ---- Filter functions using Drive ----
 
@@ -158,19 +430,29 @@ async def remove_from_filter_string(text: str, filename="delete_filter.txt"):
     await write_drive_file(service, file_id, lines)
     await log("INFO", "google_tools", f"Removed from filter ({filename}): {text}")
 
+# Filter file names; in multi-account runs each account may name its own.
+
+def delete_filter_name():
+    account = accounts.current_account()
+    return account.delete_filter if account else "delete_filter.txt"
+
+def archive_filter_name():
+    account = accounts.current_account()
+    return account.archive_filter if account else "archive_filter.txt"
+
 # Convenience wrappers for delete and archive filters:
 
 async def add_to_delete_filter_string(text: str):
-    await add_to_filter_string(text, filename="delete_filter.txt")
+    await add_to_filter_string(text, filename=delete_filter_name())
 
 async def remove_from_delete_filter_string(text: str):
-    await remove_from_filter_string(text, filename="delete_filter.txt")
+    await remove_from_filter_string(text, filename=delete_filter_name())
 
 async def add_to_archive_filter_string(text: str):
-    await add_to_filter_string(text, filename="archive_filter.txt")
+    await add_to_filter_string(text, filename=archive_filter_name())
 
 async def remove_from_archive_filter_string(text: str):
-    await remove_from_filter_string(text, filename="archive_filter.txt")
+    await remove_from_filter_string(text, filename=archive_filter_name())
 
 
 async def add_if_labeled_delete():
@@ -180,18 +462,10 @@ async def add_if_labeled_delete():
     Ignores messages in Trash or Spam.
     """
 
-    from googleapiclient.discovery import build
-
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
+    svc = get_gmail_service()
 
     # Find the "Delete" label ID
-    labels_response = svc.users().labels().list(userId="me").execute()
-    delete_label_id = None
-    for label in labels_response.get("labels", []):
-        if label["name"].lower() == "delete":
-            delete_label_id = label["id"]
-            break
+    delete_label_id = await asyncio.to_thread(get_label_id_by_name, svc, "me", "Delete")
 
     if not delete_label_id:
         log("ERROR", "google_tools", "Delete label not found in Gmail account.")
@@ -202,12 +476,13 @@ async def add_if_labeled_delete():
 
     while True:
         # List messages with the Delete label, paginated
-        resp = svc.users().messages().list(
+        resp = await execute_async(svc.users().messages().list(
             userId="me",
             labelIds=[delete_label_id],
             maxResults=500,
-            pageToken=next_page_token
-        ).execute()
+            pageToken=next_page_token,
+            fields=MESSAGE_ID_FIELDS
+        ))
 
         items = resp.get("messages", [])
         if not items:
@@ -215,7 +490,10 @@ async def add_if_labeled_delete():
 
         for m in items:
             try:
-                meta = svc.users().messages().get(userId="me", id=m["id"], format="metadata").execute()
+                meta = await execute_async(svc.users().messages().get(
+                    userId="me", id=m["id"], format="metadata",
+                    metadataHeaders=["From"], fields=MESSAGE_LABEL_HEADER_FIELDS
+                ))
                 labels = meta.get("labelIds", [])
                 # Ignore messages in TRASH or SPAM
                 if "TRASH" in labels or "SPAM" in labels:
@@ -247,29 +525,27 @@ async def add_if_labeled_archive():
     Handles pagination to process all matching messages.
     Ignores messages in TRASH or SPAM.
     """
-    from googleapiclient.discovery import build
-
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
+    svc = get_gmail_service()
 
-    archive_label_id = get_label_id_by_name(svc, "me", "Save")
+    archive_label_id = await asyncio.to_thread(get_label_id_by_name, svc, "me", "Save")
     if not archive_label_id:
         log("ERROR", "google_tools", "Archive label not found in Gmail account.")
         return {"status": "error", "message": "Archive label not found."}
     
     # Load the delete filter list once
-    delete_filter = set(await get_filter_string("delete_filter.txt"))
+    delete_filter = set(await get_filter_string(delete_filter_name()))
 
     count = 0
     next_page_token = None
 
     while True:
-        resp = svc.users().messages().list(
+        resp = await execute_async(svc.users().messages().list(
             userId="me",
             labelIds=[archive_label_id],
             maxResults=500,
-            pageToken=next_page_token
-        ).execute()
+            pageToken=next_page_token,
+            fields=MESSAGE_ID_FIELDS
+        ))
 
         items = resp.get("messages", [])
         if not items:
@@ -277,7 +553,10 @@ async def add_if_labeled_archive():
 
         for m in items:
             try:
-                meta = svc.users().messages().get(userId="me", id=m["id"], format="metadata").execute()
+                meta = await execute_async(svc.users().messages().get(
+                    userId="me", id=m["id"], format="metadata",
+                    metadataHeaders=["From"], fields=MESSAGE_LABEL_HEADER_FIELDS
+                ))
                 labels = meta.get("labelIds", [])
                 if "TRASH" in labels or "SPAM" in labels:
                     continue
@@ -310,15 +589,13 @@ async def add_if_labeled_archive():
 
 def get_label_id_by_name(svc, user_id: str, label_name: str) -> str | None:
     """
-    Retrieves the label ID for a given label name.
+    Retrieves the label ID for a given label name from the cached label registry.
     Returns None if not found.
     """
     try:
-        labels_resp = svc.users().labels().list(userId=user_id).execute()
-        labels = labels_resp.get("labels", [])
-        for label in labels:
-            if label.get("name", "").lower() == label_name.lower():
-                return label.get("id")
+        return get_label_registry().resolve(svc, label_name)
+    except labels.LabelNotFound:
+        return None
     except Exception as e:
         log("ERROR", "google_tools", f"Error retrieving labels: {e}")
     return None
@@ -357,7 +634,7 @@ async def process_sender(sender: str, action: str):
 
     try:
         messages = await retry_async(
-            gmail_list,
+            gmail_list.uncached,
             f"in:inbox from:{sender}",
             retries=1,
             logger=lambda m: sync_log("WARNING", "google_tools", m)
@@ -389,16 +666,241 @@ async def process_sender(sender: str, action: str):
 async def gmail_batch_delete(message_ids: List[str]):
     """Deletes multiple messages in one API call."""
     service = get_gmail_service()
-    service.users().messages().batchDelete(userId="me", body={"ids": message_ids}).execute()
+    await execute_async(service.users().messages().batchDelete(userId="me", body={"ids": message_ids}))
 
 
 async def gmail_batch_archive(message_ids: List[str]):
     """Archives multiple messages in one API call (removes 'INBOX' label)."""
     service = get_gmail_service()
-    service.users().messages().batchModify(
+    await execute_async(service.users().messages().batchModify(
         userId="me",
         body={"ids": message_ids, "removeLabelIds": ["INBOX"]}
-    ).execute()
+    ))
+
+# --- Drive transfers ---
+
+@mcp.tool()
+async def drive_download(file_id: str = None, name: str = None, dest: str = None, workers: int = 4):
+    """
+    Downloads a Drive file to local disk by `file_id` or by `name`.
+    Large binary files are fetched with parallel HTTP Range requests written straight to disk;
+    an interrupted download resumes with the missing parts. Google Docs/Sheets/Slides are exported as text/CSV.
+    `dest` defaults to data/downloads/<file name>. Returns the file metadata and local path.
+    """
+    service = get_drive_service()
+    if not file_id:
+        if not name:
+            return {"error": "Provide file_id or name."}
+        cache = get_drive_cache()
+        await asyncio.to_thread(cache.sync, service)
+        files = sorted(cache.by_name(name), key=lambda f: f.get("modifiedTime", ""), reverse=True)
+        if not files:
+            return {"error": f"No Drive file named '{name}'."}
+        file_id = files[0]["id"]
+
+    def download():
+        target = dest
+        if not target:
+            target = DOWNLOADS_DIR / drive_io.get_file_info(service, file_id)["name"]
+        return drive_io.download_file(service, file_id, Path(target), workers=int(workers or 4),
+                                      progress=lambda done, total: jobs.report_progress(done, total))
+
+    try:
+        result = await asyncio.to_thread(download)
+    except Exception as e:
+        await log("ERROR", "google_tools", f"Drive download of {file_id} failed: {e}")
+        return {"error": f"Download failed: {e}"}
+    await log("INFO", "google_tools", f"Downloaded Drive file {result['name']} to {result['path']} in {result['parts']} parts")
+    return result
+
+
+@mcp.tool()
+async def drive_upload(path: str, name: str = None, file_id: str = None, mimetype: str = None, folder_id: str = None):
+    """
+    Uploads a local file to Drive in resumable chunks.
+    Updates `file_id` if given, otherwise creates a new file called `name` (default: the local file name),
+    optionally inside `folder_id`. Re-running an interrupted upload continues where it stopped.
+    Returns the uploaded file's metadata.
+    """
+    local = Path(path)
+    if not local.is_file():
+        return {"error": f"File not found: {path}"}
+    service = get_drive_service()
+
+    def upload():
+        uploaded = drive_io.upload_file(service, local, file_id=file_id, name=name, mimetype=mimetype,
+                                        parents=[folder_id] if folder_id else None, state_dir=UPLOAD_STATE_DIR,
+                                        progress=lambda done, total: jobs.report_progress(done, total))
+        cache = get_drive_cache()
+        cache.put({**(cache.get(uploaded["id"]) or {}), **uploaded})
+        return uploaded
+
+    try:
+        result = await asyncio.to_thread(upload)
+    except Exception as e:
+        await log("ERROR", "google_tools", f"Drive upload of {path} failed: {e}")
+        return {"error": f"Upload failed: {e}"}
+    await log("INFO", "google_tools", f"Uploaded {path} to Drive file {result['id']}")
+    return result
+
+
+def _drive_entry(cache: drive_cache.DriveCache, meta: dict) -> dict:
+    return {
+        "id": meta["id"],
+        "name": meta.get("name"),
+        "path": cache.path_of(meta["id"]),
+        "mimeType": meta.get("mimeType"),
+        "size": int(meta["size"]) if meta.get("size") else None,
+        "modifiedTime": meta.get("modifiedTime"),
+        "md5Checksum": meta.get("md5Checksum"),
+    }
+
+
+@mcp.tool()
+async def drive_search(query: str, mime_type: str = None, max_results: int = 50):
+    """
+    Searches Drive file names (case-insensitive substring) in the local metadata cache.
+    `mime_type` optionally restricts results, e.g. "application/vnd.google-apps.folder".
+    Returns id, name, path, mimeType, size, modifiedTime and md5Checksum, newest first.
+    """
+    service = get_drive_service()
+    cache = get_drive_cache()
+    await asyncio.to_thread(cache.sync, service)
+    matches = cache.search(query, mime_type)[:int(max_results or 50)]
+    await log("INFO", "google_tools", f"Drive search '{query}' matched {len(matches)} files")
+    return [_drive_entry(cache, m) for m in matches]
+
+
+@mcp.tool()
+async def drive_list(folder: str = None, max_results: int = 200):
+    """
+    Lists the files in a Drive folder from the local metadata cache.
+    `folder` is a path from My Drive's root (e.g. "/Projects/2025") or a folder ID; defaults to the root.
+    Folders are listed first, then files by name.
+    """
+    service = get_drive_service()
+    cache = get_drive_cache()
+    await asyncio.to_thread(cache.sync, service)
+
+    if not folder or folder == "/":
+        folder_id = cache.root_id
+    elif cache.get(folder):
+        folder_id = folder
+    else:
+        meta = cache.resolve_path(folder)
+        if meta is None:
+            return {"error": f"Folder not found: {folder}"}
+        folder_id = meta["id"]
+
+    children = sorted(cache.children(folder_id),
+                      key=lambda m: (m.get("mimeType") != drive_cache.FOLDER_MIME_TYPE, m.get("name", "").lower()))
+    return [_drive_entry(cache, m) for m in children[:int(max_results or 200)]]
+
+
+# --- Mutation journal ---
+_active_journals = set()
+_active_journals_lock = threading.Lock()
+
+
+@contextlib.asynccontextmanager
+async def journaled_run(name: str):
+    """
+    Opens the journal of a bulk run (per account in multi-account runs) and makes it active.
+    The journal is deleted when the run completes and kept when it fails or is cancelled; a run
+    that completes with failed chunks keeps only those, so the next run retries them and runs
+    everything else afresh. Only one run at a time may use a journal; a second one raises RuntimeError.
+    """
+    account = accounts.current_account()
+    filename = f"{name}.{account.name}.jsonl" if account else f"{name}.jsonl"
+    path = JOURNAL_DIR / filename
+    with _active_journals_lock:
+        if path in _active_journals:
+            raise RuntimeError(f"{name} is already running{f' for {account.name}' if account else ''}.")
+        _active_journals.add(path)
+    try:
+        async with _open_journal(name, path) as run_journal:
+            yield run_journal
+    finally:
+        with _active_journals_lock:
+            _active_journals.discard(path)
+
+
+@contextlib.asynccontextmanager
+async def _open_journal(name: str, path: Path):
+    run_journal = journal.MutationJournal(path)
+    if run_journal.resumed:
+        await log("INFO", "google_tools", f"Resuming {name} from journal: {len(run_journal.done)} chunks already done, "
+                                          f"{len(set(run_journal.planned) - set(run_journal.done))} to replay.")
+    token = journal.activate(run_journal)
+    finished = False
+    try:
+        yield run_journal
+        finished = True
+    finally:
+        journal.deactivate(token)
+        run_journal.close(finished=finished)
+
+
+async def run_journaled_stage(action: str, query: str, func):
+    """Runs func() once per journaled run; a resumed run gets the recorded result back instead."""
+    run_journal = journal.current()
+    key = journal.MutationJournal.key(action, query)
+    if run_journal is not None and run_journal.is_done(key):
+        return run_journal.result(key)
+    result = await func()
+    if run_journal is not None:
+        run_journal.complete(key, result)
+    return result
+
+
+async def run_journaled_chunk(action: str, query: str, apply, by_thread: bool = False):
+    """
+    Applies `apply(message_ids)` to the messages matching `query`, recording the chunk in the active journal.
+    Finished chunks are skipped and planned ones reuse their recorded IDs instead of searching again.
+    With by_thread, the IDs are those of the matching threads (listed without any metadata fetch).
+    Returns the number of messages (or threads) mutated (0 on failure; the chunk is then retried by the next run).
+    """
+    run_journal = journal.current()
+    if by_thread:
+        action = f"thread-{action}"
+    key = journal.MutationJournal.key(action, query)
+    if run_journal is not None and run_journal.is_done(key):
+        return run_journal.result(key) or 0
+
+    message_ids = run_journal.planned_ids(key) if run_journal is not None else None
+    if message_ids is None:
+        try:
+            if by_thread:
+                message_ids = await list_thread_ids(get_gmail_service(), query, 1000)
+            else:
+                messages = await retry_async(
+                    gmail_list.uncached,
+                    query,
+                    retries=1,
+                    logger=lambda m: sync_log("WARNING", "google_tools", m)
+                )
+                message_ids = [m["id"] for m in messages or []]
+        except Exception as e:
+            await log("ERROR", "google_tools", f"Failed fetching messages for bulk {action}: {e}")
+            if run_journal is not None:
+                run_journal.fail(key)
+            return 0
+        if run_journal is not None and message_ids:
+            run_journal.plan(key, action, message_ids)
+
+    if message_ids:
+        try:
+            await apply(message_ids)
+        except Exception as e:
+            await log("ERROR", "google_tools", f"Batch {action} failed: {e}")
+            if run_journal is not None:
+                run_journal.fail(key)
+            return 0
+
+    if run_journal is not None:
+        run_journal.complete(key, len(message_ids))
+    return len(message_ids)
+
 
 # --- Gmail operations ---
 from asyncio import get_running_loop
@@ -406,289 +908,1278 @@ from asyncio import get_running_loop
 BATCH_SIZE = 100  # Max email addresses per query batch
 
 @mcp.tool()
-async def clean_up_inbox():
+@invalidates("gmail")
+async def clean_up_inbox(by_thread: bool = False):
     """
-    Cleans up the inbox by:
-    - Cleaning and deduplicating delete_filter.txt and archive_filter.txt
-    - Adding senders of emails labeled 'Delete' to delete_filter.txt
-    - Deleting all emails matching delete_filter.txt in batched queries
-    - Archiving all emails matching archive_filter.txt in batched queries
-    - Archiving all read emails in the inbox
+    Starts an inbox cleanup as a background job and returns its job ID immediately.
+    The job:
+    - Cleans and deduplicates delete_filter.txt and archive_filter.txt
+    - Adds senders of emails labeled 'Delete' to delete_filter.txt
+    - Deletes all emails matching delete_filter.txt in batched queries
+    - Archives all emails matching archive_filter.txt in batched queries
+    - Archives all read emails in the inbox
+    With by_thread=True, whole conversations are moved to the trash or archived, which needs far
+    fewer requests for long threads. A conversation matches when any one of its messages does, so
+    replies and messages from other senders in it are trashed or archived too; trashing keeps them
+    recoverable for 30 days. Read emails are only archived in conversations with no unread message.
+    Use job_status / job_wait to follow it and job_cancel to stop it.
     """
-    # Must be done first, to remove "Save" addresses from delete file if they exist
-    await add_if_labeled_archive()
+    return submit_job("clean_up_inbox", lambda: run_inbox_cleanup(by_thread), {"by_thread": by_thread})
 
-    # Run second
-    await add_if_labeled_delete()
+
+async def run_inbox_cleanup(by_thread: bool = False):
+    """
+    Runs the inbox cleanup described in clean_up_inbox in the current task.
+    If a previous run was interrupted, it resumes from that run's journal.
+    """
+    async with journaled_run("clean_up_inbox"):
+        jobs.report_progress(message="Updating filter lists from labels")
+        # Must be done first, to remove "Save" addresses from delete file if they exist
+        await run_journaled_stage("scan", "label:Save", add_if_labeled_archive)
+
+        # Run second
+        await run_journaled_stage("scan", "label:Delete", add_if_labeled_delete)
     
 
-    delete_senders = await get_filter_string("delete_filter.txt")
-    archive_senders = await get_filter_string("archive_filter.txt")
+        delete_senders = await get_filter_string(delete_filter_name())
+        archive_senders = await get_filter_string(archive_filter_name())
 
-    if not delete_senders:
-        await log("WARNING", "google_tools", "Delete filter file is empty.")
-        return {"error": "Delete filter file is empty."}
+        if not delete_senders:
+            await log("WARNING", "google_tools", "Delete filter file is empty.")
+            return {"error": "Delete filter file is empty."}
 
-    if not archive_senders:
-        await log("WARNING", "google_tools", "Archive filter file is empty.")
-        return {"error": "Archive filter file is empty."}
+        if not archive_senders:
+            await log("WARNING", "google_tools", "Archive filter file is empty.")
+            return {"error": "Archive filter file is empty."}
 
-    # --- DELETE in batched queries ---
-    deleted_total = await process_batched(delete_senders, action="delete")
+        # --- DELETE in batched queries ---
+        jobs.report_progress(0, total=-(-len(delete_senders) // BATCH_SIZE) + -(-len(archive_senders) // BATCH_SIZE) + 1)
+        deleted_total = await process_batched(delete_senders, action="delete", by_thread=by_thread)
 
-    # --- ARCHIVE in batched queries ---
-    archived_total = await process_batched(archive_senders, action="archive")
+        # --- ARCHIVE in batched queries ---
+        archived_total = await process_batched(archive_senders, action="archive", by_thread=by_thread)
 
-    # --- Archive all read emails in Inbox ---
-    await log("INFO", "google_tools", "Archiving all read emails in Inbox...")
-    try:
-        result = await retry_async(
-            gmail_modify,
-            query="is:read in:inbox",
-            add_labels=["archive"],
-            retries=1,
-            logger=lambda m: sync_log("WARNING", "google_tools", m)
-        )
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Failed archiving read emails: {e}")
-        result = {"count": 0}
+        # --- Archive all read emails in Inbox ---
+        jobs.report_progress(message="Archiving read emails")
+        await log("INFO", "google_tools", "Archiving all read emails in Inbox...")
+        try:
+            if by_thread:
+                archive_read = lambda: retry_async(
+                    archive_read_threads,
+                    retries=1,
+                    logger=lambda m: sync_log("WARNING", "google_tools", m)
+                )
+            else:
+                archive_read = lambda: retry_async(
+                    gmail_modify,
+                    query="is:read in:inbox",
+                    add_labels=["archive"],
+                    retries=1,
+                    logger=lambda m: sync_log("WARNING", "google_tools", m)
+                )
+            result = await run_journaled_stage("archive", "is:read in:inbox", archive_read)
+        except Exception as e:
+            await log("ERROR", "google_tools", f"Failed archiving read emails: {e}")
+            result = {"count": 0}
 
-    read_archived_count = result.get("count", 0)
-    archived_total += read_archived_count
+        read_archived_count = result.get("count", 0)
+        archived_total += read_archived_count
+        advance_progress()
 
-    sender_numbers = len(delete_senders) + len(archive_senders)
+        sender_numbers = len(delete_senders) + len(archive_senders)
 
-    await log(
-        "INFO",
-        "google_tools",
-        f"Cleaned inbox: {deleted_total} deleted, {archived_total} archived from {sender_numbers} senders (including {read_archived_count} read emails)."
-    )
+        await log(
+            "INFO",
+            "google_tools",
+            f"Cleaned inbox: {deleted_total} deleted, {archived_total} archived from {sender_numbers} senders (including {read_archived_count} read emails)."
+        )
 
-    return {
-        "status": "cleanup complete",
-        "senders_processed": sender_numbers,
-        "deleted_total": deleted_total,
-        "archived_total": archived_total,
-        "archived_read_emails": read_archived_count,
-    }
+        return {
+            "status": "cleanup complete",
+            "senders_processed": sender_numbers,
+            "deleted_total": deleted_total,
+            "archived_total": archived_total,
+            "archived_read_emails": read_archived_count,
+        }
 
 
-async def process_batched(senders: List[str], action: str):
+async def process_batched(senders: List[str], action: str, by_thread: bool = False):
     """Splits senders into batches of BATCH_SIZE and processes each batch."""
     total = 0
     for i in range(0, len(senders), BATCH_SIZE):
         batch = senders[i:i + BATCH_SIZE]
         query = " OR ".join([f"from:{s}" for s in batch])
-        total += await process_bulk(query, action)
+        total += await process_bulk(query, action, by_thread)
+        advance_progress(f"{action.capitalize()}d {total} messages from {min(i + BATCH_SIZE, len(senders))}/{len(senders)} senders")
     return total
 
 
-async def process_bulk(query: str, action: str):
-    """Fetches all matching messages for a query and performs batch delete or archive."""
+async def process_bulk(query: str, action: str, by_thread: bool = False):
+    """Fetches all matching messages (or threads) for a query and performs batch delete or archive."""
     await log("INFO", "google_tools", f"Processing bulk {action} query: {query[:200]}{'...' if len(query)>200 else ''}")
 
-    try:
-        messages = await retry_async(
-            gmail_list,
-            f"in:inbox ({query})",
-            retries=1,
-            logger=lambda m: sync_log("WARNING", "google_tools", m)
-        )
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Failed fetching messages for bulk {action}: {e}")
-        return 0
-
-    if not messages:
-        return 0
-
-    message_ids = [m["id"] for m in messages]
-
-    try:
-        if action == "delete":
-            await gmail_batch_delete(message_ids)
-        elif action == "archive":
-            await gmail_batch_archive(message_ids)
-        else:
-            raise ValueError(f"Unknown action: {action}")
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Batch {action} failed: {e}")
+    if action == "delete":
+        apply = gmail_threads_trash if by_thread else gmail_batch_delete
+    elif action == "archive":
+        apply = gmail_threads_archive if by_thread else gmail_batch_archive
+    else:
+        await log("ERROR", "google_tools", f"Unknown action: {action}")
         return 0
 
-    await log("INFO", "google_tools", f"|__ {action.capitalize()}d {len(message_ids)} messages in this batch.")
-    return len(message_ids)
+    count = await run_journaled_chunk(action, f"in:inbox ({query})", apply, by_thread)
+    if count:
+        await log("INFO", "google_tools", f"|__ {action.capitalize()}d {count} messages in this batch.")
+    return count
 
 
 async def gmail_batch_delete(message_ids: List[str]):
     """Deletes multiple messages in one API call."""
     service = get_gmail_service()
-    service.users().messages().batchDelete(userId="me", body={"ids": message_ids}).execute()
+    await execute_async(service.users().messages().batchDelete(userId="me", body={"ids": message_ids}))
 
 
 async def gmail_batch_archive(message_ids: List[str]):
     """Archives multiple messages in one API call (removes 'INBOX' label)."""
     service = get_gmail_service()
-    service.users().messages().batchModify(
+    await execute_async(service.users().messages().batchModify(
         userId="me",
         body={"ids": message_ids, "removeLabelIds": ["INBOX"]}
-    ).execute()
+    ))
+
+@mcp.tool()
+@invalidates("gmail")
+async def clean_up_archive(save_attachments: bool = False):
+    """
+    Starts an archive cleanup as a background job and returns its job ID immediately.
+    The job:
+    - Cleans and deduplicates delete_filter.txt
+    - Adds senders of emails labeled 'Delete' to delete_filter.txt
+    - Deletes archived emails from delete_filter.txt in batches
+    - Applies the retention rules in data/retention.json (see gmail_retention); without that file,
+      deletes archived emails older than 6 months that are NOT marked Important
+    If save_attachments is True, attachments are saved to data/attachments/ before their messages are deleted.
+    Use job_status / job_wait to follow it and job_cancel to stop it.
+    """
+    return submit_job("clean_up_archive", lambda: run_archive_cleanup(save_attachments),
+                      {"save_attachments": save_attachments})
+
+
+async def save_and_delete(message_ids: List[str]):
+    """Saves the messages' attachments, then deletes them; fails (so nothing is deleted) if any could not be saved."""
+    stats = await save_message_attachments(get_gmail_service(), message_ids)
+    if stats["failed"]:
+        raise RuntimeError(f"Could not save attachments of {len(stats['failed'])} messages; not deleting this chunk")
+    await gmail_batch_delete(message_ids)
+
+
+async def run_archive_cleanup(save_attachments: bool = False):
+    """
+    Runs the archive cleanup described in clean_up_archive in the current task.
+    If a previous run was interrupted, it resumes from that run's journal.
+    """
+    delete = save_and_delete if save_attachments else gmail_batch_delete
+    async with journaled_run("clean_up_archive"):
+        jobs.report_progress(message="Updating filter lists from labels")
+        await run_journaled_stage("scan", "label:Delete", add_if_labeled_delete)
+
+        delete_senders = await get_filter_string(delete_filter_name())
+
+        if not delete_senders:
+            await log("WARNING", "google_tools", "Delete filter file is empty.")
+            return {"error": "Delete filter file is empty."}
+
+        # --- DELETE archived emails matching delete_filter.txt ---
+        jobs.report_progress(0, total=-(-len(delete_senders) // BATCH_SIZE) + 1)
+        deleted_total = await process_batched_archive(delete_senders, delete)
+
+        # --- Retention rules (default: delete archived emails older than 6 months and NOT Important) ---
+        jobs.report_progress(message="Applying retention rules")
+        await log("INFO", "google_tools", f"Applying retention rules from {RETENTION_PATH.name}...")
+        rules = await apply_retention(save_attachments=save_attachments)
+        removed = sum(r["applied"] for r in rules if r["action"] in ("trash", "delete"))
+        deleted_total += removed
+        advance_progress()
+
+        await log(
+            "INFO",
+            "google_tools",
+            f"Cleaned archive: {deleted_total} deleted from {len(delete_senders)} senders (including {removed} by retention rules)."
+        )
+
+        return {
+            "status": "archive cleanup complete",
+            "senders_processed": len(delete_senders),
+            "deleted_total": deleted_total,
+            "retention": rules,
+        }
+
+
+async def process_batched_archive(senders: List[str], delete=gmail_batch_delete):
+    """Splits senders into batches of BATCH_SIZE and deletes their archived messages."""
+    total_deleted = 0
+    for i in range(0, len(senders), BATCH_SIZE):
+        batch = senders[i:i + BATCH_SIZE]
+        query = " OR ".join([f"from:{s}" for s in batch])
+        total_deleted += await process_bulk_archive(query, delete)
+        advance_progress(f"Deleted {total_deleted} archived messages from {min(i + BATCH_SIZE, len(senders))}/{len(senders)} senders")
+    return total_deleted
+
+
+async def process_bulk_archive(query: str, delete=gmail_batch_delete):
+    """Fetches archived messages for a query and deletes them in bulk."""
+    await log("INFO", "google_tools", f"Processing archived delete batch: {query[:200]}{'...' if len(query)>200 else ''}")
+
+    # Archived only (not in inbox)
+    count = await run_journaled_chunk("delete", f"-in:inbox ({query})", delete)
+    if count:
+        await log("INFO", "google_tools", f"|__ Deleted {count} archived messages in this batch.")
+    return count
+
+# --- Retention rules ---
+
+async def iter_message_id_pages(svc, query: str):
+    """Yields the message IDs matching `query` one page (up to 500 IDs) at a time, IDs only."""
+    page_token = None
+    while True:
+        resp = await execute_async(svc.users().messages().list(userId="me", q=query, pageToken=page_token,
+                                                               maxResults=500, fields=MESSAGE_ID_FIELDS))
+        yield [m["id"] for m in resp.get("messages", [])]
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return
+
+
+async def apply_retention(dry_run: bool = False, save_attachments: bool = False) -> list:
+    """
+    Evaluates the retention rules (highest priority first) and applies their actions.
+
+    Each rule's query is listed for message IDs only. Gmail cannot evaluate several rules in
+    one search, so there is one listing per rule. A message belongs to the first rule that
+    matches it, so a "keep" rule or any higher-priority rule shields it from the rules below.
+    Actions are applied with batchModify/batchDelete in chunks of 1000, each chunk planned
+    and completed in the active journal (or a "retention" journal), so an interrupted run
+    replays its unfinished chunks first; every message a journaled chunk covers stays
+    claimed, so a resumed run does not hand it to a lower-priority rule. A chunk that fails is
+    logged, left unfinished in the journal and listed in its rule's "errors"; the other chunks
+    and rules still run, and "applied" counts only the chunks that succeeded. Returns per-rule counts.
+
+    Memory: the IDs of every matched message are held until the run ends (roughly 100 MB per
+    million messages). A rule's matches are listed in full before its chunks are applied,
+    because changing messages while paging through a query shifts the pages still to come.
+    """
+    svc = get_gmail_service()
+    rules = retention.load_rules(RETENTION_PATH)
+    if journal.current() is None and not dry_run:
+        async with journaled_run("retention"):
+            return await apply_retention(dry_run, save_attachments)
+    run_journal = journal.current()
+
+    async def mutate(action, ids):
+        if save_attachments and action in ("trash", "delete"):
+            stats = await save_message_attachments(svc, ids)
+            if stats["failed"]:
+                raise RuntimeError(f"Could not save attachments of {len(stats['failed'])} messages; not changing this chunk")
+        await execute_async(retention.mutation_request(svc, action, ids))
+
+    claimed = set()
+    applied = {rule["name"]: 0 for rule in rules}
+    errors = {rule["name"]: [] for rule in rules}
+
+    async def apply_chunk(key, action, rule_name, ids):
+        """Applies one planned chunk; a failure is logged and left unfinished in the journal for the next run."""
+        try:
+            await mutate(action, ids)
+        except Exception as e:
+            await log("ERROR", "google_tools", f"Retention rule '{rule_name}' ({action}) failed on {len(ids)} messages: {e}")
+            run_journal.fail(key)
+            errors.setdefault(rule_name, []).append(str(e))
+            return
+        run_journal.complete(key, len(ids))
+        applied[rule_name] = applied.get(rule_name, 0) + len(ids)
+
+    if run_journal is not None and not dry_run:
+        for key, entry in list(run_journal.planned.items()):
+            if not entry["a"].startswith("retention:"):
+                continue
+            # Messages already handled by a rule may now match a lower-priority one (e.g. once archived).
+            claimed.update(entry["ids"])
+            if not run_journal.is_done(key):
+                # "retention:<action>:<rule name>"; journals from before rule names were recorded lack the name.
+                _, action, rule_name = (entry["a"].split(":", 2) + [""])[:3]
+                await apply_chunk(key, action, rule_name or "(resumed)", entry["ids"])
+
+    results = []
+    for rule in rules:
+        query = retention.rule_query(rule)
+        jobs.report_progress(message=f"Retention rule '{rule['name']}': listing {query}")
+        matched = []
+        try:
+            async for page in iter_message_id_pages(svc, query):
+                fresh = [i for i in page if i not in claimed]
+                claimed.update(fresh)
+                matched.extend(fresh)
+        except Exception as e:
+            await log("ERROR", "google_tools", f"Retention rule '{rule['name']}': listing failed: {e}")
+            errors[rule["name"]].append(str(e))
+            matched = []
+
+        if rule["action"] != "keep" and not dry_run:
+            for start in range(0, len(matched), retention.MUTATION_CHUNK):
+                ids = matched[start:start + retention.MUTATION_CHUNK]
+                action = f"retention:{rule['action']}:{rule['name']}"
+                key = journal.MutationJournal.key(action, f"{ids[0]}\0{ids[-1]}\0{len(ids)}")
+                run_journal.plan(key, action, ids)
+                await apply_chunk(key, rule["action"], rule["name"], ids)
+                jobs.report_progress(message=f"Retention rule '{rule['name']}': "
+                                             f"{rule['action']} {applied[rule['name']]}/{len(matched)}")
+        result = {"rule": rule["name"], "action": rule["action"], "query": query,
+                  "matched": len(matched), "applied": applied[rule["name"]]}
+        if errors[rule["name"]]:
+            result["errors"] = errors[rule["name"]][:10]
+        results.append(result)
+        await log("INFO", "google_tools", f"|__ Retention rule '{rule['name']}' ({rule['action']}): "
+                                          f"{len(matched)} matched, {applied[rule['name']]} changed")
+    # Chunks replayed for rules no longer in the file (or from older journals) are reported too.
+    for name in sorted((errors.keys() | applied.keys()) - {rule["name"] for rule in rules}):
+        result = {"rule": name, "action": None, "query": None, "matched": 0, "applied": applied.get(name, 0)}
+        if errors.get(name):
+            result["errors"] = errors[name][:10]
+        results.append(result)
+    return results
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_retention(dry_run: bool = True, save_attachments: bool = False):
+    """
+    Applies the retention rules in data/retention.json as a background job.
+    The file holds {"rules": [...]}; each rule has a name, an action ("keep", "archive", "trash"
+    or "delete"), a priority (higher wins when rules overlap) and conditions: "in" ("inbox",
+    "archive" or "anywhere"), label, from (addresses or domains), older_than ("6m"),
+    larger_than ("5M") and query (extra Gmail search terms). Starred and Important messages are
+    kept unless a rule sets keep_starred / keep_important to false.
+    Without the file, the default rule deletes archived mail older than 6 months that is not Important.
+    With dry_run (the default) only the counts per rule are reported.
+    """
+    try:
+        retention.load_rules(RETENTION_PATH)
+    except (ValueError, json.JSONDecodeError) as e:
+        return {"error": f"Invalid retention rules: {e}"}
+    args = {"dry_run": dry_run, "save_attachments": save_attachments}
+
+    async def run():
+        rules = await apply_retention(dry_run, save_attachments)
+        return {"status": "retention dry run" if dry_run else "retention applied", "rules": rules}
+
+    return submit_job("gmail_retention", run, args)
+
+
+# --- Export ---
+
+@mcp.tool()
+async def gmail_export(query: str = "in:anywhere", name: str = None, format: str = "mbox", compression: str = "auto",
+                       max_messages: int = None):
+    """
+    Backs up every message matching `query` (including archived mail) to data/exports/<name>/ as a background job.
+    `format` is "mbox" (one compressed mbox file per run) or "files" (one compressed .eml file per message);
+    `compression` is "auto" (zstd if installed, else gzip), "zstd", "gzip" or "none".
+    Messages are fetched in their original RFC 822 form with batch requests and streamed to disk,
+    so memory use stays flat. A manifest.jsonl lists every saved message: re-running the same export
+    resumes an interrupted one or, later, saves only new messages. Data is fsynced before its manifest lines
+    are written, and an mbox file cut short by a crash is repaired on the next run. `name` defaults to one
+    derived from the query.
+    """
+    if format not in export.FORMATS:
+        return {"error": f"Unknown format '{format}'. Use 'mbox' or 'files'."}
+    try:
+        compression = export.resolve_compression(compression)
+    except ValueError as e:
+        return {"error": str(e)}
+    name = name or re.sub(r"[^A-Za-z0-9._-]+", "-", query).strip("-")[:60] or "export"
+    args = {"query": query, "name": name, "format": format, "compression": compression, "max_messages": max_messages}
+    return submit_job("gmail_export", lambda: run_export(query, name, format, compression, max_messages), args)
+
+
+def write_export_chunk(writer, ids: list, responses: list) -> tuple[list, list]:
+    """Decodes and writes one fetched chunk, then flushes it to disk. Returns (manifest entries, failures)."""
+    entries, failed = [], []
+    for msg_id, (resource, error) in zip(ids, responses):
+        if error is not None:
+            failed.append({"id": msg_id, "error": str(error)})
+            continue
+        raw = mime.b64url_decode(resource["raw"])
+        internal_date = int(resource.get("internalDate") or 0)
+        entry = {"id": msg_id, "threadId": resource.get("threadId"), "labelIds": resource.get("labelIds", []),
+                 "internalDate": internal_date, "size": len(raw), "file": writer.write(msg_id, raw, internal_date)}
+        if isinstance(writer, export.MboxWriter):
+            entry["end"] = writer.bytes
+        entries.append(entry)
+    writer.flush()
+    return entries, failed
+
+
+def recover_exports(root: Path, manifest: export.Manifest) -> list:
+    """
+    Completes the mbox files of interrupted exports: each is cut back to the messages its manifest
+    lists and given the compression trailer it is missing. Returns the names of the files recovered.
+    """
+    recovered = []
+    for name, length in list(manifest.unfinished.items()):
+        path = root / name
+        if not path.exists():
+            sync_log("WARNING", "google_tools", f"Export file {path} listed in the manifest is missing.")
+            continue
+        export.recover_mbox(path, length, export.compression_of(path))
+        manifest.mark_complete(name)
+        recovered.append(name)
+    return recovered
+
+
+_active_exports = set()
+_active_exports_lock = threading.Lock()
+
+
+async def run_export(query: str, name: str, format: str = "mbox", compression: str = "gzip", max_messages: int = None):
+    """
+    Runs the export described in gmail_export in the current task.
+    Only one run at a time may write an export's directory; a second one raises RuntimeError.
+    """
+    account = accounts.current_account()
+    root = EXPORT_DIR / account.name / name if account else EXPORT_DIR / name
+    with _active_exports_lock:
+        if root in _active_exports:
+            raise RuntimeError(f"Export '{name}' is already running{f' for {account.name}' if account else ''}.")
+        _active_exports.add(root)
+    try:
+        return await _run_export(query, root, format, compression, max_messages)
+    finally:
+        with _active_exports_lock:
+            _active_exports.discard(root)
+
+
+async def _run_export(query: str, root: Path, format: str, compression: str, max_messages: int | None):
+    svc = get_gmail_service()
+    manifest = export.Manifest(root / "manifest.jsonl")
+    recovered = await asyncio.to_thread(recover_exports, root, manifest)
+    if recovered:
+        await log("INFO", "google_tools", f"Recovered interrupted export files: {', '.join(recovered)}")
+
+    todo, listed = [], 0
+    async for page in iter_message_id_pages(svc, query):
+        listed += len(page)
+        todo.extend(i for i in page if i not in manifest.ids)
+        jobs.report_progress(message=f"Listed {listed} messages, {len(todo)} not yet exported")
+        if max_messages and len(todo) >= max_messages:
+            todo = todo[:max_messages]
+            break
+    if not todo:
+        manifest.close()
+        return {"status": "nothing to export", "path": str(root), "skipped": len(manifest.ids)}
+
+    if format == "mbox":
+        writer = await asyncio.to_thread(export.MboxWriter.create, root, compression)
+    else:
+        writer = export.FilesWriter(root, compression)
+
+    def fetch(chunk):
+        requests = [svc.users().messages().get(userId="me", id=i, format="raw", fields=MESSAGE_EXPORT_FIELDS)
+                    for i in chunk]
+        return asyncio.create_task(batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2)))
+
+    chunks = [todo[i:i + EXPORT_CHUNK] for i in range(0, len(todo), EXPORT_CHUNK)]
+    exported, failed = 0, []
+    pending = fetch(chunks[0])
+    writing = None
+    finished = False
+    try:
+        for n, chunk in enumerate(chunks):
+            responses = await pending
+            # Fetch the next chunk while this one is written.
+            pending = fetch(chunks[n + 1]) if n + 1 < len(chunks) else None
+            writing = asyncio.ensure_future(asyncio.to_thread(write_export_chunk, writer, chunk, responses))
+            entries, chunk_failed = await writing
+            manifest.add(entries)
+            exported += len(entries)
+            failed.extend(chunk_failed)
+            jobs.report_progress(exported + len(failed), len(todo), f"Exported {exported} messages")
+        finished = True
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if writing is not None and not writing.done():
+            # A cancelled job must not close the file under a write still running in its thread.
+            await asyncio.wait([writing])
+        await asyncio.to_thread(writer.close)
+        if finished and format == "mbox":
+            manifest.mark_complete(writer.path.name)
+        manifest.close()
+
+    await log("INFO", "google_tools", f"Exported {exported} messages matching '{query}' to {root} "
+                                      f"({len(manifest.ids) - exported} already saved, {len(failed)} failed)")
+    return {"status": "export complete", "path": str(root), "exported": exported,
+            "skipped": len(manifest.ids) - exported, "failed": failed, "bytes": writer.bytes,
+            "format": format, "compression": compression}
+
+
+# --- Multi-account cleanup ---
+
+CLEANUP_ACTIONS = {"inbox": run_inbox_cleanup, "archive": run_archive_cleanup}
+
+
+async def clean_up_account(account: accounts.Account, actions: List[str]):
+    """Runs the cleanup actions for one account with that account active in the current task."""
+    token = accounts.activate(account)
+    report = {"account": account.name}
+    try:
+        for action in actions:
+            try:
+                report[action] = await CLEANUP_ACTIONS[action]()
+            except accounts.QuotaBudgetExceeded as e:
+                await log("WARNING", "google_tools", f"[{account.name}] {e}. Stopping.")
+                report[action] = {"error": str(e)}
+                break
+            except Exception as e:
+                await log("ERROR", "google_tools", f"[{account.name}] {action} cleanup failed: {e}")
+                report[action] = {"error": str(e)}
+    finally:
+        report["quota_units_used"] = account.budget.used
+        report["api_calls"] = account.budget.calls
+        accounts.deactivate(token)
+    return report
+
+
+async def _clean_up_shard(account_dicts: List[dict], actions: List[str]):
+    shard = [accounts.Account(**a) for a in account_dicts]
+    return await asyncio.gather(*(clean_up_account(a, actions) for a in shard))
+
+
+def clean_up_shard(account_dicts: List[dict], actions: List[str]):
+    """Process-pool entry point: cleans up one shard of accounts concurrently."""
+    return asyncio.run(_clean_up_shard(account_dicts, actions))
+
+
+@mcp.tool()
+async def accounts_list():
+    """
+    Lists the accounts in the multi-account registry (data/accounts.json)
+    with their token file, filter file names and quota budget.
+    """
+    return [a.to_dict() for a in accounts.load_accounts(ACCOUNTS_PATH)]
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def clean_up_accounts(action: str = "inbox", names: list = None, workers: int = 4):
+    """
+    Runs clean_up_inbox and/or clean_up_archive for every account in data/accounts.json.
+    `action` is "inbox", "archive" or "both". `names` limits the run to the listed accounts.
+    Accounts are sharded over `workers` processes and cleaned up concurrently within each one.
+    Runs as a background job; its result is a report per account, including the quota units it used.
+    """
+    args = {"action": action, "names": names, "workers": workers}
+    return submit_job("clean_up_accounts", lambda: run_accounts_cleanup(action, names, workers), args)
+
+
+async def run_accounts_cleanup(action: str = "inbox", names: list = None, workers: int = 4):
+    """Runs the multi-account cleanup described in clean_up_accounts in the current task."""
+    actions = ["inbox", "archive"] if action == "both" else [action]
+    if any(a not in CLEANUP_ACTIONS for a in actions):
+        return {"error": f"Unknown action '{action}'. Use 'inbox', 'archive' or 'both'."}
+
+    registry = accounts.load_accounts(ACCOUNTS_PATH)
+    if names:
+        registry = [a for a in registry if a.name in names]
+    if not registry:
+        await log("WARNING", "google_tools", "No accounts to clean up.")
+        return {"error": f"No matching accounts in {ACCOUNTS_PATH}."}
+
+    workers = max(1, min(int(workers or 4), len(registry)))
+    shards = [registry[i::workers] for i in range(workers)]
+    await log("INFO", "google_tools", f"Cleaning up {len(registry)} accounts ({', '.join(actions)}) over {workers} processes")
+
+    loop = asyncio.get_running_loop()
+    jobs.report_progress(0, total=len(shards))
+
+    async def run_shard(pool, shard):
+        try:
+            return await loop.run_in_executor(pool, clean_up_shard, [a.to_dict() for a in shard], actions)
+        finally:
+            advance_progress(f"Finished shard of {len(shard)} accounts")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        shard_results = await asyncio.gather(*(run_shard(pool, shard) for shard in shards), return_exceptions=True)
+
+    reports = {}
+    for shard, result in zip(shards, shard_results):
+        if isinstance(result, Exception):
+            await log("ERROR", "google_tools", f"Cleanup worker failed: {result}")
+            for a in shard:
+                reports[a.name] = {"account": a.name, "error": f"Worker failed: {result}"}
+            continue
+        for report in result:
+            reports[report["account"]] = report
+
+    def total(key):
+        return sum(r.get(act, {}).get(key, 0) for r in reports.values() for act in actions if isinstance(r.get(act), dict))
+
+    await log("INFO", "google_tools", f"Cleaned {len(reports)} accounts: {total('deleted_total')} deleted, {total('archived_total')} archived.")
+    return {
+        "status": "multi-account cleanup complete",
+        "accounts": reports,
+        "deleted_total": total("deleted_total"),
+        "archived_total": total("archived_total"),
+    }
+
+@mcp.tool()
+async def add_sender_to_delete_list(sender: str):
+    """
+    Adds a sender's email address to the delete list.
+    The filter is stored in a text file.
+    Returns a confirmation message.
+    """
+    if not sender or "@" not in sender:
+        await log("WARNING", "google_tools", f"Invalid sender email: {sender}")
+        return {"error": "Invalid sender email provided."}
+
+    add_to_delete_filter_string(sender)
+    await log("INFO", "google_tools", f"Added sender {sender} to delete filter list")
+    return {"status": "added", "sender": sender}
+
+@mcp.tool()
+async def add_sender_to_archive_list(sender: str):
+    """
+    Adds a sender's email address to the delete list.
+    The filter is stored in a text file.
+    Returns a confirmation message.
+    """
+    if not sender or "@" not in sender:
+        await log("WARNING", "google_tools", f"Invalid sender email: {sender}")
+        return {"error": "Invalid sender email provided."}
+
+    add_to_archive_filter_string(sender)
+    await log("INFO", "google_tools", f"Added sender {sender} to delete filter list")
+    return {"status": "added", "sender": sender}
+
+@mcp.tool()
+@cached_tool("gmail")
+async def gmail_list(query: str = None, max_results: int = 1000, sub: bool = False, page_size: int = None,
+                     cursor: str = None, stream: bool = False, by_thread: bool = False):
+    """
+    Lists Gmail messages matching the query, returning metadata like Subject, From, and Date.
+    Returns a list of dictionaries with message ID, subject, sender, and date.
+    If sub is True, it logs the action with a subordinate indentation.
+    With `page_size` or `cursor`, returns one page as {"items": [...], "next_cursor": ...};
+    call again with only `cursor=next_cursor` for the next page, until next_cursor is null.
+    If stream is True, each message is also sent as an MCP progress notification as soon as it is ready.
+    With by_thread=True, lists conversations instead (up to `max_results` threads): each entry has the
+    thread ID, Subject, latest Date, senders, message count, message IDs and labels, fetched with one
+    batched threads.get per thread rather than one request per message.
+    """
+    svc = get_gmail_service()
+    if page_size or cursor:
+        async def fetch(params, page_token, count):
+            if params.get("by_thread"):
+                resp = await execute_async(svc.users().threads().list(userId="me", q=params["query"], pageToken=page_token,
+                                                                      maxResults=min(count, 500),
+                                                                      fields=threads.THREAD_ID_FIELDS))
+                items = await fetch_thread_summaries(svc, [t["id"] for t in resp.get("threads", [])])
+                return items, resp.get("nextPageToken")
+            resp = await execute_async(svc.users().messages().list(userId="me", q=params["query"], pageToken=page_token,
+                                                                   maxResults=min(count, 500), fields=MESSAGE_ID_FIELDS))
+            items = await fetch_message_headers(svc, [m["id"] for m in resp.get("messages", [])])
+            return items, resp.get("nextPageToken")
+        return await paged("gmail_list", {"query": query, "by_thread": by_thread}, cursor, page_size, fetch, stream)
+
+    if by_thread:
+        results = await fetch_thread_summaries(svc, await list_thread_ids(svc, query, max_results))
+        if stream:
+            for i, item in enumerate(results, 1):
+                await push_progress(i, len(results), json.dumps(item))
+        await log("INFO", "google_tools", f"{'|__ ' if sub else ''}Listed {len(results)} Gmail threads")
+        return results
+
+    resp = await execute_async(svc.users().messages().list(userId="me", q=query, maxResults=max_results,
+                                                           fields=MESSAGE_ID_FIELDS))
+    results = await fetch_message_headers(svc, [m["id"] for m in resp.get("messages", [])], stream)
+    
+    if sub:
+        await log("INFO", "google_tools", f"|__ Listed {len(results)} Gmail messages")
+    else: 
+        await log("INFO", "google_tools", f"Listed {len(results)} Gmail messages")
+
+    return results
+
+
+async def fetch_message_headers(svc, ids: list, stream: bool = False) -> list:
+    """Fetches Subject, From and Date of messages concurrently, keeping the order of `ids`."""
+    # Metadata fetches overlap on the shared connection pool; one in flight per pool member.
+    limit = asyncio.Semaphore(HTTP_POOL_SIZE)
+    done = 0
+
+    async def fetch(msg_id):
+        nonlocal done
+        async with limit:
+            meta = await execute_async(svc.users().messages().get(userId="me", id=msg_id, format="metadata",
+                                                                  metadataHeaders=["Subject","From","Date"],
+                                                                  fields=MESSAGE_HEADER_FIELDS))
+        item = {"id": msg_id, **{h["name"]: h["value"] for h in meta["payload"]["headers"]}}
+        if stream:
+            done += 1
+            await push_progress(done, len(ids), json.dumps(item))
+        return item
+
+    return list(await asyncio.gather(*(fetch(i) for i in ids)))
+
+
+_decode_pool = None
+
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(max_workers=DECODE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _decode_pool
+
+
+async def decode_messages(resources: list, max_chars: int, attachments: bool = True) -> list:
+    """Summarizes message resources with mime.summarize_messages, spread over the decode pool."""
+    if len(resources) <= DECODE_INLINE_MAX:
+        return await asyncio.to_thread(mime.summarize_messages, resources, max_chars, attachments)
+    loop = asyncio.get_running_loop()
+    size = -(-len(resources) // DECODE_WORKERS)
+    chunks = [resources[i:i + size] for i in range(0, len(resources), size)]
+    decoded = await asyncio.gather(*(
+        loop.run_in_executor(get_decode_pool(), mime.summarize_messages, chunk, max_chars, attachments)
+        for chunk in chunks
+    ))
+    return [summary for chunk in decoded for summary in chunk]
+
+
+@mcp.tool()
+async def gmail_get_messages(ids: list = None, query: str = None, max_results: int = 50, format: str = "full",
+                             max_chars: int = mime.DEFAULT_MAX_CHARS, attachments: bool = True):
+    """
+    Fetches complete Gmail messages so their bodies can be read.
+    Pass message `ids`, or a `query` whose first `max_results` matches are fetched.
+    `format` is "full" (Gmail decodes the MIME tree) or "raw" (the original RFC 822 message).
+    Each result has the id, threadId, labelIds, Subject/From/To/Cc/Date, the text/plain body
+    (or text extracted from the HTML body) cut to `max_chars` characters with a `truncated` flag,
+    and, if `attachments` is True, the attachment names, types and sizes.
+    Results keep the order of `ids`; messages that could not be fetched have an "error" entry.
+    """
+    if format not in ("full", "raw"):
+        return {"error": f"Unknown format '{format}'. Use 'full' or 'raw'."}
+    svc = get_gmail_service()
+    if not ids:
+        if not query:
+            return {"error": "Pass message ids or a query."}
+        ids = await list_message_ids(svc, query, max_results)
+    if not ids:
+        return []
+
+    results = await fetch_messages(svc, ids, format, max_chars, attachments)
+    await log("INFO", "google_tools", f"Fetched {sum('error' not in r for r in results)} of {len(ids)} Gmail messages ({format})")
+    return results
+
+
+async def fetch_messages(svc, ids: list, format: str = "full", max_chars: int = mime.DEFAULT_MAX_CHARS,
+                         attachments: bool = True) -> list:
+    """
+    Batch-fetches and decodes messages (see gmail_get_messages) and adds them to the local search index.
+    Messages Gmail no longer has are dropped from the index.
+    """
+    fields = MESSAGE_RAW_FIELDS if format == "raw" else MESSAGE_FULL_FIELDS
+    requests = [svc.users().messages().get(userId="me", id=i, format=format, fields=fields) for i in ids]
+    responses = await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+
+    fetched = [r for r, error in responses if error is None]
+    decoded = iter(await decode_messages(fetched, max_chars, attachments))
+    results = []
+    missing = []
+    for msg_id, (response, error) in zip(ids, responses):
+        if error is None:
+            results.append(next(decoded))
+            continue
+        results.append({"id": msg_id, "error": str(error)})
+        if getattr(getattr(error, "resp", None), "status", None) == 404:
+            missing.append(msg_id)
+
+    index = get_mail_index()
+    await asyncio.to_thread(index.add, results)
+    if missing:
+        await asyncio.to_thread(index.remove, missing)
+    return results
+
+
+async def list_message_ids(svc, query: str = None, limit: int = 500, label_ids: list = None) -> list:
+    """Message IDs matching `query` and/or carrying all `label_ids`, newest first, following nextPageToken up to `limit` IDs."""
+    ids = []
+    page_token = None
+    while len(ids) < limit:
+        resp = await execute_async(svc.users().messages().list(userId="me", q=query, labelIds=label_ids,
+                                                               pageToken=page_token,
+                                                               maxResults=min(500, limit - len(ids)),
+                                                               fields=MESSAGE_ID_FIELDS))
+        ids.extend(m["id"] for m in resp.get("messages", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+    return ids
+
+
+# --- Threads ---
+
+async def list_thread_ids(svc, query: str = None, limit: int = 500, label_ids: list = None) -> list:
+    """Thread IDs matching `query`, newest first, following nextPageToken up to `limit` IDs."""
+    ids = []
+    page_token = None
+    while len(ids) < limit:
+        resp = await execute_async(svc.users().threads().list(userId="me", q=query, labelIds=label_ids,
+                                                              pageToken=page_token,
+                                                              maxResults=min(500, limit - len(ids)),
+                                                              fields=threads.THREAD_ID_FIELDS))
+        ids.extend(t["id"] for t in resp.get("threads", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+    return ids
+
+
+async def run_thread_requests(svc, requests: list) -> list:
+    """Sends per-thread requests as batch requests; returns the (response, error) pairs in order."""
+    return await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+
+
+async def fetch_thread_summaries(svc, ids: list) -> list:
+    """One threads.get(format=metadata) per thread, batched; summaries keep the order of `ids`."""
+    responses = await run_thread_requests(svc, [threads.get_request(svc, i) for i in ids])
+    return [threads.summarize_thread(r) if error is None else {"id": i, "error": str(error)}
+            for i, (r, error) in zip(ids, responses)]
+
+
+async def apply_thread_requests(svc, thread_ids: list, make_request) -> int:
+    """Runs `make_request(svc, thread_id)` for every thread in batches. Raises if any failed; returns the count."""
+    responses = await run_thread_requests(svc, [make_request(svc, i) for i in thread_ids])
+    failed = [i for i, (r, error) in zip(thread_ids, responses) if error is not None]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(thread_ids)} thread changes failed")
+    return len(thread_ids)
+
+
+async def gmail_threads_trash(thread_ids: List[str]):
+    """
+    Moves whole threads to the trash with batched threads.trash calls.
+    A thread matches a search when any one of its messages does, so the other messages
+    (replies, other senders) are trashed, never permanently deleted, and stay recoverable.
+    """
+    await apply_thread_requests(get_gmail_service(), thread_ids, threads.trash_request)
+
+
+async def gmail_threads_archive(thread_ids: List[str]):
+    """
+    Archives whole threads with batched threads.modify calls.
+    Every message of a matching thread is archived, including ones that do not match the query.
+    """
+    await apply_thread_requests(get_gmail_service(), thread_ids,
+                                lambda svc, i: threads.modify_request(svc, i, remove_ids=["INBOX"]))
+
+
+async def archive_read_threads() -> dict:
+    """
+    Archives inbox threads whose messages are all read. A thread search matches on any one
+    message, so threads that still have an unread message are listed separately and skipped.
+    """
+    svc = get_gmail_service()
+    read = await list_thread_ids(svc, "is:read in:inbox", 100000)
+    unread = set(await list_thread_ids(svc, "is:unread in:inbox", 100000))
+    ids = [i for i in read if i not in unread]
+    if ids:
+        await gmail_threads_archive(ids)
+    return {"status": "modified", "count": len(ids), "unit": "threads", "query": "is:read in:inbox"}
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_trash(query: str, max_results: int = 1000, by_thread: bool = False):
+    """
+    Moves messages matching `query` to the trash (recoverable for 30 days).
+    With by_thread=True, whole conversations matching the query are trashed with threads.trash
+    (a conversation matches when any one of its messages does).
+    Returns the number of messages or threads trashed.
+    """
+    svc = get_gmail_service()
+    if by_thread:
+        ids = await list_thread_ids(svc, query, max_results)
+        count = await apply_thread_requests(svc, ids, threads.trash_request) if ids else 0
+    else:
+        ids = await list_message_ids(svc, query, max_results)
+        count = await asyncio.to_thread(labels.batch_modify, svc, ids, ["TRASH"], []) if ids else 0
+    unit = "threads" if by_thread else "messages"
+    await log("INFO", "google_tools", f"Trashed {count} Gmail {unit} matching query '{query}'")
+    return {"status": "trashed", "count": count, "unit": unit, "query": query}
+
+
+# --- Newsletter text extraction ---
+
+_extract_cache = None
+_extract_cache_lock = threading.Lock()
+
+
+def get_extract_cache() -> extract.ExtractCache:
+    global _extract_cache
+    with _extract_cache_lock:
+        if _extract_cache is None:
+            _extract_cache = extract.ExtractCache(EXTRACT_CACHE_PATH)
+        return _extract_cache
+
+
+async def extract_html_texts(htmls: list) -> tuple[list, int]:
+    """
+    Main text of each HTML body (see extract.extract_main_text), as (text, method) pairs in input order.
+    Bodies seen before are answered from the content-hash cache; the rest are extracted on the
+    decode pool in chunks so the event loop stays free. Returns (results, number extracted).
+    """
+    cache = get_extract_cache()
+    keys = [extract.content_key(html) for html in htmls]
+    found = await asyncio.to_thread(cache.get_many, keys)
+    todo = list({key: html for key, html in zip(keys, htmls) if key not in found}.items())
+    if todo:
+        loop = asyncio.get_running_loop()
+        chunks = [todo[i:i + EXTRACT_CHUNK] for i in range(0, len(todo), EXTRACT_CHUNK)]
+        extracted = await asyncio.gather(*(
+            loop.run_in_executor(get_decode_pool(), extract.extract_many, chunk) for chunk in chunks
+        ))
+        fresh = [result for chunk in extracted for result in chunk]
+        await asyncio.to_thread(cache.put_many, fresh)
+        found.update((key, (text, method)) for key, text, method in fresh)
+    return [found[key] for key in keys], len(todo)
+
+
+def newsletter_bodies(resources: list) -> list:
+    """Headers and HTML (or plain) body of format=full message resources."""
+    items = []
+    for resource in resources:
+        msg = mime.LazyMessage(resource)
+        items.append({
+            "id": msg.id, "From": msg.header("From"), "Subject": msg.header("Subject"), "Date": msg.header("Date"),
+            "html": msg.body("html"), "plain": msg.body("plain"),
+        })
+    return items
+
 
 @mcp.tool()
-async def clean_up_archive():
+async def gmail_newsletter_digest(query: str = None, max_results: int = 10, max_chars: int = 1500):
     """
-    Cleans up the archive by:
-    - Cleaning and deduplicating delete_filter.txt
-    - Adding senders of emails labeled 'Delete' to delete_filter.txt
-    - Deleting archived emails from delete_filter.txt in batches
-    - Deleting archived emails older than 6 months that are NOT marked Important
+    Digest of the newest newsletters: for each of the last `max_results` messages matching `query`
+    (default NEWSLETTER_QUERY from .env, "unsubscribe -in:sent"), the sender, subject, date and the
+    article text extracted from the HTML body with trafilatura/readability, cut to `max_chars`.
+    Extraction runs on a process pool and is cached by content hash, so repeated digests only
+    extract newsletters not seen before.
     """
+    svc = get_gmail_service()
+    ids = await list_message_ids(svc, query or NEWSLETTER_QUERY, max_results)
+    if not ids:
+        return {"count": 0, "extracted": 0, "items": []}
+
+    requests = [svc.users().messages().get(userId="me", id=i, format="full", fields=MESSAGE_FULL_FIELDS) for i in ids]
+    responses = await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+    items = await asyncio.to_thread(newsletter_bodies, [r for r, error in responses if error is None])
+
+    with_html = [item for item in items if item["html"]]
+    texts, extracted = await extract_html_texts([item["html"] for item in with_html])
+    for item, (text, method) in zip(with_html, texts):
+        item["text"], item["method"] = text, method
+    for item in items:
+        if "text" not in item:
+            item["text"], item["method"] = (item["plain"] or "").strip(), "plain"
+        del item["html"], item["plain"]
+        item["truncated"] = len(item["text"]) > max_chars
+        item["text"] = item["text"][:max_chars]
 
-    await add_if_labeled_delete()
+    failed = [{"id": msg_id, "error": str(error)} for msg_id, (r, error) in zip(ids, responses) if error is not None]
+    await log("INFO", "google_tools", f"Newsletter digest: {len(items)} messages, {extracted} extracted, "
+                                      f"{len(with_html) - extracted} from cache")
+    return {"count": len(items), "extracted": extracted, "items": items + failed}
 
-    delete_senders = await get_filter_string("delete_filter.txt")
 
-    if not delete_senders:
-        await log("WARNING", "google_tools", "Delete filter file is empty.")
-        return {"error": "Delete filter file is empty."}
+# --- Attachment export ---
 
-    # --- DELETE archived emails matching delete_filter.txt ---
-    deleted_total = await process_batched_archive(delete_senders)
+_attachment_stores = {}
+_attachment_stores_lock = threading.Lock()
 
-    # --- DELETE archived emails older than 6 months and NOT Important ---
-    await log("INFO", "google_tools", "Removing archived emails older than 6 months and NOT marked Important...")
-    try:
-        old_messages = await retry_async(
-            gmail_list,
-            "-in:inbox older_than:6m -label:IMPORTANT",
-            retries=1,
-            logger=lambda m: sync_log("WARNING", "google_tools", m)
-        )
 
-        if old_messages:
-            message_ids = [m["id"] for m in old_messages]
-            await gmail_batch_delete(message_ids)
-            await log("INFO", "google_tools", f"|__ Deleted {len(message_ids)} old archived emails (older than 6 months, not Important)")
-            deleted_total += len(message_ids)
-        else:
-            await log("INFO", "google_tools", "No old archived emails found.")
+def get_attachment_store() -> attachments.AttachmentStore:
+    """Returns the attachment store of the active account, opening it on first use."""
+    account = accounts.current_account()
+    name = account.name if account else None
+    with _attachment_stores_lock:
+        store = _attachment_stores.get(name)
+        if store is None:
+            root = ATTACHMENTS_DIR / name if name else ATTACHMENTS_DIR
+            store = _attachment_stores[name] = attachments.AttachmentStore(root)
+        return store
 
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Failed removing old archived emails: {e}")
 
-    await log(
-        "INFO",
-        "google_tools",
-        f"Cleaned archive: {deleted_total} deleted from {len(delete_senders)} senders (including old unimportant emails)."
-    )
+async def save_message_attachments(svc, ids: list) -> dict:
+    """
+    Saves the attachments of the given messages into the attachment store.
+    Part metadata is batch-fetched without bodies, then attachments are downloaded concurrently
+    with messages.attachments.get and decoded straight into content-addressed blobs.
+    Messages saved by an earlier run are skipped. A message is only marked saved once all its
+    attachments are stored; the returned "failed" lists the messages that were not.
+    """
+    store = get_attachment_store()
+    done = await asyncio.to_thread(store.scanned, ids)
+    todo = [i for i in ids if i not in done]
+    stats = {"messages": len(todo), "skipped": len(done), "attachments": 0, "stored": 0, "bytes": 0, "failed": []}
+    limit = asyncio.Semaphore(HTTP_POOL_SIZE)
+
+    async def save(msg_id, attachment):
+        data = attachment["data"]
+        if not data:
+            async with limit:
+                resp = await execute_async(svc.users().messages().attachments().get(
+                    userId="me", messageId=msg_id, id=attachment["attachmentId"]))
+            data = resp["data"]
+        sha256, size, stored = await asyncio.to_thread(store.write_b64, data)
+        await asyncio.to_thread(store.add, msg_id, attachment, sha256, size)
+        stats["attachments"] += 1
+        stats["stored"] += stored
+        stats["bytes"] += size * stored
+
+    async def save_message(msg_id, resource):
+        try:
+            await asyncio.gather(*(save(msg_id, a) for a in attachments.find_attachments(resource)))
+        except Exception as e:
+            stats["failed"].append({"id": msg_id, "error": str(e)})
+            return None
+        return msg_id
+
+    for start in range(0, len(todo), ATTACHMENT_SCAN_CHUNK):
+        chunk = todo[start:start + ATTACHMENT_SCAN_CHUNK]
+        requests = [svc.users().messages().get(userId="me", id=i, format="full",
+                                               fields=attachments.ATTACHMENT_META_FIELDS) for i in chunk]
+        responses = await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+        deep = [n for n, (resource, error) in enumerate(responses) if error is None and attachments.is_truncated(resource)]
+        if deep:
+            # Attachments nested below the field mask's depth would be missed; fetch the whole payload.
+            requests = [svc.users().messages().get(userId="me", id=chunk[n], format="full",
+                                                   fields=attachments.FULL_PAYLOAD_FIELDS) for n in deep]
+            full = await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+            for n, response in zip(deep, full):
+                responses[n] = response
+        for msg_id, (resource, error) in zip(chunk, responses):
+            if error is not None:
+                stats["failed"].append({"id": msg_id, "error": str(error)})
+        saved = await asyncio.gather(*(save_message(msg_id, resource)
+                                       for msg_id, (resource, error) in zip(chunk, responses) if error is None))
+        await asyncio.to_thread(store.mark_scanned, [i for i in saved if i])
+        jobs.report_progress(start + len(chunk), len(todo), f"Saved {stats['attachments']} attachments")
+    return stats
 
-    return {
-        "status": "archive cleanup complete",
-        "senders_processed": len(delete_senders),
-        "deleted_total": deleted_total,
-    }
 
+@mcp.tool()
+async def gmail_save_attachments(query: str = None, ids: list = None, max_results: int = 500):
+    """
+    Saves the attachments of messages (by `ids`, or the first `max_results` matches of `query`)
+    under data/attachments/ as a background job. Files are stored once per distinct content
+    (by SHA-256) and indexed by message; messages already saved are skipped.
+    Use gmail_attachments_find to look up saved files.
+    """
+    if not ids and not query:
+        return {"error": "Pass message ids or a query."}
+    args = {"query": query, "ids": ids, "max_results": max_results}
 
-async def process_batched_archive(senders: List[str]):
-    """Splits senders into batches of BATCH_SIZE and deletes their archived messages."""
-    total_deleted = 0
-    for i in range(0, len(senders), BATCH_SIZE):
-        batch = senders[i:i + BATCH_SIZE]
-        query = " OR ".join([f"from:{s}" for s in batch])
-        total_deleted += await process_bulk_archive(query)
-    return total_deleted
+    async def run():
+        svc = get_gmail_service()
+        message_ids = ids or await list_message_ids(svc, f"has:attachment ({query})", max_results)
+        stats = await save_message_attachments(svc, message_ids)
+        await log("INFO", "google_tools", f"Saved {stats['attachments']} attachments from {stats['messages']} messages "
+                                          f"({stats['stored']} new files, {len(stats['failed'])} failed)")
+        return {"status": "attachments saved", **stats}
 
+    return submit_job("gmail_save_attachments", run, args)
 
-async def process_bulk_archive(query: str):
-    """Fetches archived messages for a query and deletes them in bulk."""
-    await log("INFO", "google_tools", f"Processing archived delete batch: {query[:200]}{'...' if len(query)>200 else ''}")
 
-    try:
-        messages = await retry_async(
-            gmail_list,
-            f"-in:inbox ({query})",  # Archived only (not in inbox)
-            retries=1,
-            logger=lambda m: sync_log("WARNING", "google_tools", m)
-        )
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Failed fetching archived messages for batch: {e}")
-        return 0
+@mcp.tool()
+async def gmail_attachments_find(message_id: str = None, filename: str = None, max_results: int = 100):
+    """
+    Looks up saved attachments by message ID and/or a part of the file name.
+    Each result has the message ID, file name, MIME type, size, SHA-256 and the local file path.
+    """
+    store = get_attachment_store()
+    results = await asyncio.to_thread(store.find, message_id, filename, max_results)
+    return {"items": results, **await asyncio.to_thread(store.stats)}
 
-    if not messages:
-        return 0
 
-    message_ids = [m["id"] for m in messages]
+# --- Local search index ---
+
+_mail_indexes = {}
+_mail_index_lock = threading.Lock()
+
 
+def get_mail_index() -> mail_index.MailIndex:
+    """Returns the full-text mail index of the active account, opening it on first use."""
+    account = accounts.current_account()
+    name = account.name if account else None
+    with _mail_index_lock:
+        index = _mail_indexes.get(name)
+        if index is None:
+            filename = f"mail_index.{name}.sqlite" if name else "mail_index.sqlite"
+            index = _mail_indexes[name] = mail_index.MailIndex(PROJECT_ROOT / "data" / filename)
+        return index
+
+
+@mcp.tool()
+async def gmail_search_local(query: str, max_results: int = 20, offset: int = 0):
+    """
+    Searches the local full-text mail index instead of Gmail, returning ranked matches
+    (id, threadId, Subject, From, date, a highlighted body snippet and a BM25 score).
+    Supports words, prefixes (`invoic*`), phrases (`"quarterly report"`), AND/OR/NOT,
+    and field filters `subject:`, `from:`, `to:` and `body:`.
+    Only messages already indexed are found; run gmail_index_update to index more mail.
+    Pass the IDs to gmail_get_messages to read the messages.
+    """
+    index = get_mail_index()
     try:
-        await gmail_batch_delete(message_ids)
-        await log("INFO", "google_tools", f"|__ Deleted {len(message_ids)} archived messages in this batch.")
-        return len(message_ids)
-    except Exception as e:
-        await log("ERROR", "google_tools", f"Batch delete failed: {e}")
-        return 0
+        results = await asyncio.to_thread(index.search, query, max_results, offset)
+    except ValueError as e:
+        return {"error": str(e)}
+    await log("INFO", "google_tools", f"Local search '{query}' matched {len(results)} messages")
+    return results
+
 
 @mcp.tool()
-async def add_sender_to_delete_list(sender: str):
+async def gmail_index_update(query: str = "in:anywhere", max_messages: int = 5000):
     """
-    Adds a sender's email address to the delete list.
-    The filter is stored in a text file.
-    Returns a confirmation message.
+    Adds messages matching `query` (newest first, up to `max_messages`) that are not yet
+    in the local search index. Already indexed messages are skipped, so repeated runs
+    only fetch new mail. Runs as a background job; its result reports how many messages were indexed.
     """
-    if not sender or "@" not in sender:
-        await log("WARNING", "google_tools", f"Invalid sender email: {sender}")
-        return {"error": "Invalid sender email provided."}
+    args = {"query": query, "max_messages": max_messages}
+    return submit_job("gmail_index_update", lambda: run_index_update(query, max_messages), args)
+
+
+async def run_index_update(query: str = "in:anywhere", max_messages: int = 5000):
+    """Runs the index update described in gmail_index_update in the current task."""
+    svc = get_gmail_service()
+    index = get_mail_index()
+    ids = await list_message_ids(svc, query, max_messages)
+    known = await asyncio.to_thread(index.known_ids, ids)
+    todo = [i for i in ids if i not in known]
+    jobs.report_progress(0, total=len(todo), message=f"{len(known)} of {len(ids)} messages already indexed")
+
+    indexed = 0
+    for start in range(0, len(todo), INDEX_FETCH_CHUNK):
+        results = await fetch_messages(svc, todo[start:start + INDEX_FETCH_CHUNK], max_chars=INDEX_BODY_CHARS,
+                                       attachments=False)
+        indexed += sum("error" not in r for r in results)
+        jobs.report_progress(start + len(results), message=f"Indexed {indexed} messages")
+
+    total = await asyncio.to_thread(index.count)
+    await log("INFO", "google_tools", f"Indexed {indexed} new messages for '{query}' ({total} in index)")
+    return {"status": "index updated", "indexed": indexed, "skipped": len(known), "total_indexed": total}
+
+
+# --- Semantic search ---
+
+_semantic_indexes = {}
+_semantic_indexes_lock = threading.Lock()
+
+
+def get_semantic_index() -> semantic.SemanticIndex:
+    """Returns the semantic index of the active account, opening it on first use."""
+    account = accounts.current_account()
+    name = account.name if account else None
+    with _semantic_indexes_lock:
+        index = _semantic_indexes.get(name)
+        if index is None:
+            dirname = f"semantic.{name}" if name else "semantic"
+            embedder = semantic.get_embedder(EMBEDDER, OLLAMA_EMBED_MODEL, OLLAMA_HOST)
+            index = _semantic_indexes[name] = semantic.SemanticIndex(PROJECT_ROOT / "data" / dirname, embedder)
+        return index
+
+
+async def fetch_snippets(svc, ids: list) -> list:
+    """Batch-fetches subject, sender, date and snippet of messages; unavailable messages are left out."""
+    requests = [svc.users().messages().get(userId="me", id=i, format="metadata",
+                                           metadataHeaders=["Subject", "From", "Date"],
+                                           fields=MESSAGE_SNIPPET_FIELDS) for i in ids]
+    responses = await batch.execute_batch_async(svc, requests, concurrency=max(1, HTTP_POOL_SIZE // 2))
+    items = []
+    for response, error in responses:
+        if error is None:
+            headers = {h["name"]: h["value"] for h in response.get("payload", {}).get("headers", [])}
+            items.append({"id": response["id"], "threadId": response.get("threadId"),
+                          "snippet": response.get("snippet", ""), **headers})
+    return items
 
-    add_to_delete_filter_string(sender)
-    await log("INFO", "google_tools", f"Added sender {sender} to delete filter list")
-    return {"status": "added", "sender": sender}
 
 @mcp.tool()
-async def add_sender_to_archive_list(sender: str):
+async def gmail_semantic_index(query: str = "in:anywhere", max_messages: int = 2000):
     """
-    Adds a sender's email address to the delete list.
-    The filter is stored in a text file.
-    Returns a confirmation message.
+    Embeds the subject and snippet of messages matching `query` (newest first, up to `max_messages`)
+    into the semantic index used by gmail_semantic_search. Already embedded messages are skipped.
+    Runs as a background job.
     """
-    if not sender or "@" not in sender:
-        await log("WARNING", "google_tools", f"Invalid sender email: {sender}")
-        return {"error": "Invalid sender email provided."}
+    args = {"query": query, "max_messages": max_messages}
+    return submit_job("gmail_semantic_index", lambda: run_semantic_index(query, max_messages), args)
+
+
+async def run_semantic_index(query: str = "in:anywhere", max_messages: int = 2000):
+    """Runs the indexing described in gmail_semantic_index in the current task."""
+    svc = get_gmail_service()
+    index = get_semantic_index()
+    ids = [i for i in await list_message_ids(svc, query, max_messages) if i not in index.rows]
+    jobs.report_progress(0, total=len(ids))
+
+    added = 0
+    for start in range(0, len(ids), INDEX_FETCH_CHUNK):
+        items = await fetch_snippets(svc, ids[start:start + INDEX_FETCH_CHUNK])
+        added += await asyncio.to_thread(index.add, items)
+        jobs.report_progress(min(start + INDEX_FETCH_CHUNK, len(ids)), message=f"Embedded {added} messages")
+
+    await log("INFO", "google_tools", f"Embedded {added} messages for '{query}' ({len(index)} in semantic index)")
+    return {"status": "semantic index updated", "embedded": added, "total_indexed": len(index),
+            "embedder": index.embedder.name}
 
-    add_to_archive_filter_string(sender)
-    await log("INFO", "google_tools", f"Added sender {sender} to delete filter list")
-    return {"status": "added", "sender": sender}
 
 @mcp.tool()
-async def gmail_list(query: str = None, max_results: int = 1000, sub: bool = False):
+async def gmail_semantic_search(text: str = None, like_id: str = None, max_results: int = 10):
     """
-    Lists Gmail messages matching the query, returning metadata like Subject, From, and Date.
-    Returns a list of dictionaries with message ID, subject, sender, and date.
-    If sub is True, it logs the action with a subordinate indentation.
+    Finds messages similar in meaning to `text`, or to the message `like_id` ("messages like this one"),
+    using the local semantic index built by gmail_semantic_index. No Gmail requests are made,
+    except to embed `like_id` if it is not indexed yet.
+    Returns id, threadId, Subject, From, Date and a cosine similarity score, best first.
     """
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
-    resp = svc.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-    items = resp.get("messages", [])
-    results = []
-    for m in items:
-        meta = svc.users().messages().get(userId="me", id=m["id"], format="metadata",
-                                          metadataHeaders=["Subject","From","Date"]).execute()
-        hdrs = {h["name"]: h["value"] for h in meta["payload"]["headers"]}
-        results.append({"id": m["id"], **hdrs})
-    
-    if sub:
-        await log("INFO", "google_tools", f"|__ Listed {len(results)} Gmail messages")
-    else: 
-        await log("INFO", "google_tools", f"Listed {len(results)} Gmail messages")
+    if not text and not like_id:
+        return {"error": "Pass text or like_id."}
+    index = get_semantic_index()
+    if like_id:
+        if like_id not in index.rows:
+            await asyncio.to_thread(index.add, await fetch_snippets(get_gmail_service(), [like_id]))
+        vector = index.vector_of(like_id)
+        if vector is None:
+            return {"error": f"Message {like_id} not found."}
+        exclude = {like_id}
+    else:
+        vector = await asyncio.to_thread(index.embed_query, text)
+        exclude = set()
 
+    results = await asyncio.to_thread(index.search, vector, max_results, exclude)
+    await log("INFO", "google_tools", f"Semantic search returned {len(results)} of {len(index)} indexed messages")
     return results
 
+
 @mcp.tool()
+@invalidates("gmail")
 async def delete_multiple_emails(query: str = None, max_results: int = 1000):
     """
     Deletes multiple Gmail messages matching the query.
     Returns the count of deleted messages.
     """
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
-    resp = svc.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
+    svc = get_gmail_service()
+    resp = svc.users().messages().list(userId="me", q=query, maxResults=max_results, fields=MESSAGE_ID_FIELDS).execute()
     items = resp.get("messages", [])
     results = []
     for m in items:
@@ -708,6 +2199,7 @@ async def delete_multiple_emails(query: str = None, max_results: int = 1000):
     return {"status": "deleted", "count": total}
 
 @mcp.tool()
+@invalidates("gmail")
 async def gmail_send(to: str, subject: str, body: str):
     """
     Sends an email using the Gmail API.
@@ -716,25 +2208,202 @@ async def gmail_send(to: str, subject: str, body: str):
     """
     import base64
     from email.mime.text import MIMEText
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
+    svc = get_gmail_service()
     msg = MIMEText(body)
     msg["to"], msg["subject"] = to, subject
     raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-    sent = svc.users().messages().send(userId="me", body={"raw": raw}).execute()
+    sent = svc.users().messages().send(userId="me", body={"raw": raw}, fields="id,threadId,labelIds").execute()
     await log("INFO", "google_tools", f"Sent Gmail message ID {sent['id']}")
     return sent
 
 @mcp.tool()
-async def gmail_modify(query: str = None, max_results: int = 1000, add_labels: list = None, remove_labels: list = None, sub: bool = False):
+@invalidates("gmail")
+async def gmail_send_bulk(recipients: str, subject: str, body: str, html: bool = False,
+                          rate: float = mailmerge.DEFAULT_SEND_RATE, concurrency: int = 4, max_sends: int = None):
+    """
+    Sends one personalized email per recipient (mail merge). Runs as a background job.
+    `recipients` is the path of a CSV file (header row), a JSON Lines file or a .json file holding an
+    array; each recipient needs a `to` or `email` field. `$field` / `${field}` placeholders in `subject` and `body` are filled
+    from the recipient's fields; `html` sends the body as HTML.
+    Messages are rendered on worker processes and sent by `concurrency` senders paced to `rate`
+    messages per second (Gmail's per-user quota allows about 2.5). At most `max_sends` are sent per run.
+    Every result is logged under data/mailmerge/; running the same send again resumes,
+    skipping recipients already sent. A send that got a server error or lost its connection is logged as "unknown" and
+    not retried, since the message may have gone out; check those by hand. Stops early, leaving the rest for a rerun, on Gmail's daily sending limit.
+    """
+    args = {"recipients": recipients, "subject": subject, "html": html, "rate": rate,
+            "concurrency": concurrency, "max_sends": max_sends}
+    return submit_job("gmail_send_bulk",
+                      lambda: run_bulk_send(recipients, subject, body, html, rate, concurrency, max_sends), args)
+
+
+def http_error_reason(error: HttpError) -> str:
+    details = error.error_details if isinstance(error.error_details, list) else []
+    return next((d["reason"] for d in details if isinstance(d, dict) and d.get("reason")), "")
+
+
+async def run_bulk_send(recipients: str, subject: str, body: str, html: bool = False,
+                        rate: float = mailmerge.DEFAULT_SEND_RATE, concurrency: int = 4, max_sends: int = None):
+    """Runs the bulk send described in gmail_send_bulk in the current task."""
+    path = Path(recipients)
+    if not path.exists():
+        return {"error": f"Recipients file not found: {recipients}"}
+    concurrency = max(1, int(concurrency or 1))
+
+    svc = get_gmail_service()
+    send_log = mailmerge.SendLog(MAILMERGE_DIR / f"{mailmerge.SendLog.key(path, subject, body)}.jsonl")
+    limiter = mailmerge.RateLimiter(float(rate or mailmerge.DEFAULT_SEND_RATE), burst=concurrency)
+    queue = asyncio.Queue(maxsize=2 * mailmerge.RENDER_CHUNK)
+    stop = asyncio.Event()
+    # Recipients left unknown by an earlier run are skipped too; they need a manual check.
+    settled = send_log.sent | send_log.unknown
+    already_sent = len(send_log.sent)
+    stats = {"total": 0, "sent": 0, "failed": 0, "unknown": 0, "skipped": len(settled), "attempted": 0}
+    failures = []
+    unknown = []
+    stopped_by = None
+
+    async def render():
+        # Rendering of the next chunk overlaps with sending the current one; the queue bounds memory.
+        loop = asyncio.get_running_loop()
+        chunk = []
+
+        async def flush():
+            rendered = await loop.run_in_executor(get_decode_pool(), mailmerge.render_messages,
+                                                  subject, body, [r for _, r in chunk], html)
+            for (i, _), msg in zip(chunk, rendered):
+                await queue.put((i, msg))
+            chunk.clear()
+
+        cancelled = False
+        try:
+            for i, recipient in enumerate(mailmerge.iter_recipients(path)):
+                stats["total"] += 1
+                if i in settled or stop.is_set():
+                    continue
+                chunk.append((i, recipient))
+                if len(chunk) >= mailmerge.RENDER_CHUNK:
+                    await flush()
+            if chunk and not stop.is_set():
+                await flush()
+            jobs.report_progress(total=stats["total"])
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            # Senders skip whatever is still queued, so they reach their sentinels quickly.
+            stop.set()
+            raise
+        finally:
+            # Always end the senders' loops; a cancelled run cancels the senders instead.
+            if not cancelled:
+                for _ in range(concurrency):
+                    await queue.put(None)
+
+    def fail(i, to, error):
+        send_log.record(i, to, "failed", error=error)
+        stats["failed"] += 1
+        if len(failures) < 100:
+            failures.append({"to": to, "error": error})
+
+    def send_unknown(i, to, error):
+        send_log.record(i, to, "unknown", error=error)
+        stats["unknown"] += 1
+        if len(unknown) < 100:
+            unknown.append({"to": to, "error": error})
+
+    async def send(i, msg):
+        nonlocal stopped_by
+        for attempt in range(5):
+            await limiter.acquire()
+            try:
+                sent = await execute_async(svc.users().messages().send(userId="me", body={"raw": msg["raw"]}, fields="id"))
+            except accounts.QuotaBudgetExceeded as e:
+                stopped_by = str(e)
+                stop.set()
+                return
+            except HttpError as e:
+                reason = http_error_reason(e)
+                if reason in ("dailyLimitExceeded", "quotaExceeded") or "sending limit" in str(e).lower():
+                    stopped_by = f"Gmail sending limit reached ({reason or e.resp.status})"
+                    stop.set()
+                    return
+                if e.resp.status == 429 or reason in ("rateLimitExceeded", "userRateLimitExceeded"):
+                    limiter.slow_down()
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                if e.resp.status >= 500:
+                    # The message may have been sent before the error; retrying could send it twice.
+                    send_unknown(i, msg["to"], str(e))
+                    return
+                fail(i, msg["to"], str(e))
+                return
+            except transport.TRANSPORT_ERRORS as e:
+                # A timeout or dropped connection can hide a send that went through, as a 5xx can.
+                send_unknown(i, msg["to"], f"{type(e).__name__}: {e}")
+                return
+            send_log.record(i, msg["to"], "sent", id=sent["id"])
+            stats["sent"] += 1
+            return
+        fail(i, msg["to"], "Rate limited after 5 attempts")
+
+    async def sender():
+        while (item := await queue.get()) is not None:
+            i, msg = item
+            # After a stop, keep draining so the renderer is never blocked; unsent recipients stay pending.
+            if stop.is_set():
+                continue
+            if "error" in msg:
+                fail(i, msg["to"], msg["error"])
+            elif max_sends is not None and stats["attempted"] >= max_sends:
+                stop.set()
+                continue
+            else:
+                stats["attempted"] += 1
+                await send(i, msg)
+            jobs.report_progress(stats["skipped"] + stats["sent"] + stats["failed"] + stats["unknown"],
+                                 message=f"{stats['sent']} sent, {stats['failed']} failed")
+
+    tasks = [asyncio.create_task(render()), *(asyncio.create_task(sender()) for _ in range(concurrency))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # On an error, stop the tasks still running before the log is closed under them.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        send_log.close()
+
+    remaining = stats["total"] - stats["skipped"] - stats["sent"] - stats["failed"] - stats["unknown"]
+    await log("INFO", "google_tools", f"Bulk send: {stats['sent']} sent, {stats['failed']} failed, "
+                                      f"{stats['unknown']} unknown, {remaining} remaining")
+    return {
+        "status": "stopped" if remaining else "completed",
+        "stopped_by": stopped_by or ("max_sends" if remaining else None),
+        "sent": stats["sent"],
+        "failed": stats["failed"],
+        "unknown": stats["unknown"],
+        "already_sent": already_sent,
+        "remaining": remaining,
+        "log": str(send_log.path),
+        "failures": failures,
+        "unknown_sends": unknown,
+    }
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_modify(query: str = None, max_results: int = 1000, add_labels: list = None, remove_labels: list = None, sub: bool = False,
+                       by_thread: bool = False):
     """ Modifies Gmail messages matching the query by adding or removing labels.
     `add_labels` and `remove_labels` should be lists of label IDs or names.
+    With by_thread=True, the labels are changed on whole conversations matching the query
+    (up to `max_results` threads) with batched threads.modify calls. A conversation matches when
+    any one of its messages does, and then all of its messages are changed.
     """
     
-    creds = get_credentials(GMAIL_SCOPES)
-    svc = build("gmail", "v1", credentials=creds)
-    resp = svc.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-    items = resp.get("messages", [])
+    svc = get_gmail_service()
+    items = await (list_thread_ids if by_thread else list_message_ids)(svc, query, max_results)
 
     total = len(items)
 
@@ -744,8 +2413,8 @@ async def gmail_modify(query: str = None, max_results: int = 1000, add_labels: l
         await log("INFO", "google_tools", f"Modifying {total} Gmail messages matching query '{query}'")
 
     # Normalize input
-    add_labels = add_labels or []
-    remove_labels = remove_labels or []
+    add_labels = list(add_labels or [])
+    remove_labels = list(remove_labels or [])
 
     # Translate high-level labels to actual Gmail label actions
     if "READ" in add_labels:
@@ -763,38 +2432,29 @@ async def gmail_modify(query: str = None, max_results: int = 1000, add_labels: l
         if "INBOX" not in remove_labels:
             remove_labels.append("INBOX")
 
-    for item in items:
-        msg_id = item.get("id")
-        if not msg_id:
-            
-            if sub:
-                await log("WARNING", "google_tools", f"|__ Skipping message with no ID: {item}")
-            else:
-                await log("WARNING", "google_tools", f"Skipping message with no ID: {item}")
-            
-            continue
+    # The API only accepts label IDs; user labels are usually given by name.
+    registry = get_label_registry()
+    try:
+        add_ids = await asyncio.to_thread(registry.resolve_many, svc, add_labels)
+        remove_ids = await asyncio.to_thread(registry.resolve_many, svc, remove_labels)
+    except labels.LabelNotFound as e:
+        await log("ERROR", "google_tools", f"Cannot modify messages matching '{query}': {e}")
+        return {"error": str(e)}
 
-        try:
-            svc.users().messages().modify(
-                userId="me",
-                id=msg_id,
-                body={
-                    "addLabelIds": add_labels,
-                    "removeLabelIds": remove_labels
-                }
-            ).execute()
-        except Exception as e:
-            await log("ERROR", "google_tools", f"Error modifying message {msg_id}: {e}")
-            continue
+    if items and by_thread:
+        await apply_thread_requests(svc, items, lambda svc, i: threads.modify_request(svc, i, add_ids, remove_ids))
+    elif items:
+        await asyncio.to_thread(labels.batch_modify, svc, items, add_ids, remove_ids)
 
     if sub:
         await log("INFO", "google_tools", f"|__ Modified {total} Gmail messages matching query '{query}'")
     else:     
         await log("INFO", "google_tools", f"Modified {total} Gmail messages matching query '{query}'")
     
-    return {"status": "modified", "count": total, "query": query}
+    return {"status": "modified", "count": total, "unit": "threads" if by_thread else "messages", "query": query}
 
 @mcp.tool()
+@invalidates("gmail")
 async def gmail_delete(msg_id: str, type: str = "multiple", sub:bool = False):
     """ Deletes a Gmail message by its ID.
     `msg_id` should be the full message ID string.
@@ -808,8 +2468,7 @@ async def gmail_delete(msg_id: str, type: str = "multiple", sub:bool = False):
         return {"error": "Invalid or empty msg_id provided."}
 
     try:
-        creds = get_credentials(GMAIL_SCOPES)
-        svc = build("gmail", "v1", credentials=creds)
+        svc = get_gmail_service()
         svc.users().messages().delete(userId="me", id=msg_id).execute()
         
         if type == "single":
@@ -825,6 +2484,7 @@ async def gmail_delete(msg_id: str, type: str = "multiple", sub:bool = False):
         return {"error": f"Failed to delete message {msg_id}: {str(e)}"}
     
 @mcp.tool()
+@invalidates("gmail")
 async def gmail_archive(msg_id: str, type: str = "multiple", sub:bool = False):
     """Archives a Gmail message by removing the 'Inbox' label.
     `msg_id` should be the full message ID string.
@@ -838,8 +2498,7 @@ async def gmail_archive(msg_id: str, type: str = "multiple", sub:bool = False):
         return {"error": "Invalid or empty msg_id provided."}
 
     try:
-        creds = get_credentials(GMAIL_SCOPES)
-        svc = build("gmail", "v1", credentials=creds)
+        svc = get_gmail_service()
         
         # ✅ FIXED: Pass user_id explicitly
         inbox_label_id = get_label_id_by_name(svc, "me", "INBOX")
@@ -868,58 +2527,309 @@ async def gmail_archive(msg_id: str, type: str = "multiple", sub:bool = False):
         return {"error": f"Failed to archive message {msg_id}: {str(e)}"}
 
 
+# --- Label management ---
+
+@mcp.tool()
+async def gmail_labels_list():
+    """Lists the mailbox's labels (id, name and type "system" or "user") from the cached label registry."""
+    return await asyncio.to_thread(get_label_registry().labels, get_gmail_service())
+
+
+@mcp.tool()
+async def gmail_label_create(name: str):
+    """Creates a user label. Use "Parent/Child" to nest it. Returns the existing label if the name is taken."""
+    svc = get_gmail_service()
+    registry = get_label_registry()
+    try:
+        return await asyncio.to_thread(registry.get, svc, name)
+    except labels.LabelNotFound:
+        label = await asyncio.to_thread(registry.create, svc, name)
+    await log("INFO", "google_tools", f"Created label {name} ({label['id']})")
+    return label
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_label_rename(name: str, new_name: str):
+    """Renames a user label (given by name or ID); its nested labels move along with it."""
+    try:
+        renamed = await asyncio.to_thread(get_label_registry().rename, get_gmail_service(), name, new_name)
+    except labels.LabelNotFound as e:
+        return {"error": str(e)}
+    await log("INFO", "google_tools", f"Renamed label {name} to {new_name} ({len(renamed)} labels)")
+    return {"status": "renamed", "labels": renamed}
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_label_merge(source: str, target: str, delete_source: bool = True):
+    """
+    Moves every message labeled `source` to the `target` label (created if missing),
+    then deletes `source` unless delete_source is False. Runs as a background job.
+    """
+    args = {"source": source, "target": target, "delete_source": delete_source}
+    return submit_job("gmail_label_merge", lambda: run_label_merge(source, target, delete_source), args)
+
+
+async def run_label_merge(source: str, target: str, delete_source: bool = True):
+    """Runs the merge described in gmail_label_merge in the current task."""
+    svc = get_gmail_service()
+    registry = get_label_registry()
+    try:
+        source_id = await asyncio.to_thread(registry.resolve, svc, source)
+    except labels.LabelNotFound as e:
+        return {"error": str(e)}
+    target_id = await asyncio.to_thread(registry.resolve, svc, target, True)
+    if source_id == target_id:
+        return {"error": "Source and target are the same label."}
+
+    result = await relabel(None, [target_id], [source_id], label_ids=[source_id])
+    if delete_source:
+        await asyncio.to_thread(registry.delete, svc, source_id)
+    await log("INFO", "google_tools", f"Merged label {source} into {target} ({result['count']} messages)")
+    return {**result, "status": "merged", "source": source, "target": target, "source_deleted": delete_source}
+
+
+@mcp.tool()
+@invalidates("gmail")
+async def gmail_relabel(query: str, add_labels: list = None, remove_labels: list = None, create_missing: bool = False,
+                        max_messages: int = 100000):
+    """
+    Adds and/or removes labels (names or IDs) on every message matching `query`, up to `max_messages`,
+    with batchModify calls of 1000 messages. With create_missing, labels to add that do not exist are created.
+    Runs as a background job; its result reports the number of messages changed.
+    """
+    args = {"query": query, "add_labels": add_labels, "remove_labels": remove_labels,
+            "create_missing": create_missing, "max_messages": max_messages}
+
+    async def run():
+        svc = get_gmail_service()
+        registry = get_label_registry()
+        try:
+            add_ids = await asyncio.to_thread(registry.resolve_many, svc, add_labels, create_missing)
+            remove_ids = await asyncio.to_thread(registry.resolve_many, svc, remove_labels)
+        except labels.LabelNotFound as e:
+            return {"error": str(e)}
+        return await relabel(query, add_ids, remove_ids, max_messages)
+
+    return submit_job("gmail_relabel", run, args)
+
+
+async def relabel(query: str, add_ids: list, remove_ids: list, max_messages: int = 100000, label_ids: list = None):
+    """Applies label ID changes to the messages matching `query` and/or carrying all of `label_ids`."""
+    svc = get_gmail_service()
+    ids = await list_message_ids(svc, query, max_messages, label_ids)
+    jobs.report_progress(0, total=len(ids))
+    count = await asyncio.to_thread(labels.batch_modify, svc, ids, add_ids, remove_ids,
+                                    lambda done, total: jobs.report_progress(done))
+    await log("INFO", "google_tools", f"Relabeled {count} messages (query '{query}', labels {label_ids})")
+    return {"status": "relabeled", "count": count, "query": query, "added": add_ids, "removed": remove_ids}
+
+
+@mcp.tool()
+async def http_transport_stats():
+    """
+    Returns connection-reuse metrics for the shared Google API connection pool:
+    requests sent, connections opened vs. reused, pool size and how often callers waited for a free connection.
+    """
+    return transport.transport_stats()
+
+
+# --- Background jobs ---
+
+job_manager = jobs.JobManager(max_running=JOBS_MAX_RUNNING, max_queued=JOBS_MAX_QUEUED)
+
+
+def submit_job(name: str, factory, args: dict = None):
+    """Starts `factory()` as a background job and returns its status dict (or an error dict if the queue is full)."""
+    try:
+        job = job_manager.submit(name, factory, args)
+    except jobs.JobLimitError as e:
+        sync_log("WARNING", "google_tools", f"Rejected job {name}: {e}")
+        return {"error": str(e)}
+    sync_log("INFO", "google_tools", f"Started job {job.id} ({name})")
+    return job.to_dict()
+
+
+def server_readiness(credentials) -> tuple[bool, dict]:
+    """Readiness of the HTTP server: usable credentials and room in the job queue."""
+    creds_ok = bool(credentials and (credentials.valid or getattr(credentials, "refresh_token", None)))
+    active = len(job_manager.active())
+    jobs_ok = active < job_manager.max_running + job_manager.max_queued
+    return creds_ok and jobs_ok, {"credentials": creds_ok, "jobs_active": active, "http_pool": transport.transport_stats()}
+
+
+def advance_progress(message: str = None):
+    """Moves the current job's progress one step forward."""
+    job = jobs.current_job()
+    if job is not None:
+        job.update(progress=job.progress + 1, message=message)
+
+
+async def push_progress(progress, total=None, message=None):
+    """Sends an MCP progress notification for the current tool call if the client asked for them."""
+    try:
+        await mcp.get_context().report_progress(progress, total, message)
+    except Exception:
+        pass
+
+
+# --- Pagination ---
+
+cursor_store = pagination.CursorStore(ttl=CURSOR_TTL)
+
+
+async def paged(tool: str, params: dict, cursor: str, page_size: int, fetch, stream: bool = False):
+    """
+    Returns one page of a cursor-paginated listing as {"items": [...], "next_cursor": ...}.
+    `fetch(params, page_token, count)` returns (items, next_page_token) for the underlying API.
+    When continuing from a cursor, the listing's original params are used, not the caller's.
+    If stream is True, each item is also sent as an MCP progress notification.
+    """
+    if cursor:
+        try:
+            state = cursor_store.get(tool, cursor)
+        except pagination.CursorExpired as e:
+            return {"error": str(e)}
+    else:
+        state = {"params": params, "page_size": page_size}
+    params = state["params"]
+    page_size = int(page_size or state.get("page_size") or pagination.DEFAULT_PAGE_SIZE)
+
+    items, state = await pagination.next_page(state, page_size, lambda token, count: fetch(params, token, count))
+    if stream:
+        for i, item in enumerate(items, 1):
+            await push_progress(i, len(items), json.dumps(item, default=str))
+    next_cursor = cursor_store.put(tool, state) if pagination.has_more(state) else None
+    await log("INFO", "google_tools", f"{tool}: returned a page of {len(items)} items")
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@mcp.tool()
+async def job_start(tool: str, args: dict = None):
+    """
+    Starts any tool in this server as a background job and returns the job ID immediately.
+    `tool` is the tool name and `args` its keyword arguments.
+    """
+    func = globals().get(tool)
+    if not getattr(func, "_mcp_tool", False) or not asyncio.iscoroutinefunction(func) or tool.startswith("job_"):
+        return {"error": f"Unknown tool '{tool}'."}
+    args = args or {}
+    return submit_job(tool, lambda: func(**args), args)
+
+
+@mcp.tool()
+async def job_status(job_id: str):
+    """Returns the status, progress and (once finished) result or error of a background job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job '{job_id}'."}
+    return job.to_dict()
+
+
+@mcp.tool()
+async def job_list():
+    """Lists background jobs, newest first, without their results."""
+    return [job.to_dict(include_result=False) for job in job_manager.list()]
+
+
+@mcp.tool()
+async def job_cancel(job_id: str):
+    """Cancels a queued or running background job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return {"error": f"Unknown job '{job_id}'."}
+    await log("INFO", "google_tools", f"Cancellation requested for job {job_id} ({job.name})")
+    return job.to_dict(include_result=False)
+
+
+@mcp.tool()
+async def job_wait(job_id: str, timeout: float = 60):
+    """
+    Waits up to `timeout` seconds for a background job to finish, sending MCP progress
+    notifications while it runs. Returns the job status (with its result if it finished).
+    """
+    async def on_progress(job):
+        await push_progress(job.progress, job.total, job.message)
+
+    job = await job_manager.wait(job_id, timeout=float(timeout), on_progress=on_progress)
+    if job is None:
+        return {"error": f"Unknown job '{job_id}'."}
+    return job.to_dict()
+
+
 # --- Calendar operations ---
 @mcp.tool()
-async def calendar_list(start: str = None, end: str = None, max_results: int = 10):
+@cached_tool("calendar")
+async def calendar_list(start: str = None, end: str = None, max_results: int = 10, compact: bool = False,
+                        page_size: int = None, cursor: str = None, stream: bool = False):
     """ Lists upcoming calendar events within the specified time range.
     `start` and `end` should be RFC3339 timestamps (e.g., 2023-10-01T00:00:00Z).
     `max_results` limits the number of events returned.
     Returns a list of event dictionaries with details like summary, start time, and end time.
+    If compact is True, only id, summary, start, end, location and status are requested.
+    With `page_size` or `cursor`, returns one page as {"items": [...], "next_cursor": ...};
+    call again with only `cursor=next_cursor` for the next page. `stream` sends each event as a progress notification.
     """
 
-    creds = get_credentials(CALENDAR_SCOPES)
-    svc = build("calendar", "v3", credentials=creds)
-    params = {"calendarId": "primary", "maxResults": max_results, "singleEvents": True, "orderBy": "startTime"}
-    if start: params["timeMin"] = start
-    if end: params["timeMax"] = end
-    evs = svc.events().list(**params).execute().get("items", [])
+    svc = build_service("calendar", "v3", CALENDAR_SCOPES)
+
+    def request(params, page_token, count):
+        fields = f"items({EVENT_COMPACT_FIELDS})" if params["compact"] else "items"
+        query = {"calendarId": "primary", "maxResults": count, "singleEvents": True, "orderBy": "startTime",
+                 "pageToken": page_token, "fields": f"nextPageToken,{fields}"}
+        if params["start"]: query["timeMin"] = params["start"]
+        if params["end"]: query["timeMax"] = params["end"]
+        return svc.events().list(**query)
+
+    params = {"start": start, "end": end, "compact": compact}
+    if page_size or cursor:
+        async def fetch(params, page_token, count):
+            resp = await execute_async(request(params, page_token, min(count, 2500)))
+            return resp.get("items", []), resp.get("nextPageToken")
+        return await paged("calendar_list", params, cursor, page_size, fetch, stream)
+
+    evs = request(params, None, max_results).execute().get("items", [])
     await log("INFO", "google_tools", f"Fetched {len(evs)} events")
     return evs
 
 @mcp.tool()
-async def calendar_add(summary: str, start: str, end: str, description: str = None, location: str = None):
+@invalidates("calendar")
+async def calendar_add(summary: str, start: str, end: str, description: str = None, location: str = None, compact: bool = False):
     """
     Creates a new calendar event with the specified details.
     `summary` is the event title, `start` and `end` are RFC3339 timestamps (e.g., 2023-10-01T00:00:00Z).
     `description` and `location` are optional.
-    Returns the created event details.
+    Returns the created event details (only the key fields if compact is True).
     """
 
-    creds = get_credentials(CALENDAR_SCOPES)
-    svc = build("calendar", "v3", credentials=creds)
+    svc = build_service("calendar", "v3", CALENDAR_SCOPES)
     event = {"summary": summary, "start": {"dateTime": start}, "end": {"dateTime": end}}
     if description: event["description"] = description
     if location: event["location"] = location
-    created = svc.events().insert(calendarId="primary", body=event).execute()
+    created = svc.events().insert(calendarId="primary", body=event,
+                                  fields=EVENT_COMPACT_FIELDS if compact else None).execute()
     await log("INFO", "google_tools", f"Created event {created['id']}")
     return created
 
 @mcp.tool()
-async def calendar_update(event_id: str, updates: dict):
+@invalidates("calendar")
+async def calendar_update(event_id: str, updates: dict, compact: bool = False):
     """
     Updates an existing calendar event with the specified updates.
     `event_id` is the ID of the event to update, and `updates` is a dictionary of fields to update.
     Allowed fields in `updates` include: summary, start, end, description, location.
-    Returns the updated event details.
+    Returns the updated event details (only the key fields if compact is True).
     """
     
-    creds = get_credentials(CALENDAR_SCOPES)
-    svc = build("calendar", "v3", credentials=creds)
-    updated = svc.events().patch(calendarId="primary", eventId=event_id, body=updates).execute()
+    svc = build_service("calendar", "v3", CALENDAR_SCOPES)
+    updated = svc.events().patch(calendarId="primary", eventId=event_id, body=updates,
+                                 fields=EVENT_COMPACT_FIELDS if compact else None).execute()
     await log("INFO", "google_tools", f"Updated event {event_id}")
     return updated
 
 @mcp.tool()
+@invalidates("calendar")
 async def calendar_delete(event_id: str):
     """
     Deletes a calendar event by its ID.
@@ -927,26 +2837,100 @@ async def calendar_delete(event_id: str):
     Returns a confirmation message.
     """
 
-    creds = get_credentials(CALENDAR_SCOPES)
-    svc = build("calendar", "v3", credentials=creds)
+    svc = build_service("calendar", "v3", CALENDAR_SCOPES)
     svc.events().delete(calendarId="primary", eventId=event_id).execute()
     await log("INFO", "google_tools", f"Deleted event {event_id}")
     return {"status": "deleted", "id": event_id}
 
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+
+
+@mcp.tool()
+async def calendar_find_free_slots(start: str, end: str, calendars: list = None, min_duration: int = 30,
+                                   working_hours: str = "09:00-17:00", timezone: str = "UTC",
+                                   workdays: str = "mon,tue,wed,thu,fri", max_slots: int = 100):
+    """
+    Finds times when all `calendars` (calendar IDs or email addresses; default ["primary"]) are free.
+    `start` and `end` are RFC3339 timestamps; ranges of several weeks and hundreds of calendars are fine.
+    Slots fall within `working_hours` ("HH:MM-HH:MM") on `workdays` in `timezone` (an IANA name such as
+    "America/New_York") and last at least `min_duration` minutes. Returns up to `max_slots` slots, earliest first,
+    plus any calendars whose free/busy information could not be read.
+    """
+    try:
+        tz = ZoneInfo(timezone)
+        day_start, day_end = freebusy.parse_hours(working_hours)
+        range_start, range_end = freebusy.parse_time(start), freebusy.parse_time(end)
+        weekdays = {WEEKDAYS[d.strip().lower()[:3]] for d in workdays.split(",") if d.strip()}
+    except (KeyError, ValueError) as e:
+        return {"error": f"Invalid argument: {e}"}
+    if range_end <= range_start:
+        return {"error": "end must be after start."}
+
+    calendars = list(calendars or ["primary"])
+    svc = build_service("calendar", "v3", CALENDAR_SCOPES)
+    # One freebusy.query per 50 calendars and 30-day window, all in flight together on the connection pool.
+    queries = [
+        (calendars[i:i + freebusy.MAX_CALENDARS_PER_QUERY], w_start, w_end)
+        for i in range(0, len(calendars), freebusy.MAX_CALENDARS_PER_QUERY)
+        for w_start, w_end in freebusy.query_windows(range_start, range_end)
+    ]
+    limit = asyncio.Semaphore(HTTP_POOL_SIZE)
+
+    async def query(ids, w_start, w_end):
+        async with limit:
+            return await execute_async(svc.freebusy().query(
+                body={"timeMin": freebusy.format_time(w_start), "timeMax": freebusy.format_time(w_end),
+                      "items": [{"id": c} for c in ids]},
+                fields="calendars"
+            ))
+
+    try:
+        responses = await asyncio.gather(*(query(*q) for q in queries))
+    except HttpError as e:
+        await log("ERROR", "google_tools", f"Free/busy query failed: {e}")
+        return {"error": f"Free/busy query failed: {e}"}
+
+    busy = []
+    errors = {}
+    for resp in responses:
+        for cal_id, info in resp.get("calendars", {}).items():
+            if info.get("errors"):
+                errors[cal_id] = [e.get("reason") for e in info["errors"]]
+            busy.extend((freebusy.parse_time(b["start"]), freebusy.parse_time(b["end"])) for b in info.get("busy", []))
+
+    merged = freebusy.merge_intervals(busy)
+    windows = freebusy.working_windows(range_start, range_end, tz, day_start, day_end, weekdays)
+    slots = freebusy.free_slots(merged, windows, timedelta(minutes=min_duration))
+
+    await log("INFO", "google_tools", f"Found {len(slots)} free slots across {len(calendars)} calendars "
+                                      f"({len(busy)} busy intervals merged into {len(merged)})")
+    return {
+        "slots": [
+            {"start": freebusy.format_time(s.astimezone(tz)), "end": freebusy.format_time(e.astimezone(tz)),
+             "minutes": int((e - s).total_seconds() // 60)}
+            for s, e in slots[:max_slots]
+        ],
+        "total_slots": len(slots),
+        "calendars": len(calendars),
+        "errors": errors,
+    }
+
 # --- Contacts operations ---
 
 @mcp.tool()
+@cached_tool("contacts")
 async def contacts_find_by_name(name: str):
     """
     Searches for a contact by display name and returns its resourceName.
     If no contact is found, returns an error string.
     """
-    creds = get_credentials(CONTACTS_SCOPES)
-    svc = build("people", "v1", credentials=creds)
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
     connections = svc.people().connections().list(
         resourceName="people/me",
-        personFields="names,emailAddresses,phoneNumbers",
-        pageSize=2000
+        personFields="names",
+        pageSize=2000,
+        fields="connections(resourceName,names/displayName)"
     ).execute()
 
     for person in connections.get("connections", []):
@@ -957,16 +2941,19 @@ async def contacts_find_by_name(name: str):
 
 
 @mcp.tool()
-async def contacts_get_by_name(name: str):
+@cached_tool("contacts")
+async def contacts_get_by_name(name: str, compact: bool = False):
     """
     Returns full contact info by display name or error string if not found.
+    If compact is True, only display names, email and phone values and organization names are returned.
     """
-    creds = get_credentials(CONTACTS_SCOPES)
-    svc = build("people", "v1", credentials=creds)
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
+    person_fields = PERSON_COMPACT_FIELDS if compact else f"resourceName,{PERSON_FIELDS}"
     connections = svc.people().connections().list(
         resourceName="people/me",
-        personFields="names,emailAddresses,phoneNumbers,organizations",
-        pageSize=2000
+        personFields=PERSON_FIELDS,
+        pageSize=2000,
+        fields=f"connections({person_fields})"
     ).execute()
 
     for person in connections.get("connections", []):
@@ -977,16 +2964,46 @@ async def contacts_get_by_name(name: str):
 
 
 @mcp.tool()
-async def contacts_create_contact(givenName: str, familyName: str, email: str = None, phone: str = None):
+async def contacts_list(name: str = None, page_size: int = pagination.DEFAULT_PAGE_SIZE, cursor: str = None,
+                        compact: bool = True, stream: bool = False):
+    """
+    Lists contacts one page at a time, optionally only those whose display name contains `name`.
+    Returns {"items": [...], "next_cursor": ...}; call again with only `cursor=next_cursor` for the next page.
+    Compact entries (the default) have only display names, email and phone values and organization names.
+    `stream` sends each contact as a progress notification.
+    """
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
+
+    async def fetch(params, page_token, count):
+        person_fields = PERSON_COMPACT_FIELDS if params["compact"] else f"resourceName,{PERSON_FIELDS}"
+        resp = await execute_async(svc.people().connections().list(
+            resourceName="people/me",
+            personFields=PERSON_FIELDS,
+            pageSize=min(max(count, 100), 1000),
+            pageToken=page_token,
+            fields=f"nextPageToken,connections({person_fields})"
+        ))
+        people = resp.get("connections", [])
+        if params["name"]:
+            needle = params["name"].lower()
+            people = [p for p in people if any(needle in n.get("displayName", "").lower() for n in p.get("names", []))]
+        return people, resp.get("nextPageToken")
+
+    return await paged("contacts_list", {"name": name, "compact": compact}, cursor, page_size, fetch, stream)
+
+
+@mcp.tool()
+@invalidates("contacts")
+async def contacts_create_contact(givenName: str, familyName: str, email: str = None, phone: str = None, compact: bool = False):
     """
     Creates a new contact with given info. If a contact with the same name exists, returns an error.
+    If compact is True, only the key fields of the created contact are returned.
     """
     existing = await contacts_find_by_name(f"{givenName} {familyName}")
     if isinstance(existing, str) and existing.startswith("people/"):
         return {"error": f"Contact '{givenName} {familyName}' already exists."}
 
-    creds = get_credentials(CONTACTS_SCOPES)
-    svc = build("people", "v1", credentials=creds)
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
     person = {
         "names": [{"givenName": givenName, "familyName": familyName}]
     }
@@ -995,17 +3012,19 @@ async def contacts_create_contact(givenName: str, familyName: str, email: str =
     if phone:
         person["phoneNumbers"] = [{"value": phone}]
 
-    created = svc.people().createContact(body=person).execute()
+    created = svc.people().createContact(body=person, fields=PERSON_COMPACT_FIELDS if compact else None).execute()
     await log("INFO", "google_tools", f"Created contact {created['resourceName']}")
     return created
 
 
 @mcp.tool()
-async def contacts_update_contact(identifier: str, updates: dict):
+@invalidates("contacts")
+async def contacts_update_contact(identifier: str, updates: dict, compact: bool = False):
     """
     Updates an existing contact.
     `identifier` can be resourceName like 'people/abc123' or display name.
     `updates` must be a dict of allowed fields only.
+    If compact is True, only the key fields of the updated contact are returned.
     """
     if not updates or not isinstance(updates, dict):
         return {"error": "Missing or invalid updates dictionary."}
@@ -1015,8 +3034,7 @@ async def contacts_update_contact(identifier: str, updates: dict):
         if key not in allowed_fields:
             return {"error": f"Cannot update field '{key}'. Allowed fields: {', '.join(allowed_fields)}"}
 
-    creds = get_credentials(CONTACTS_SCOPES)
-    svc = build("people", "v1", credentials=creds)
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
 
     resource_name = identifier
     if not identifier.startswith("people/"):
@@ -1029,19 +3047,20 @@ async def contacts_update_contact(identifier: str, updates: dict):
     updated = svc.people().updateContact(
         resourceName=resource_name,
         updatePersonFields=update_fields,
-        body=updates
+        body=updates,
+        fields=PERSON_COMPACT_FIELDS if compact else None
     ).execute()
     await log("INFO", "google_tools", f"Updated contact {resource_name}")
     return updated
 
 
 @mcp.tool()
+@invalidates("contacts")
 async def contacts_delete_contact(identifier: str):
     """
     Deletes a contact by resourceName or display name.
     """
-    creds = get_credentials(CONTACTS_SCOPES)
-    svc = build("people", "v1", credentials=creds)
+    svc = build_service("people", "v1", CONTACTS_SCOPES)
 
     resource_name = identifier
     if not identifier.startswith("people/"):
@@ -1063,11 +3082,10 @@ async def tasks_find_by_title(title: str, tasklist_id: str = "@default") -> str:
     if tasklist_id.lower() == "default":
         tasklist_id = "@default"
 
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds)
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
 
     try:
-        tasks = svc.tasks().list(tasklist=tasklist_id).execute().get("items", [])
+        tasks = svc.tasks().list(tasklist=tasklist_id, fields="items(id,title)").execute().get("items", [])
         for task in tasks:
             if task.get("title", "").strip().lower() == title.strip().lower():
                 return task["id"]
@@ -1077,27 +3095,43 @@ async def tasks_find_by_title(title: str, tasklist_id: str = "@default") -> str:
         raise HTTPException(status_code=500, detail={"message": f"Error finding task: {e}"})
     
 @mcp.tool()
+@cached_tool("tasks")
 async def tasks_list_tasklists():
     """
     Lists all Google Tasks tasklists.
     Returns a list of dictionaries with tasklist ID and title.
     """
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds, cache_discovery=False)
-    tasklists = svc.tasklists().list().execute().get("items", [])
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
+    tasklists = svc.tasklists().list(fields=TASKLIST_FIELDS).execute().get("items", [])
     await log("INFO", "google_tools", f"Listed {len(tasklists)} tasklists")
     return [{"id": t["id"], "title": t["title"]} for t in tasklists]
 
 @mcp.tool()
-async def tasks_list(max_results: int = 20):
-    """ Lists tasks from the default tasklist. """
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds, cache_discovery=False)
+@cached_tool("tasks")
+async def tasks_list(max_results: int = 20, compact: bool = False, page_size: int = None, cursor: str = None,
+                     stream: bool = False):
+    """ Lists tasks from the default tasklist.
+    If compact is True, only id, title, status, due and notes are returned for each task.
+    With `page_size` or `cursor`, returns one page as {"items": [...], "next_cursor": ...};
+    call again with only `cursor=next_cursor` for the next page. `stream` sends each task as a progress notification.
+    """
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
 
     tasklist_id = "@default"
 
+    def request(params, page_token, count):
+        fields = f"items({TASK_COMPACT_FIELDS})" if params["compact"] else "items"
+        return svc.tasks().list(tasklist=tasklist_id, maxResults=count, pageToken=page_token,
+                                fields=f"nextPageToken,{fields}")
+
     try:
-        lst = svc.tasks().list(tasklist=tasklist_id, maxResults=max_results).execute()
+        if page_size or cursor:
+            async def fetch(params, page_token, count):
+                resp = await execute_async(request(params, page_token, min(count, 100)))
+                return resp.get("items", []), resp.get("nextPageToken")
+            return await paged("tasks_list", {"compact": compact}, cursor, page_size, fetch, stream)
+
+        lst = request({"compact": compact}, None, max_results).execute()
         items = lst.get("items", [])
         await log("INFO", "google_tools", f"Fetched {len(items)} tasks from {tasklist_id}")
         return items
@@ -1106,46 +3140,50 @@ async def tasks_list(max_results: int = 20):
         raise HTTPException(status_code=400, detail=f"Invalid task list ID '{tasklist_id}'")
 
 @mcp.tool()
-async def tasks_add(title: str, notes: str = None, due: str = None):
+@invalidates("tasks")
+async def tasks_add(title: str, notes: str = None, due: str = None, compact: bool = False):
     """
     Creates a new task in the default tasklist.
     `title` is the task title, `notes` is optional task notes,
     and `due` is an optional due date in RFC3339 format (e.g., "2025-07-21T23:59:00-04:00").
+    If compact is True, only the key fields of the created task are returned.
     """
     
     tasklist_id = "@default"
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds, cache_discovery=False)
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
 
     body = {"title": title}
     if notes: body["notes"] = notes
     if due: body["due"] = due
-    created = svc.tasks().insert(tasklist=tasklist_id, body=body).execute()
+    created = svc.tasks().insert(tasklist=tasklist_id, body=body,
+                                 fields=TASK_COMPACT_FIELDS if compact else None).execute()
     await log("INFO", "google_tools", f"Created task {created['id']}")
     return created
 
 @mcp.tool()
+@invalidates("tasks")
 async def tasks_update_by_title(
     title: str,
     status: Optional[str] = None,
     new_title: Optional[str] = None,
     notes: Optional[str] = None,
     due: Optional[str] = None,
-    tasklist_id: str = "@default"
+    tasklist_id: str = "@default",
+    compact: bool = False
 ):
     """
     Updates a Google Task using its title. Optional fields to update: status, new_title, notes, due date.
     `status` can be "needsAction" or "completed".
     `due` must be an RFC3339 timestamp with time zone offset (e.g., "2025-07-21T23:59:00-04:00").
+    If compact is True, only the key fields of the updated task are returned.
     """
     if tasklist_id.lower() == "default":
         tasklist_id = "@default"
 
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds, cache_discovery=False)
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
 
     try:
-        tasks = svc.tasks().list(tasklist=tasklist_id).execute().get("items", [])
+        tasks = svc.tasks().list(tasklist=tasklist_id, fields="items(id,title)").execute().get("items", [])
         match = next((t for t in tasks if t.get("title", "").strip().lower() == title.strip().lower()), None)
 
         if not match:
@@ -1159,7 +3197,8 @@ async def tasks_update_by_title(
         if notes: updates["notes"] = notes
         if due: updates["due"] = due
 
-        updated = svc.tasks().patch(tasklist=tasklist_id, task=task_id, body=updates).execute()
+        updated = svc.tasks().patch(tasklist=tasklist_id, task=task_id, body=updates,
+                                    fields=TASK_COMPACT_FIELDS if compact else None).execute()
         return {"message": f"Task '{title}' updated successfully.", "updated_task": updated}
 
     except Exception as e:
@@ -1168,6 +3207,7 @@ async def tasks_update_by_title(
 
 
 @mcp.tool()
+@invalidates("tasks")
 async def tasks_delete(task_id: str):
     """
     Deletes a task by its ID from the default tasklist.
@@ -1176,9 +3216,193 @@ async def tasks_delete(task_id: str):
     """
 
     tasklist_id = "@default"
-    creds = get_credentials(TASKS_SCOPES)
-    svc = build("tasks", "v1", credentials=creds, cache_discovery=False)
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
 
     svc.tasks().delete(tasklist=tasklist_id, task=task_id).execute()
     await log("INFO", "google_tools", f"Deleted task {task_id}")
-    return {"status": "deleted", "id": task_id}
\ No newline at end of file
+    return {"status": "deleted", "id": task_id}
+
+# --- Bulk Tasks operations ---
+
+TASKS_BULK_ACTIONS = ("import", "complete", "delete")
+TASKS_BULK_CHUNK = 500  # Requests sent (as batches of 50) between progress updates
+
+
+async def list_all_tasklists(svc) -> list:
+    tasklists = []
+    page_token = None
+    while True:
+        resp = await execute_async(svc.tasklists().list(maxResults=100, pageToken=page_token,
+                                                        fields=f"nextPageToken,{TASKLIST_FIELDS}"))
+        tasklists.extend(resp.get("items", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return tasklists
+
+
+async def list_all_tasks(svc, tasklist_id: str, show_completed: bool = True, compact: bool = True) -> list:
+    """Every task of one tasklist, following pagination (completed tasks include hidden ones)."""
+    fields = f"items({TASK_COMPACT_FIELDS})" if compact else "items"
+    tasks = []
+    page_token = None
+    while True:
+        resp = await execute_async(svc.tasks().list(tasklist=tasklist_id, maxResults=100, pageToken=page_token,
+                                                    showCompleted=show_completed, showHidden=show_completed,
+                                                    fields=f"nextPageToken,{fields}"))
+        tasks.extend(resp.get("items", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return tasks
+
+
+@mcp.tool()
+async def tasks_list_all(show_completed: bool = False, compact: bool = True):
+    """
+    Lists the tasks of every tasklist, fetching the lists concurrently and following pagination.
+    Each task carries its `tasklist` ID and `tasklistTitle`. Completed tasks are included if show_completed is True.
+    Compact tasks (the default) have only id, title, status, due and notes.
+    """
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
+    tasklists = await list_all_tasklists(svc)
+    limit = asyncio.Semaphore(HTTP_POOL_SIZE)
+
+    async def fetch(tasklist):
+        async with limit:
+            tasks = await list_all_tasks(svc, tasklist["id"], show_completed, compact)
+        return [{**t, "tasklist": tasklist["id"], "tasklistTitle": tasklist["title"]} for t in tasks]
+
+    tasks = [t for per_list in await asyncio.gather(*(fetch(tl) for tl in tasklists)) for t in per_list]
+    await log("INFO", "google_tools", f"Listed {len(tasks)} tasks from {len(tasklists)} tasklists")
+    return {"tasklists": len(tasklists), "count": len(tasks), "tasks": tasks}
+
+
+@mcp.tool()
+@invalidates("tasks")
+async def tasks_bulk(path: str, action: str = "import", skip_existing: bool = True, concurrency: int = 4):
+    """
+    Imports, completes or deletes many tasks from a JSON Lines file, using batch requests. Runs as a background job.
+    `action` "import": each line is {"title", "notes"?, "due"?, "status"?, "tasklist"?}; tasklists are given
+    by ID or title (created if missing, default list if omitted). With skip_existing, tasks whose title
+    already exists in the target list are skipped, so a rerun does not create duplicates.
+    `action` "complete" or "delete": each line is {"id"} or {"title"}, plus an optional "tasklist".
+    Up to `concurrency` batches of 50 requests are in flight at once. A malformed line is reported
+    as failed with its line number and does not stop the others.
+    """
+    args = {"path": path, "action": action, "skip_existing": skip_existing, "concurrency": concurrency}
+    return submit_job("tasks_bulk", lambda: run_tasks_bulk(path, action, skip_existing, concurrency), args)
+
+
+async def run_tasks_bulk(path: str, action: str = "import", skip_existing: bool = True, concurrency: int = 4):
+    """Runs the bulk operation described in tasks_bulk in the current task."""
+    if action not in TASKS_BULK_ACTIONS:
+        return {"error": f"Unknown action '{action}'. Use one of {', '.join(TASKS_BULK_ACTIONS)}."}
+    if not Path(path).exists():
+        return {"error": f"File not found: {path}"}
+    # A bad line fails on its own; the other lines still run.
+    entries, line_numbers, results = [], [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry, error = None, None
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                error = f"Invalid JSON: {e}"
+            else:
+                if not isinstance(entry, dict):
+                    error = f"Line must be a JSON object, got {type(entry).__name__}"
+                elif any(entry.get(k) is not None and not isinstance(entry[k], str) for k in ("title", "id")):
+                    error = "Task title and id must be strings"
+            entries.append(entry if error is None else {})
+            line_numbers.append(line_number)
+            results.append({"line": line_number, "status": "failed", "error": error} if error else None)
+
+    svc = build_service("tasks", "v1", TASKS_SCOPES)
+    tasklists = await list_all_tasklists(svc)
+    by_title = {tl["title"].lower(): tl["id"] for tl in tasklists}
+    known_ids = {tl["id"] for tl in tasklists}
+    # The real ID of the default list, so "@default" and that ID in one file name the same list.
+    default_id = (await execute_async(svc.tasklists().get(tasklist="@default", fields="id")))["id"]
+
+    async def tasklist_id(ref):
+        if ref is not None and not isinstance(ref, str):
+            raise ValueError(f"Tasklist must be an ID or title string, got {ref!r}")
+        if not ref or ref in ("@default", "default"):
+            return default_id
+        if ref in known_ids:
+            return ref
+        if ref.lower() in by_title:
+            return by_title[ref.lower()]
+        if action != "import":
+            raise ValueError(f"Tasklist not found: {ref}")
+        created = await execute_async(svc.tasklists().insert(body={"title": ref}, fields="id,title"))
+        by_title[ref.lower()] = created["id"]
+        known_ids.add(created["id"])
+        return created["id"]
+
+    targets = {}
+    for i, entry in enumerate(entries):
+        if results[i] is not None:
+            continue
+        try:
+            targets[i] = await tasklist_id(entry.get("tasklist"))
+        except ValueError as e:
+            results[i] = {"line": line_numbers[i], "status": "failed", "error": str(e)}
+
+    # Title lookups (for skip_existing, or to find tasks given by title) need each list's current tasks.
+    titles = {}
+    if skip_existing or any("id" not in entries[i] for i in targets):
+        lists = sorted(set(targets.values()))
+        fetched = await asyncio.gather(*(list_all_tasks(svc, tl, show_completed=True) for tl in lists))
+        for tl, tasks in zip(lists, fetched):
+            titles[tl] = {}
+            for t in tasks:
+                titles[tl].setdefault(t.get("title", "").strip().lower(), t["id"])
+
+    requests = []
+    for i, tl in targets.items():
+        entry = entries[i]
+        title_key = (entry.get("title") or "").strip().lower()
+        if action == "import":
+            if not entry.get("title"):
+                results[i] = {"line": line_numbers[i], "status": "failed", "error": "Task has no title"}
+                continue
+            if skip_existing and title_key in titles.get(tl, {}):
+                results[i] = {"line": line_numbers[i], "status": "skipped", "id": titles[tl][title_key]}
+                continue
+            body = {k: entry[k] for k in ("title", "notes", "due", "status") if entry.get(k)}
+            requests.append((i, svc.tasks().insert(tasklist=tl, body=body, fields="id")))
+            if skip_existing:
+                # Later lines with the same title in this file are duplicates too.
+                titles.setdefault(tl, {})[title_key] = None
+            continue
+
+        task_id = entry.get("id") or titles.get(tl, {}).get(title_key)
+        if not task_id:
+            results[i] = {"line": line_numbers[i], "status": "failed", "error": f"Task not found: {entry.get('title')}"}
+        elif action == "complete":
+            requests.append((i, svc.tasks().patch(tasklist=tl, task=task_id, body={"status": "completed"}, fields="id")))
+        else:
+            requests.append((i, svc.tasks().delete(tasklist=tl, task=task_id)))
+
+    jobs.report_progress(0, total=len(requests))
+    for start in range(0, len(requests), TASKS_BULK_CHUNK):
+        chunk = requests[start:start + TASKS_BULK_CHUNK]
+        responses = await batch.execute_batch_async(svc, [r for _, r in chunk], concurrency=max(1, int(concurrency)))
+        for (i, request), (response, error) in zip(chunk, responses):
+            if error is not None:
+                results[i] = {"line": line_numbers[i], "status": "failed", "error": str(error)}
+            else:
+                results[i] = {"line": line_numbers[i], "status": "done", "id": (response or {}).get("id")}
+        jobs.report_progress(start + len(chunk), message=f"{action}: {start + len(chunk)} of {len(requests)} requests")
+
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    await log("INFO", "google_tools", f"Tasks bulk {action} of {len(entries)} entries: {counts}")
+    return {
+        "status": f"bulk {action} complete",
+        "counts": counts,
+        "failures": [r for r in results if r["status"] == "failed"][:100],
+    }
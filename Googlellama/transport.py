@@ -0,0 +1,198 @@
+# transport.py
+
+import gzip
+import queue
+import threading
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.http import HttpRequest
+
+# Request bodies smaller than this are sent as-is; compressing them costs more than it saves.
+GZIP_MIN_BODY_BYTES = 1024
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 60
+
+# Errors raised by the connection itself (timeouts, resets, broken responses), as opposed to HttpError.
+TRANSPORT_ERRORS = (OSError, httplib2.HttpLib2Error)
+
+# Callables invoked with each GzipHttpRequest right before it is sent (e.g. quota accounting).
+_execute_hooks = []
+
+
+def add_execute_hook(hook):
+    if hook not in _execute_hooks:
+        _execute_hooks.append(hook)
+
+
+def run_execute_hooks(request):
+    """Runs the execute hooks for a request sent some other way, e.g. inside a batch."""
+    for hook in _execute_hooks:
+        hook(request)
+
+
+class GzipHttpRequest(HttpRequest):
+    """
+    HttpRequest that gzip-compresses large JSON request bodies and always negotiates
+    gzip responses (Google only serves gzip to user agents containing "gzip").
+    Compression happens at execute() time so requests added to a BatchHttpRequest
+    are serialized uncompressed, as the batch endpoint expects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers["accept-encoding"] = "gzip"
+        user_agent = self.headers.get("user-agent", "")
+        if "gzip" not in user_agent:
+            self.headers["user-agent"] = f"{user_agent} (gzip)".strip()
+
+    def _compress_body(self):
+        if self.resumable is not None or self.body is None:
+            return
+        if "content-encoding" in self.headers:
+            return
+        if not self.headers.get("content-type", "").startswith("application/json"):
+            return
+        body = self.body.encode("utf-8") if isinstance(self.body, str) else self.body
+        if len(body) < GZIP_MIN_BODY_BYTES:
+            return
+        self.body = gzip.compress(body, compresslevel=6, mtime=0)
+        self.body_size = len(self.body)
+        self.headers["content-encoding"] = "gzip"
+        self.headers["content-length"] = str(self.body_size)
+
+    def execute(self, http=None, num_retries=0):
+        run_execute_hooks(self)
+        self._compress_body()
+        return super().execute(http=http, num_retries=num_retries)
+
+
+class PooledHttp:
+    """
+    Thread-safe stand-in for httplib2.Http.
+
+    httplib2.Http keeps one keep-alive connection per host but must not be used by two
+    threads at once. PooledHttp holds up to `size` of them and checks one out for the
+    duration of each request, so any number of services and worker threads share the
+    same warm TLS connections. Callers block when all members are busy.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.follow_redirects = True
+        # 308 is how resumable uploads report progress, it must not be followed.
+        self.redirect_codes = httplib2.Http().redirect_codes - {308}
+        self.connections = {}
+        self._idle = queue.LifoQueue()  # LIFO keeps the most recently used sockets hot
+        self._created = 0
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "connections_opened": 0, "connections_reused": 0, "pool_waits": 0, "errors": 0}
+
+    def _new_member(self):
+        http = httplib2.Http(timeout=self.timeout)
+        http.redirect_codes = self.redirect_codes
+        http.follow_redirects = self.follow_redirects
+        return http
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._new_member()
+            self._stats["pool_waits"] += 1
+        return self._idle.get()
+
+    def request(self, uri, method="GET", body=None, headers=None,
+                redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+        http = self._checkout()
+        scheme, authority, _, _ = httplib2.urlnorm(uri)
+        conn = http.connections.get(f"{scheme}:{authority}")
+        warm = conn is not None and conn.sock is not None
+        failed = False
+        try:
+            return http.request(uri, method=method, body=body, headers=headers,
+                                redirections=redirections, connection_type=connection_type)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._stats["requests"] += 1
+                self._stats["connections_reused" if warm else "connections_opened"] += 1
+                if failed:
+                    self._stats["errors"] += 1
+            self._idle.put(http)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pool_size"] = self.size
+            stats["pool_members"] = self._created
+            stats["pool_idle"] = self._idle.qsize()
+        total = stats["requests"]
+        stats["reuse_ratio"] = round(stats["connections_reused"] / total, 3) if total else 0.0
+        return stats
+
+    def close(self):
+        while True:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            http.close()
+            with self._lock:
+                self._created -= 1
+
+
+# --- Pluggable transport ---
+# A transport factory takes google-auth credentials and returns an object with the
+# httplib2.Http request() interface. It is used for every service built by the tools module.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+    """Replaces the shared connection pool. Existing idle connections are closed."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, PooledHttp(size=size, timeout=timeout)
+    if old is not None:
+        old.close()
+    return _pool
+
+
+def get_pool() -> PooledHttp:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PooledHttp()
+        return _pool
+
+
+def pooled_transport(credentials):
+    """Default transport: authorized requests over the shared keep-alive pool."""
+    return AuthorizedHttp(credentials, http=get_pool())
+
+
+_transport_factory = pooled_transport
+
+
+def set_transport(factory):
+    """Installs a different transport factory (None restores the pooled default)."""
+    global _transport_factory
+    _transport_factory = factory or pooled_transport
+
+
+def get_transport():
+    return _transport_factory
+
+
+def transport_stats() -> dict:
+    return get_pool().stats()
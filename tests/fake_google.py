@@ -0,0 +1,199 @@
+# fake_google.py
+#
+# A tiny in-memory Gmail, Drive and People backend behind the httplib2.Http interface, used by
+# record_cassettes.py to record the synthetic cassettes the replay tests run against.
+
+import copy
+import gzip
+import json
+from urllib.parse import urlsplit, parse_qs
+
+import httplib2
+
+LABELS = [
+    {"id": "INBOX", "name": "INBOX", "type": "system"},
+    {"id": "UNREAD", "name": "UNREAD", "type": "system"},
+    {"id": "IMPORTANT", "name": "IMPORTANT", "type": "system"},
+    {"id": "TRASH", "name": "TRASH", "type": "system"},
+    {"id": "SPAM", "name": "SPAM", "type": "system"},
+    {"id": "Label_1", "name": "Delete", "type": "user"},
+    {"id": "Label_2", "name": "Save", "type": "user"},
+]
+
+MESSAGES = [
+    {"id": "m01", "From": "Promo <promo@spam.example>", "Subject": "Huge sale",
+     "Date": "Mon, 1 Jan 2024 09:00:00 +0000", "labelIds": ["INBOX", "UNREAD"]},
+    {"id": "m02", "From": "promo@spam.example", "Subject": "Last chance",
+     "Date": "Mon, 2 Jan 2024 09:00:00 +0000", "labelIds": ["INBOX"]},
+    {"id": "m03", "From": "Digest <digest@news.example>", "Subject": "Weekly digest",
+     "Date": "Mon, 3 Jan 2024 09:00:00 +0000", "labelIds": ["INBOX", "UNREAD"]},
+    {"id": "m04", "From": "alice@friends.example", "Subject": "Lunch?",
+     "Date": "Mon, 4 Jan 2024 09:00:00 +0000", "labelIds": ["INBOX", "UNREAD"]},
+    {"id": "m05", "From": "bob@friends.example", "Subject": "Re: report",
+     "Date": "Mon, 5 Jan 2024 09:00:00 +0000", "labelIds": ["INBOX", "IMPORTANT"]},
+    {"id": "m06", "From": "promo@spam.example", "Subject": "Old offer",
+     "Date": "Mon, 6 Jan 2024 09:00:00 +0000", "labelIds": ["Label_1"]},
+    {"id": "m07", "From": "digest@news.example", "Subject": "Keep this one",
+     "Date": "Mon, 7 Jan 2024 09:00:00 +0000", "labelIds": ["Label_2"]},
+]
+
+CONTACTS = [
+    {"resourceName": "people/c1", "names": [{"displayName": "Alice Archer"}],
+     "emailAddresses": [{"value": "alice@friends.example"}], "phoneNumbers": [{"value": "+1 555 0101"}]},
+    {"resourceName": "people/c2", "names": [{"displayName": "Bob Baker"}],
+     "emailAddresses": [{"value": "bob@friends.example"}], "organizations": [{"name": "Bakery"}]},
+    {"resourceName": "people/c3", "names": [{"displayName": "Carol Cook"}],
+     "emailAddresses": [{"value": "carol@friends.example"}]},
+]
+
+FILES = {
+    "f-delete": ("delete_filter.txt", b"promo@spam.example\n"),
+    "f-archive": ("archive_filter.txt", b"digest@news.example\n"),
+}
+
+
+def _split_terms(query: str) -> list:
+    """Splits a query into top-level terms; a parenthesized group stays one term."""
+    terms, depth, current = [], 0, ""
+    for char in query:
+        if char == " " and depth == 0:
+            if current:
+                terms.append(current)
+            current = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    if current:
+        terms.append(current)
+    return terms
+
+
+def _matches(message: dict, query: str) -> bool:
+    """The subset of Gmail search used by the recorded tools: in:inbox, is:read/unread, from:, label:, OR groups."""
+    for term in _split_terms(query or ""):
+        if term.startswith("(") and term.endswith(")"):
+            if not any(_matches(message, t) for t in term[1:-1].split(" OR ")):
+                return False
+            continue
+        negate = term.startswith("-")
+        term = term.lstrip("-")
+        key, _, value = term.partition(":")
+        if key == "in":
+            hit = value.upper() in message["labelIds"]
+        elif key == "is":
+            hit = ("UNREAD" in message["labelIds"]) == (value == "unread")
+        elif key == "from":
+            hit = value.lower() in message["From"].lower()
+        elif key == "label":
+            hit = any(label["name"].lower() == value.lower() and label["id"] in message["labelIds"] for label in LABELS)
+        else:
+            raise ValueError(f"Fake Gmail does not understand '{term}'")
+        if hit == negate:
+            return False
+    return True
+
+
+class FakeGoogle:
+    """Serves Gmail, Drive and People requests from a fresh copy of the synthetic mailbox, Drive and contacts."""
+
+    needs_credentials = False
+
+    def __init__(self):
+        self.messages = {m["id"]: {**copy.deepcopy(m), "threadId": "t" + m["id"]} for m in MESSAGES}
+        self.credentials = None
+        self.connections = {}
+        self.follow_redirects = True
+        self.timeout = None
+        self.redirect_codes = set()
+
+    def __call__(self, credentials):
+        # Used as a transport factory: every service shares this backend.
+        return self
+
+    def close(self):
+        pass
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        parts = urlsplit(uri)
+        params = parse_qs(parts.query)
+        payload = {}
+        if method == "POST" and body:
+            if (headers or {}).get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            payload = json.loads(body)
+        if "/gmail/v1/users/me/" in parts.path:
+            status, content = self.gmail(method, parts.path.split("/gmail/v1/users/me/", 1)[1], params, payload)
+        elif "/drive/v3/" in parts.path:
+            status, content = self.drive(parts.path.split("/drive/v3/", 1)[1], params)
+        elif parts.path.startswith("/v1/people/"):
+            status, content = self.people(parts.path.split("/v1/", 1)[1], params)
+        else:
+            status, content = 404, {"error": {"code": 404, "message": f"Unknown endpoint {parts.path}"}}
+        if isinstance(content, bytes):
+            return httplib2.Response({"status": str(status), "content-type": "application/octet-stream",
+                                      "content-length": str(len(content))}), content
+        data = b"" if status == 204 else json.dumps(content).encode("utf-8")
+        return httplib2.Response({"status": str(status), "content-type": "application/json; charset=UTF-8"}), data
+
+    def gmail(self, method, path, params, payload):
+        if path == "labels":
+            return 200, {"labels": LABELS}
+        if path == "messages" and method == "GET":
+            label_ids = params.get("labelIds", [])
+            found = [m for m in self.messages.values()
+                     if all(label in m["labelIds"] for label in label_ids) and _matches(m, params.get("q", [""])[0])]
+            limit = int(params.get("maxResults", ["100"])[0])
+            return 200, {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in found[:limit]],
+                         "resultSizeEstimate": len(found)}
+        if path == "messages/batchDelete":
+            for msg_id in payload["ids"]:
+                self.messages.pop(msg_id, None)
+            return 204, None
+        if path == "messages/batchModify":
+            for msg_id in payload["ids"]:
+                labels = self.messages[msg_id]["labelIds"]
+                labels[:] = [l for l in labels if l not in payload.get("removeLabelIds", [])]
+                labels.extend(l for l in payload.get("addLabelIds", []) if l not in labels)
+            return 204, None
+        if path.startswith("messages/"):
+            message = self.messages.get(path.split("/", 1)[1])
+            if message is None:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            wanted = params.get("metadataHeaders") or ["From", "Subject"]
+            headers = [{"name": h, "value": message[h]} for h in wanted if h in message]
+            return 200, {"id": message["id"], "threadId": message["threadId"], "labelIds": message["labelIds"],
+                         "payload": {"headers": headers}}
+        return 404, {"error": {"code": 404, "message": f"Unknown Gmail endpoint {path}"}}
+
+    def drive(self, path, params):
+        if path == "changes/startPageToken":
+            return 200, {"startPageToken": "100"}
+        if path == "changes":
+            return 200, {"changes": [], "newStartPageToken": params["pageToken"][0]}
+        if path == "files/root":
+            return 200, {"id": "root-id"}
+        if path == "files":
+            return 200, {"files": [self.file_meta(file_id) for file_id in FILES]}
+        if path.startswith("files/") and path.split("/", 1)[1] in FILES:
+            file_id = path.split("/", 1)[1]
+            if params.get("alt") == ["media"]:
+                return 200, FILES[file_id][1]
+            return 200, self.file_meta(file_id)
+        return 404, {"error": {"code": 404, "message": f"Unknown Drive endpoint {path}"}}
+
+    @staticmethod
+    def file_meta(file_id: str) -> dict:
+        name, content = FILES[file_id]
+        return {"id": file_id, "name": name, "mimeType": "text/plain", "parents": ["root-id"],
+                "modifiedTime": "2024-01-01T00:00:00.000Z", "size": str(len(content)), "trashed": False}
+
+    @staticmethod
+    def people(path, params):
+        if path == "people/me/connections":
+            start = int(params.get("pageToken", ["0"])[0])
+            end = start + int(params.get("pageSize", ["100"])[0])
+            page = {"connections": copy.deepcopy(CONTACTS[start:end]), "totalPeople": len(CONTACTS)}
+            if end < len(CONTACTS):
+                page["nextPageToken"] = str(end)
+            return 200, page
+        return 404, {"error": {"code": 404, "message": f"Unknown People endpoint {path}"}}
@@ -0,0 +1,59 @@
+# record_cassettes.py
+#
+# Re-records the synthetic cassettes in tests/cassettes/ by running the tools against the
+# in-memory backend in fake_google.py. Run it after a change that intentionally alters the
+# requests a tool makes, then update the expected call counts in test_cassette_replay.py:
+#
+#     python tests/record_cassettes.py
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from Googlellama import cassette, transport
+import Googlellama.tools as google_tools
+from fake_google import FakeGoogle
+
+CASSETTES = Path(__file__).resolve().parent / "cassettes"
+
+
+async def list_contacts_in_pages():
+    """Two pages of two contacts; the second page is served from the cursor without a request."""
+    first = await google_tools.contacts_list(page_size=2)
+    second = await google_tools.contacts_list(cursor=first["next_cursor"])
+    return first, second
+
+
+# Tool runs to record: cassette name -> coroutine function called inside the cassette.
+RUNS = {
+    "gmail_list": lambda: google_tools.gmail_list(query="in:inbox", max_results=10),
+    "clean_up_inbox": lambda: google_tools.run_inbox_cleanup(),
+    "contacts_list": list_contacts_in_pages,
+}
+
+
+def record(name: str, run):
+    previous = transport.get_transport()
+    transport.set_transport(FakeGoogle())
+    try:
+        with tempfile.TemporaryDirectory() as journal_dir:
+            google_tools.JOURNAL_DIR = Path(journal_dir)
+            with google_tools.use_cassette(CASSETTES / f"{name}.jsonl.gz", cassette.RECORD) as tape:
+                result = asyncio.run(run())
+    finally:
+        transport.set_transport(previous)
+    print(f"{name}: {tape.calls} requests recorded, result {result}")
+
+
+def main():
+    google_tools.DRIVE_SYNC_INTERVAL = 3600
+    for name, run in RUNS.items():
+        record(name, run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# test_cassette_replay.py
+#
+# Offline performance regression tests: tools replay the synthetic cassettes in tests/cassettes/
+# (recorded with record_cassettes.py) and must make exactly the recorded requests. A change that
+# adds API calls fails here with a higher call count or a cassette miss; re-record the cassettes
+# and update the counts below when the change is intended.
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+google_tools = pytest.importorskip("Googlellama.tools")
+from Googlellama import cassette
+
+CASSETTES = Path(__file__).resolve().parent / "cassettes"
+
+# Requests each recorded run makes.
+GMAIL_LIST_CALLS = 6  # messages.list + one metadata get per message
+CLEAN_UP_INBOX_CALLS = 27
+CONTACTS_LIST_CALLS = 1  # one connections.list page covers both pages of the listing
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Journals go to a temporary directory, and Drive syncs are never due again during a run."""
+    monkeypatch.setattr(google_tools, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(google_tools, "DRIVE_SYNC_INTERVAL", 3600)
+
+
+def replay(name: str, run):
+    with google_tools.use_cassette(CASSETTES / f"{name}.jsonl.gz", cassette.REPLAY) as tape:
+        result = asyncio.run(run())
+    return result, tape
+
+
+def test_gmail_list_replay():
+    result, tape = replay("gmail_list", lambda: google_tools.gmail_list(query="in:inbox", max_results=10))
+    assert tape.misses == 0
+    assert tape.calls == GMAIL_LIST_CALLS
+    assert [m["id"] for m in result] == ["m01", "m02", "m03", "m04", "m05"]
+    assert result[0] == {"id": "m01", "Subject": "Huge sale", "From": "Promo <promo@spam.example>",
+                         "Date": "Mon, 1 Jan 2024 09:00:00 +0000"}
+
+
+def test_gmail_list_repeated_replays_are_not_served_from_caches():
+    # use_cassette empties the response cache, so every run makes the same requests.
+    for _ in range(2):
+        _, tape = replay("gmail_list", lambda: google_tools.gmail_list(query="in:inbox", max_results=10))
+        assert tape.calls == GMAIL_LIST_CALLS
+
+
+def test_clean_up_inbox_replay():
+    result, tape = replay("clean_up_inbox", google_tools.run_inbox_cleanup)
+    assert tape.misses == 0
+    assert tape.calls == CLEAN_UP_INBOX_CALLS
+    assert result["deleted_total"] == 2
+    assert result["archived_total"] == 2
+    assert result["archived_read_emails"] == 1
+
+
+def test_contacts_list_replay():
+    async def list_in_pages():
+        first = await google_tools.contacts_list(page_size=2)
+        second = await google_tools.contacts_list(cursor=first["next_cursor"])
+        return first, second
+
+    (first, second), tape = replay("contacts_list", list_in_pages)
+    assert tape.misses == 0
+    assert tape.calls == CONTACTS_LIST_CALLS
+    assert [p["resourceName"] for p in first["items"]] == ["people/c1", "people/c2"]
+    assert [p["resourceName"] for p in second["items"]] == ["people/c3"]
+    assert second["next_cursor"] is None
+
+
+def test_unrecorded_request_is_a_miss():
+    with pytest.raises(cassette.CassetteMiss):
+        replay("gmail_list", lambda: google_tools.gmail_list.uncached(query="is:unread", max_results=10))
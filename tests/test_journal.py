@@ -0,0 +1,72 @@
+# test_journal.py
+#
+# Resume semantics of the mutation journal: only an interrupted run is resumed, and a run that
+# completes with a failed chunk retries that chunk without skipping everything else next time.
+
+from Googlellama.journal import MutationJournal
+
+SAVE_SCAN = MutationJournal.key("scan", "label:Save")
+DELETE_CHUNK = MutationJournal.key("delete", "from:(promo@spam.example)")
+ARCHIVE_CHUNK = MutationJournal.key("archive", "from:(digest@news.example)")
+
+
+def run(path, mailbox, failing=()):
+    """A minimal bulk run over `mailbox` (key -> matching IDs): each chunk is planned, then applied or failed."""
+    run_journal = MutationJournal(path, fsync=False)
+    processed = {}
+    for key, ids in mailbox.items():
+        if run_journal.is_done(key):
+            continue
+        planned = run_journal.planned_ids(key)
+        if planned is None:
+            planned = list(ids)
+            run_journal.plan(key, "chunk", planned)
+        if key in failing:
+            run_journal.fail(key)
+            continue
+        processed[key] = planned
+        run_journal.complete(key, len(planned))
+    run_journal.close(finished=True)
+    return processed
+
+
+def test_finished_run_deletes_its_journal(tmp_path):
+    path = tmp_path / "clean_up_inbox.jsonl"
+    run(path, {SAVE_SCAN: ["m07"], DELETE_CHUNK: ["m01"]})
+    assert not path.exists()
+
+
+def test_interrupted_run_resumes_where_it_stopped(tmp_path):
+    path = tmp_path / "clean_up_inbox.jsonl"
+    first = MutationJournal(path, fsync=False)
+    first.plan(DELETE_CHUNK, "delete", ["m01", "m02"])
+    first.complete(DELETE_CHUNK, 2)
+    first.plan(ARCHIVE_CHUNK, "archive", ["m03"])
+    first.close(finished=False)
+
+    resumed = MutationJournal(path, fsync=False)
+    assert resumed.is_done(DELETE_CHUNK)
+    assert resumed.planned_ids(ARCHIVE_CHUNK) == ["m03"]
+    resumed.close()
+
+
+def test_failed_chunk_does_not_skip_new_mail_for_finished_queries(tmp_path):
+    path = tmp_path / "clean_up_inbox.jsonl"
+    first = run(path, {SAVE_SCAN: ["m07"], DELETE_CHUNK: ["m01"], ARCHIVE_CHUNK: ["m03"]}, failing={ARCHIVE_CHUNK})
+    assert first == {SAVE_SCAN: ["m07"], DELETE_CHUNK: ["m01"]}
+    assert path.exists()
+
+    # New mail arrived for the queries that finished; the failed chunk replays its recorded IDs.
+    second = run(path, {SAVE_SCAN: ["m08"], DELETE_CHUNK: ["m09"], ARCHIVE_CHUNK: ["m10"]})
+    assert second == {SAVE_SCAN: ["m08"], DELETE_CHUNK: ["m09"], ARCHIVE_CHUNK: ["m03"]}
+    assert not path.exists()
+
+
+def test_chunk_that_keeps_failing_never_blocks_other_queries(tmp_path):
+    path = tmp_path / "clean_up_inbox.jsonl"
+    for new_id in ("m01", "m02", "m03"):
+        processed = run(path, {DELETE_CHUNK: [new_id], ARCHIVE_CHUNK: ["m99"]}, failing={ARCHIVE_CHUNK})
+        assert processed == {DELETE_CHUNK: [new_id]}
+        reopened = MutationJournal(path, fsync=False)
+        assert reopened.done == {}
+        reopened.close()